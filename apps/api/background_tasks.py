@@ -1,30 +1,112 @@
 import asyncio
 import time
 import os
-import subprocess
+import re
+import json
+import shutil
 import tempfile
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import BackgroundTasks
-import re
+
+from progress_bus import progress_bus
 
 # Import WebSocket manager (will be set from main.py)
 manager = None
 
 def set_websocket_manager(ws_manager):
-    """Set the WebSocket manager from main.py"""
+    """Set the WebSocket manager from main.py and subscribe it to the progress bus"""
     global manager
     manager = ws_manager
+    progress_bus.add_listener(ws_manager.send_progress)
 
 async def send_websocket_update(project_id: str, data: Dict[str, Any]):
-    """Send WebSocket update if manager is available"""
-    if manager:
-        try:
-            await manager.send_progress(project_id, data)
-        except Exception as e:
-            print(f"WebSocket update failed: {e}")
+    """Publish a progress update to WebSocket/SSE clients in every API process"""
+    try:
+        await progress_bus.publish(project_id, data)
+    except Exception as e:
+        print(f"WebSocket update failed: {e}")
 
-# In-memory task store (replace with Redis/database in production)
+# In-memory task store (replace with Redis/database in production), ordered by last update
 background_tasks: Dict[str, Dict[str, Any]] = {}
+TASK_STATE_TTL = float(os.getenv('TASK_STATE_TTL', '86400'))  # seconds since the last update
+TASK_STATE_MAX_ENTRIES = int(os.getenv('TASK_STATE_MAX_ENTRIES', '10000'))
+
+# Long-poll status requests waiting for a project's next state change
+_status_waiters: Dict[str, set] = {}
+
+def store_task_state(project_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge data into a project's task state and evict states that went quiet.
+
+    The project moves to the end of the store, so the least recently updated
+    states are at the front and eviction stops at the first live one.
+    """
+    state = background_tasks.pop(project_id, {})
+    state.update(data)
+    background_tasks[project_id] = state
+    
+    cutoff = time.time() - TASK_STATE_TTL
+    while len(background_tasks) > 1:
+        oldest_id, oldest = next(iter(background_tasks.items()))
+        if len(background_tasks) <= TASK_STATE_MAX_ENTRIES and oldest.get("updated_at", float("inf")) > cutoff:
+            break
+        del background_tasks[oldest_id]
+    return state
+
+async def record_task_progress(project_id: str, data: Dict[str, Any]):
+    """Bus listener that keeps the task store current with updates from any process"""
+    state = {k: v for k, v in data.items() if k != "event_id"}
+    # Publishers stamp updated_at, so every process derives the same ETag
+    state.setdefault("updated_at", time.time())
+    store_task_state(project_id, state)
+    for waiter in _status_waiters.pop(project_id, ()):
+        if not waiter.done():
+            waiter.set_result(True)
+
+async def wait_for_task_change(project_id: str, timeout: float) -> bool:
+    """Wait until the project's task state changes; False on timeout"""
+    waiter = asyncio.get_running_loop().create_future()
+    _status_waiters.setdefault(project_id, set()).add(waiter)
+    try:
+        return await asyncio.wait_for(waiter, timeout=timeout)
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        waiters = _status_waiters.get(project_id)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del _status_waiters[project_id]
+
+progress_bus.add_listener(record_task_progress)
+
+# Streaming pipeline configuration
+YTDLP_FORMAT = os.getenv('YTDLP_FORMAT', 'best[height<=1080]')
+PIPELINE_TIMEOUT = int(os.getenv('YOUTUBE_PIPELINE_TIMEOUT', '900'))  # seconds for download + transcode
+
+# Platform output settings for YouTube imports
+PLATFORM_VERSIONS = {
+    "tiktok": {
+        "aspect": "9:16",
+        "max_duration": 60,
+        "fps": 30,
+        "bitrate": "6M"
+    },
+    "instagram_reels": {
+        "aspect": "9:16", 
+        "max_duration": 90,
+        "fps": 30,
+        "bitrate": "5M"
+    },
+    "youtube_shorts": {
+        "aspect": "9:16",
+        "max_duration": 60,
+        "fps": 30,
+        "bitrate": "8M"
+    }
+}
+
+YTDLP_PROGRESS_RE = re.compile(r'\[download\]\s+([\d.]+)%')
+FFMPEG_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
 
 def extract_video_id(url: str) -> str:
     """Extract video ID from YouTube URL"""
@@ -40,6 +122,13 @@ def extract_video_id(url: str) -> str:
     
     raise ValueError("Invalid YouTube URL")
 
+async def update_task_state(project_id: str, data: Dict[str, Any], notify: bool = True):
+    """Merge data into the task state and push it to WebSocket listeners"""
+    data = {**data, "updated_at": time.time()}
+    store_task_state(project_id, data)
+    if notify:
+        await send_websocket_update(project_id, data)
+
 async def process_youtube_background(
     project_id: str, 
     youtube_url: str, 
@@ -49,116 +138,68 @@ async def process_youtube_background(
     """Background task for processing YouTube videos using yt-dlp and FFmpeg"""
     try:
         # Initialize task status
-        background_tasks[project_id] = {
+        background_tasks[project_id] = {}
+        await update_task_state(project_id, {
             "status": "processing",
             "progress": 10,
-            "message": "Starting YouTube video processing...",
-            "updated_at": time.time()
-        }
+            "message": "Starting YouTube video processing..."
+        })
         
         # Extract video ID
         video_id = extract_video_id(youtube_url)
         
+        # Fallback to simulated processing if the toolchain is not installed
+        if not shutil.which("yt-dlp") or not shutil.which("ffmpeg"):
+            await simulate_youtube_processing(project_id, youtube_url)
+            return
+        
         # Create temporary directory for processing
         temp_dir = tempfile.mkdtemp(prefix=f"youtube_{video_id}_")
         
+        # Step 1: Download and transcode in a single streaming pass
+        await update_task_state(project_id, {
+            "progress": 20,
+            "message": "Downloading and optimizing video..."
+        })
+        
         try:
-            # Step 1: Download video using yt-dlp
-            background_tasks[project_id].update({
-                "progress": 20,
-                "message": "Downloading video from YouTube...",
-                "updated_at": time.time()
-            })
-            
-            # Check if yt-dlp is available
-            try:
-                subprocess.run(["yt-dlp", "--version"], check=True, capture_output=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                # Fallback to simulated processing if yt-dlp not available
-                await simulate_youtube_processing(project_id, youtube_url)
-                return
-            
-            # Download video with yt-dlp
-            download_cmd = [
-                "yt-dlp",
-                "-f", "best[height<=1080]",  # Best quality up to 1080p
-                "-o", f"{temp_dir}/%(id)s.%(ext)s",
-                "--no-playlist",
-                "--socket-timeout", "30",  # 30 second socket timeout
-                "--retries", "3",  # Retry 3 times
-                youtube_url
-            ]
-            
-            try:
-                result = subprocess.run(download_cmd, capture_output=True, text=True, timeout=60)
-                
-                if result.returncode != 0:
-                    print(f"yt-dlp failed with error: {result.stderr}")
-                    # Fallback to simulated processing on error
-                    await simulate_youtube_processing(project_id, youtube_url)
-                    return
-            except subprocess.TimeoutExpired:
-                print(f"yt-dlp timed out for project {project_id}")
-                # Fallback to simulated processing on timeout
-                await simulate_youtube_processing(project_id, youtube_url)
-                return
-            
-            # Find downloaded file
-            downloaded_files = [f for f in os.listdir(temp_dir) if f.startswith(video_id)]
-            if not downloaded_files:
-                raise Exception("Downloaded video file not found")
-            
-            video_file = os.path.join(temp_dir, downloaded_files[0])
-            
-            # Step 2: Analyze video properties
-            background_tasks[project_id].update({
-                "progress": 60,
-                "message": "Analyzing video content...",
-                "updated_at": time.time()
-            })
-            
-            # Get video info using FFmpeg
-            probe_cmd = [
-                "ffprobe",
-                "-v", "quiet",
-                "-print_format", "json",
-                "-show_format",
-                "-show_streams",
-                video_file
-            ]
-            
-            probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-            
-            if probe_result.returncode != 0:
-                raise Exception(f"Failed to analyze video: {probe_result.stderr}")
-            
-            # Step 3: Process video for different platforms
-            background_tasks[project_id].update({
-                "progress": 80,
-                "message": "Preparing video for optimization...",
-                "updated_at": time.time()
-            })
-            
-            # Create optimized versions for different platforms
-            platform_versions = await create_platform_versions(video_file, temp_dir, video_id)
-            
-            # Step 4: Mark as complete
-            background_tasks[project_id].update({
-                "status": "ready_for_processing",
-                "progress": 100,
-                "message": "YouTube video processed successfully",
-                "video_file": video_file,
-                "platform_versions": platform_versions,
-                "video_id": video_id,
-                "updated_at": time.time()
-            })
-            
-            print(f"✅ YouTube processing completed for project {project_id}")
-            
-        finally:
-            # Clean up temporary files (optional - keep for processing)
-            # shutil.rmtree(temp_dir, ignore_errors=True)
-            pass
+            source_file, platform_versions = await asyncio.wait_for(
+                stream_youtube_to_platforms(project_id, youtube_url, temp_dir, video_id),
+                timeout=PIPELINE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            print(f"YouTube pipeline timed out for project {project_id}")
+            # Fallback to simulated processing on timeout
+            await simulate_youtube_processing(project_id, youtube_url)
+            return
+        except RuntimeError as e:
+            print(f"YouTube pipeline failed with error: {e}")
+            # Fallback to simulated processing on error
+            await simulate_youtube_processing(project_id, youtube_url)
+            return
+        
+        if not platform_versions:
+            raise Exception("No platform versions were produced")
+        
+        # Step 2: Analyze the source, not a platform cut (those are capped and reframed)
+        await update_task_state(project_id, {
+            "progress": 96,
+            "message": "Analyzing video content..."
+        })
+        video_info = await probe_video(source_file)
+        
+        # Step 3: Mark as complete
+        await update_task_state(project_id, {
+            "status": "ready_for_processing",
+            "progress": 100,
+            "message": "YouTube video processed successfully",
+            "video_file": source_file,
+            "platform_versions": platform_versions,
+            "video_info": video_info,
+            "video_id": video_id
+        })
+        
+        print(f"✅ YouTube processing completed for project {project_id}")
         
     except Exception as e:
         background_tasks[project_id] = {
@@ -167,8 +208,252 @@ async def process_youtube_background(
             "error": str(e),
             "updated_at": time.time()
         }
+        await send_websocket_update(project_id, background_tasks[project_id])
         print(f"❌ YouTube processing failed for project {project_id}: {e}")
 
+def build_ytdlp_command(youtube_url: str) -> List[str]:
+    """yt-dlp command that streams the selected format to stdout"""
+    return [
+        "yt-dlp",
+        "-f", YTDLP_FORMAT,
+        "-o", "-",  # Write media to stdout
+        "--no-playlist",
+        "--newline",  # One progress line per update on stderr
+        "--socket-timeout", "30",  # 30 second socket timeout
+        "--retries", "3",  # Retry 3 times
+        youtube_url
+    ]
+
+def build_ffmpeg_command(
+    input_source: str,
+    output_dir: str,
+    video_id: str,
+    source_file: Optional[str] = None
+) -> Tuple[List[str], Dict[str, str]]:
+    """FFmpeg command producing every platform version from one decode.
+    
+    The input is scaled/padded once and split into one branch per platform,
+    so the source is only decoded a single time regardless of platform count.
+    When ``source_file`` is given the input is also stream-copied there
+    untouched, so piped sources are kept without a second download.
+    """
+    platforms = list(PLATFORM_VERSIONS.keys())
+    labels = [f"[v{i}]" for i in range(len(platforms))]
+    filter_graph = (
+        "[0:v]scale=1080:1920:force_original_aspect_ratio=decrease,"
+        "pad=1080:1920:(ow-iw)/2:(oh-ih)/2,"
+        f"split={len(platforms)}{''.join(labels)}"
+    )
+    
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-progress", "pipe:1",  # Machine-readable progress on stdout
+        "-i", input_source,
+        "-filter_complex", filter_graph
+    ]
+    
+    versions = {}
+    for platform, label in zip(platforms, labels):
+        settings = PLATFORM_VERSIONS[platform]
+        output_file = os.path.join(output_dir, f"{video_id}_{platform}.mp4")
+        cmd += [
+            "-map", label,
+            "-map", "0:a?",
+            "-t", str(settings["max_duration"]),
+            "-r", str(settings["fps"]),
+            "-c:v", "libx264",
+            "-preset", "fast",
+            "-crf", "23",
+            "-maxrate", settings["bitrate"],
+            "-bufsize", settings["bitrate"],
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-movflags", "+faststart",
+            "-y",  # Overwrite output file
+            output_file
+        ]
+        versions[platform] = output_file
+    
+    if source_file:
+        cmd += [
+            "-map", "0:v:0",
+            "-map", "0:a?",
+            "-c", "copy",  # No re-encode, no length cap
+            "-y",
+            source_file
+        ]
+    
+    return cmd, versions
+
+async def stream_youtube_to_platforms(
+    project_id: str,
+    youtube_url: str,
+    output_dir: str,
+    video_id: str
+) -> Tuple[str, Dict[str, str]]:
+    """Pipe yt-dlp's stdout straight into FFmpeg so transcoding starts while the download is running.
+    
+    The two processes are connected with an OS pipe, so media bytes never pass
+    through Python or touch disk before encoding. Progress from both sides is
+    parsed concurrently and merged into the task state. Returns the stream-copied
+    source file and the platform versions.
+    """
+    source_file = os.path.join(output_dir, f"{video_id}_source.mkv")
+    read_fd, write_fd = os.pipe()
+    try:
+        downloader = await asyncio.create_subprocess_exec(
+            *build_ytdlp_command(youtube_url),
+            stdout=write_fd,
+            stderr=asyncio.subprocess.PIPE
+        )
+        ffmpeg_cmd, versions = build_ffmpeg_command("pipe:0", output_dir, video_id, source_file=source_file)
+        try:
+            encoder = await asyncio.create_subprocess_exec(
+                *ffmpeg_cmd,
+                stdin=read_fd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except Exception:
+            downloader.kill()
+            await downloader.wait()
+            raise
+    finally:
+        # The children hold their own copies; closing ours lets FFmpeg see EOF
+        os.close(read_fd)
+        os.close(write_fd)
+    
+    progress = PipelineProgress(project_id)
+    try:
+        await asyncio.gather(
+            progress.read_download(downloader.stderr),
+            progress.read_transcode_progress(encoder.stdout),
+            progress.read_transcode_log(encoder.stderr)
+        )
+        download_code, encode_code = await asyncio.gather(downloader.wait(), encoder.wait())
+    except BaseException:
+        # Timeout or cancellation - make sure no orphaned processes keep running
+        for process in (downloader, encoder):
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        raise
+    
+    if download_code != 0:
+        raise RuntimeError(f"yt-dlp exited with {download_code}: {progress.last_download_error}")
+    if encode_code != 0:
+        raise RuntimeError(f"ffmpeg exited with {encode_code}: {progress.last_transcode_error}")
+    if not os.path.exists(source_file):
+        raise RuntimeError("ffmpeg did not write the source copy")
+    
+    return source_file, {platform: path for platform, path in versions.items() if os.path.exists(path)}
+
+class PipelineProgress:
+    """Parses yt-dlp and FFmpeg output into a combined task progress value"""
+    
+    # Task progress range covered by the streaming pipeline
+    START = 20
+    END = 95
+    
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self.download_percent = 0.0
+        self.transcode_percent = 0.0
+        self.duration: Optional[float] = None
+        self.last_download_error = ""
+        self.last_transcode_error = ""
+        self._last_reported = -1
+    
+    async def read_download(self, stream: asyncio.StreamReader):
+        """Track yt-dlp's "[download]  42.0% of ..." lines"""
+        async for raw_line in stream:
+            line = raw_line.decode(errors='ignore').strip()
+            match = YTDLP_PROGRESS_RE.search(line)
+            if match:
+                self.download_percent = min(100.0, float(match.group(1)))
+                await self._report()
+            elif line.startswith("ERROR"):
+                self.last_download_error = line
+    
+    async def read_transcode_progress(self, stream: asyncio.StreamReader):
+        """Track FFmpeg "-progress" key=value output"""
+        async for raw_line in stream:
+            key, _, value = raw_line.decode(errors='ignore').strip().partition('=')
+            if key == 'out_time_us' and value.isdigit() and self.duration:
+                self.transcode_percent = min(100.0, int(value) / 1_000_000 / self.duration * 100)
+                await self._report()
+            elif key == 'progress' and value == 'end':
+                self.transcode_percent = 100.0
+                await self._report()
+    
+    async def read_transcode_log(self, stream: asyncio.StreamReader):
+        """Pick the input duration and errors out of FFmpeg's log"""
+        async for raw_line in stream:
+            line = raw_line.decode(errors='ignore').strip()
+            match = FFMPEG_DURATION_RE.search(line)
+            if match and self.duration is None:
+                hours, minutes, seconds = match.groups()
+                self.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                # Outputs are capped, so progress is measured against the longest cut
+                self.duration = min(self.duration, max(s["max_duration"] for s in PLATFORM_VERSIONS.values()))
+            elif line:
+                self.last_transcode_error = line
+    
+    def combined_progress(self) -> int:
+        # Without a known duration the encoder can only be as far as the download
+        transcode = self.transcode_percent if self.duration else self.download_percent
+        fraction = (self.download_percent + transcode) / 200
+        return self.START + int((self.END - self.START) * fraction)
+    
+    async def _report(self):
+        progress = self.combined_progress()
+        if progress <= self._last_reported:
+            return
+        self._last_reported = progress
+        await update_task_state(self.project_id, {
+            "progress": progress,
+            "download_progress": round(self.download_percent, 1),
+            "transcode_progress": round(self.transcode_percent, 1),
+            "message": "Downloading and optimizing video..."
+        })
+
+async def probe_video(video_file: str) -> Dict[str, Any]:
+    """Read duration, resolution and frame rate with ffprobe without blocking the event loop"""
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe",
+        "-v", "quiet",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        video_file,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    
+    if process.returncode != 0:
+        raise Exception(f"Failed to analyze video: {stderr.decode(errors='ignore')}")
+    
+    probe = json.loads(stdout or b'{}')
+    video_stream = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'video'), {})
+    
+    fps = 0.0
+    rate = video_stream.get('avg_frame_rate', '0/0')
+    numerator, _, denominator = rate.partition('/')
+    try:
+        fps = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        pass
+    
+    return {
+        "duration": float(probe.get('format', {}).get('duration', 0) or 0),
+        "width": int(video_stream.get('width', 0) or 0),
+        "height": int(video_stream.get('height', 0) or 0),
+        "fps": round(fps, 2)
+    }
+
 async def simulate_youtube_processing(project_id: str, youtube_url: str):
     """Fallback simulated processing when yt-dlp is not available"""
     try:
@@ -182,7 +467,7 @@ async def simulate_youtube_processing(project_id: str, youtube_url: str):
             "message": "Downloading video from YouTube...",
             "updated_at": time.time()
         }
-        background_tasks[project_id].update(step1_data)
+        store_task_state(project_id, step1_data)
         await send_websocket_update(project_id, step1_data)
         
         await asyncio.sleep(1)
@@ -194,7 +479,7 @@ async def simulate_youtube_processing(project_id: str, youtube_url: str):
             "message": "Analyzing video content...",
             "updated_at": time.time()
         }
-        background_tasks[project_id].update(step2_data)
+        store_task_state(project_id, step2_data)
         await send_websocket_update(project_id, step2_data)
         
         await asyncio.sleep(1)
@@ -213,7 +498,7 @@ async def simulate_youtube_processing(project_id: str, youtube_url: str):
                 "ready": True
             }
         }
-        background_tasks[project_id].update(complete_data)
+        store_task_state(project_id, complete_data)
         await send_websocket_update(project_id, complete_data)
         
         print(f"✅ Simulated YouTube processing completed for project {project_id}")
@@ -229,56 +514,22 @@ async def simulate_youtube_processing(project_id: str, youtube_url: str):
         print(f"❌ Simulated YouTube processing failed for project {project_id}: {e}")
 
 async def create_platform_versions(video_file: str, output_dir: str, video_id: str) -> Dict[str, str]:
-    """Create optimized versions for different platforms"""
-    platforms = {
-        "tiktok": {
-            "aspect": "9:16",
-            "max_duration": 60,
-            "fps": 30,
-            "bitrate": "6M"
-        },
-        "instagram_reels": {
-            "aspect": "9:16", 
-            "max_duration": 90,
-            "fps": 30,
-            "bitrate": "5M"
-        },
-        "youtube_shorts": {
-            "aspect": "9:16",
-            "max_duration": 60,
-            "fps": 30,
-            "bitrate": "8M"
-        }
-    }
+    """Create optimized versions for different platforms from a local file"""
+    ffmpeg_cmd, versions = build_ffmpeg_command(video_file, output_dir, video_id)
     
-    versions = {}
-    
-    for platform, settings in platforms.items():
-        output_file = os.path.join(output_dir, f"{video_id}_{platform}.mp4")
-        
-        # FFmpeg command for platform optimization
-        ffmpeg_cmd = [
-            "ffmpeg",
-            "-i", video_file,
-            "-vf", f"scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2",
-            "-c:v", "libx264",
-            "-preset", "fast",
-            "-crf", "23",
-            "-c:a", "aac",
-            "-b:a", "128k",
-            "-movflags", "+faststart",
-            "-y",  # Overwrite output file
-            output_file
-        ]
-        
-        try:
-            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=300)
-            if result.returncode == 0:
-                versions[platform] = output_file
-        except Exception as e:
-            print(f"Failed to create {platform} version: {e}")
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *ffmpeg_cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout=300)
+        if process.returncode != 0:
+            print(f"Failed to create platform versions: {stderr.decode(errors='ignore')[-500:]}")
+    except Exception as e:
+        print(f"Failed to create platform versions: {e}")
     
-    return versions
+    return {platform: path for platform, path in versions.items() if os.path.exists(path)}
 
 def get_task_status(project_id: str) -> Dict[str, Any]:
     """Get the status of a background task"""
@@ -0,0 +1,475 @@
+"""Offline stand-in for the OpenAI, ElevenLabs and Replicate endpoints the API uses.
+
+Usage: python benchmarks/fake_providers.py [--port 8900] [--latency chat=lognormal:0.8:0.5]
+                                          [--error-rate 0.02] [--rate-limit-rate 0.01]
+                                          [--rpm 500] [--canned canned.json] [--seed 1]
+
+Point the API at it with OPENAI_BASE_URL=http://localhost:8900/v1,
+REPLICATE_BASE_URL=http://localhost:8900 and ELEVENLABS_BASE_URL=http://localhost:8900/v1
+(plus any non-empty OPENAI_API_KEY / REPLICATE_API_TOKEN / ELEVENLABS_API_KEY so the
+services take their real client path instead of the ``_mock_*`` branches).
+
+Latency is drawn per request from ``fixed:S``, ``uniform:LOW:HIGH``, ``normal:MEAN:SD``
+or ``lognormal:MEDIAN:SIGMA`` (seconds) for the groups chat, transcription, tts and
+replicate; streamed completions wait ``chat`` before the first chunk and ``chunk``
+between chunks. Injected failures use each provider's error shape, 429s carry
+Retry-After, and OpenAI responses include x-ratelimit-* headers computed from
+--rpm/--tpm. /_fake/stats reports what was served.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+LATENCY_GROUPS = ('chat', 'chunk', 'transcription', 'tts', 'replicate')
+
+DEFAULT_CANNED = {
+    # {"match": regex searched in the last user message, "content": str or JSON object}
+    'chat': [],
+    'chat_default': "This is a canned completion from the fake provider server.",
+    'chat_json_default': {
+        'script': "POV: you finally found the trick nobody talks about\n[0-3s] Hook\n[3-20s] Value\n[20-30s] Comment below!",
+        'title_suggestions': ["The trick nobody talks about", "Stop scrolling", "I wish I knew this sooner"],
+        'hooks': ["Wait for it...", "Nobody talks about this", "You've been doing it wrong"],
+        'caption': "The trick nobody talks about",
+        'hashtags': ["#fyp", "#viral", "#tips"],
+        'score': 72,
+        'viral_score': 72,
+        'explanation': "Strong hook and a clear payoff."
+    },
+    'transcription': "Hey everyone, today I'm sharing three tips that changed how I work. Let's get into it.",
+    # Replicate output per "owner/name" or version id; others get a placeholder file on this server
+    'replicate': {}
+}
+
+# 1x1 transparent PNG served for generated images and uploads we did not keep
+PLACEHOLDER_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz, ~26 ms)
+SILENT_MP3_FRAME = b'\xff\xfb\x90\x00' + b'\x00' * 413
+SPOKEN_CHARS_PER_SECOND = 15
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """``lognormal:0.8:0.5`` -> ('lognormal', (0.8, 0.5))"""
+    kind, *args = spec.split(':')
+    expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}
+    if kind not in expected or len(args) != expected[kind]:
+        raise ValueError(f"Invalid latency '{spec}'; use fixed:S, uniform:LOW:HIGH, normal:MEAN:SD or lognormal:MEDIAN:SIGMA")
+    return kind, tuple(float(a) for a in args)
+
+@dataclass
+class FakeProviderConfig:
+    latency: Dict[str, str] = field(default_factory=dict)
+    error_rate: float = 0.0          # Fraction of requests answered with a 5xx
+    rate_limit_rate: float = 0.0     # Fraction answered with a 429 regardless of --rpm
+    retry_after: float = 1.0
+    rpm: Optional[int] = None        # Per-provider requests per minute before real 429s
+    tpm: Optional[int] = None        # OpenAI tokens per minute before real 429s
+    chunk_chars: int = 12
+    seed: Optional[int] = None
+    canned: Dict[str, Any] = field(default_factory=dict)
+
+class FakeProviders:
+    """Shared state behind the fake endpoints: randomness, limits, predictions and stats"""
+
+    def __init__(self, config: FakeProviderConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.latency = {group: parse_latency(spec) for group, spec in config.latency.items()}
+        unknown = set(self.latency) - set(LATENCY_GROUPS)
+        if unknown:
+            raise ValueError(f"Unknown latency groups: {', '.join(sorted(unknown))}")
+        self.canned = {**DEFAULT_CANNED, **config.canned}
+        self._lock = threading.Lock()
+        self._windows: Dict[str, Deque[Tuple[float, int]]] = {}
+        self.predictions: Dict[str, Dict[str, Any]] = {}
+        self.files: Dict[str, Tuple[bytes, str]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def delay(self, group: str) -> float:
+        kind, args = self.latency.get(group, ('fixed', (0.0,)))
+        with self._lock:
+            if kind == 'fixed':
+                value = args[0]
+            elif kind == 'uniform':
+                value = self.rng.uniform(*args)
+            elif kind == 'normal':
+                value = self.rng.gauss(*args)
+            else:
+                value = args[0] * math.exp(self.rng.gauss(0, args[1]))
+        return max(0.0, value)
+
+    async def wait(self, group: str):
+        seconds = self.delay(group)
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    def count(self, route: str, outcome: str):
+        with self._lock:
+            route_stats = self.stats.setdefault(route, {})
+            route_stats[outcome] = route_stats.get(outcome, 0) + 1
+
+    def admit(self, provider: str, tokens: int = 0) -> Tuple[Optional[float], Dict[str, str]]:
+        """Apply the per-minute limits; returns (retry_after or None, rate limit headers)"""
+        config = self.config
+        with self._lock:
+            now = time.monotonic()
+            window = self._windows.setdefault(provider, deque())
+            while window and now - window[0][0] >= 60:
+                window.popleft()
+            used_requests = len(window)
+            used_tokens = sum(t for _, t in window)
+            reset = 60 - (now - window[0][0]) if window else 0.0
+
+            retry_after = None
+            if config.rpm and used_requests >= config.rpm:
+                retry_after = reset
+            elif provider == 'openai' and config.tpm and tokens and used_tokens + tokens > config.tpm:
+                retry_after = reset
+            elif self.rng.random() < config.rate_limit_rate:
+                retry_after = config.retry_after
+            else:
+                window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+
+        headers = {}
+        if provider == 'openai':
+            if config.rpm:
+                headers['x-ratelimit-limit-requests'] = str(config.rpm)
+                headers['x-ratelimit-remaining-requests'] = str(max(0, config.rpm - used_requests))
+                headers['x-ratelimit-reset-requests'] = f"{reset:.3f}s"
+            if config.tpm:
+                headers['x-ratelimit-limit-tokens'] = str(config.tpm)
+                headers['x-ratelimit-remaining-tokens'] = str(max(0, config.tpm - used_tokens))
+                headers['x-ratelimit-reset-tokens'] = f"{reset:.3f}s"
+        if retry_after is not None:
+            headers['retry-after'] = f"{max(retry_after, 0.001):.3f}"
+        return retry_after, headers
+
+    def fail(self) -> bool:
+        with self._lock:
+            return self.rng.random() < self.config.error_rate
+
+    def chat_content(self, body: Dict[str, Any]) -> str:
+        messages = body.get('messages') or []
+        prompt = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+        if not isinstance(prompt, str):
+            prompt = json.dumps(prompt)
+        content = None
+        for rule in self.canned['chat']:
+            if re.search(rule['match'], prompt):
+                content = rule['content']
+                break
+        if content is None:
+            json_mode = (body.get('response_format') or {}).get('type') == 'json_object'
+            content = self.canned['chat_json_default'] if json_mode else self.canned['chat_default']
+        return content if isinstance(content, str) else json.dumps(content)
+
+    def replicate_output(self, model: Optional[str], version: Optional[str], prediction_id: str, base_url: str) -> Any:
+        canned = self.canned['replicate']
+        output = canned.get(model) if model in canned else canned.get(version)
+        if output is None:
+            output = f"{base_url}files/{prediction_id}.png"
+        return output
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def openai_error(status: int, message: str, error_type: str, headers: Dict[str, str]) -> JSONResponse:
+    return JSONResponse({'error': {'message': message, 'type': error_type, 'param': None, 'code': None}},
+                        status_code=status, headers=headers)
+
+def detail_error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """Error body shape shared by ElevenLabs and Replicate"""
+    return JSONResponse({'detail': message}, status_code=status, headers=headers)
+
+def create_app(config: Optional[FakeProviderConfig] = None) -> FastAPI:
+    fake = FakeProviders(config or FakeProviderConfig())
+    app = FastAPI(title="Fake AI providers")
+    app.state.fake = fake
+
+    def injected_failure(route: str, provider: str, tokens: int = 0):
+        """Rate limit or server error response to send instead, plus headers for a success"""
+        retry_after, headers = fake.admit(provider, tokens)
+        if retry_after is not None:
+            fake.count(route, '429')
+            if provider == 'openai':
+                return openai_error(429, "Rate limit reached (fake provider)", 'requests', headers), headers
+            return detail_error(429, "Rate limit reached (fake provider)", headers), headers
+        if fake.fail():
+            fake.count(route, '500')
+            if provider == 'openai':
+                return openai_error(500, "The server had an error (fake provider)", 'server_error', headers), headers
+            return detail_error(500, "Internal server error (fake provider)"), headers
+        return None, headers
+
+    # --- OpenAI -------------------------------------------------------------
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_tokens = estimate_tokens(json.dumps(body.get('messages') or []))
+        error, headers = injected_failure('chat.completions', 'openai', prompt_tokens + (body.get('max_tokens') or 0))
+        if error is not None:
+            return error
+        content = fake.chat_content(body)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': estimate_tokens(content),
+                 'total_tokens': prompt_tokens + estimate_tokens(content)}
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get('model', 'gpt-4')
+        fake.count('chat.completions', 'stream' if body.get('stream') else '200')
+
+        if not body.get('stream'):
+            await fake.wait('chat')
+            return JSONResponse({
+                'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'logprobs': None,
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': usage
+            }, headers=headers)
+
+        include_usage = (body.get('stream_options') or {}).get('include_usage')
+
+        async def events():
+            def chunk(delta, finish_reason=None, chunk_usage=None):
+                choices = [] if delta is None else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+                return 'data: ' + json.dumps({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                    'choices': choices, 'usage': chunk_usage
+                }) + '\n\n'
+
+            await fake.wait('chat')
+            yield chunk({'role': 'assistant', 'content': ''})
+            size = max(1, fake.config.chunk_chars)
+            for start in range(0, len(content), size):
+                if start:
+                    await fake.wait('chunk')
+                yield chunk({'content': content[start:start + size]})
+            yield chunk({}, finish_reason='stop')
+            if include_usage:
+                yield chunk(None, chunk_usage=usage)
+            yield 'data: [DONE]\n\n'
+
+        return StreamingResponse(events(), media_type='text/event-stream', headers=headers)
+
+    @app.post("/v1/audio/transcriptions")
+    async def audio_transcriptions(file: UploadFile = File(...), model: str = Form('whisper-1'),
+                                   response_format: str = Form('json'), language: Optional[str] = Form(None)):
+        await file.read()
+        error, headers = injected_failure('audio.transcriptions', 'openai')
+        if error is not None:
+            return error
+        await fake.wait('transcription')
+        fake.count('audio.transcriptions', '200')
+
+        text = fake.canned['transcription']
+        words = text.split()
+        seconds_per_word = 0.4
+        duration = round(len(words) * seconds_per_word, 2)
+        if response_format == 'text':
+            return PlainTextResponse(text, headers=headers)
+        if response_format in ('srt', 'vtt'):
+            stamp = '00:00:00,000' if response_format == 'srt' else '00:00:00.000'
+            end = f"00:00:{min(int(duration), 59):02d}" + (',000' if response_format == 'srt' else '.000')
+            cue = f"{stamp} --> {end}\n{text}\n"
+            body = f"1\n{cue}" if response_format == 'srt' else f"WEBVTT\n\n{cue}"
+            return PlainTextResponse(body, headers=headers)
+        if response_format != 'verbose_json':
+            return JSONResponse({'text': text}, headers=headers)
+
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+        segments, start = [], 0.0
+        for index, sentence in enumerate(sentences):
+            end = start + len(sentence.split()) * seconds_per_word
+            segments.append({'id': index, 'seek': 0, 'start': round(start, 2), 'end': round(end, 2), 'text': sentence,
+                             'tokens': [], 'temperature': 0.0, 'avg_logprob': -0.2, 'compression_ratio': 1.2,
+                             'no_speech_prob': 0.01})
+            start = end
+        return JSONResponse({
+            'task': 'transcribe', 'language': language or 'english', 'duration': duration, 'text': text,
+            'segments': segments,
+            'words': [{'word': word, 'start': round(i * seconds_per_word, 2), 'end': round((i + 1) * seconds_per_word, 2)}
+                      for i, word in enumerate(words)]
+        }, headers=headers)
+
+    # --- ElevenLabs ---------------------------------------------------------
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        body = await request.json()
+        error, _ = injected_failure('elevenlabs.tts', 'elevenlabs')
+        if error is not None:
+            return error
+        await fake.wait('tts')
+        fake.count('elevenlabs.tts', '200')
+        seconds = max(1.0, len(body.get('text', '')) / SPOKEN_CHARS_PER_SECOND)
+        frames = int(seconds / 0.026)
+        return Response(SILENT_MP3_FRAME * frames, media_type='audio/mpeg')
+
+    @app.get("/v1/voices")
+    async def list_voices():
+        error, _ = injected_failure('elevenlabs.voices', 'elevenlabs')
+        if error is not None:
+            return error
+        fake.count('elevenlabs.voices', '200')
+        return {'voices': [
+            {'voice_id': '21m00Tcm4TlvDq8ikWAM', 'name': 'Rachel', 'category': 'premade', 'labels': {'accent': 'american'}},
+            {'voice_id': 'AZnzlk1XvdvUeBnXmlld', 'name': 'Domi', 'category': 'premade', 'labels': {'accent': 'american'}}
+        ]}
+
+    @app.post("/v1/voices/add")
+    async def add_voice(name: str = Form(...), files: List[UploadFile] = File(...)):
+        error, _ = injected_failure('elevenlabs.voices.add', 'elevenlabs')
+        if error is not None:
+            return error
+        await fake.wait('tts')
+        fake.count('elevenlabs.voices.add', '200')
+        return {'voice_id': f"fake-{uuid.uuid4().hex[:16]}", 'requires_verification': False}
+
+    # --- Replicate ----------------------------------------------------------
+
+    def prediction_body(prediction: Dict[str, Any]) -> Dict[str, Any]:
+        ready = time.monotonic() >= prediction['ready_at']
+        return {
+            **prediction['public'],
+            'status': 'succeeded' if ready else 'processing',
+            'output': prediction['output'] if ready else None,
+            'completed_at': prediction['public']['created_at'] if ready else None,
+            'metrics': {'predict_time': prediction['predict_time']} if ready else {}
+        }
+
+    async def create_prediction(request: Request, model: Optional[str], version: Optional[str]):
+        body = await request.json()
+        error, _ = injected_failure('replicate.predictions', 'replicate')
+        if error is not None:
+            return error
+        prediction_id = uuid.uuid4().hex[:20]
+        predict_time = fake.delay('replicate')
+        base_url = str(request.base_url)
+        prediction = {
+            'ready_at': time.monotonic() + predict_time,
+            'predict_time': round(predict_time, 3),
+            'output': fake.replicate_output(model, version, prediction_id, base_url),
+            'public': {
+                'id': prediction_id, 'model': model or '', 'version': version or '', 'input': body.get('input') or {},
+                'logs': '', 'error': None, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'urls': {'get': f"{base_url}v1/predictions/{prediction_id}",
+                         'cancel': f"{base_url}v1/predictions/{prediction_id}/cancel"}
+            }
+        }
+        fake.predictions[prediction_id] = prediction
+        fake.count('replicate.predictions', '201')
+        # "Prefer: wait=N" blocks up to N seconds (60 by default) for the result
+        prefer = re.match(r'wait(?:=(\d+))?$', request.headers.get('prefer', ''))
+        if prefer:
+            await asyncio.sleep(min(predict_time, float(prefer.group(1) or 60)))
+        return JSONResponse(prediction_body(prediction), status_code=201)
+
+    @app.post("/v1/predictions")
+    async def predictions(request: Request):
+        body = await request.json()
+        # A bare version id does not name the model; canned outputs may be keyed by either
+        return await create_prediction(request, None, body.get('version'))
+
+    @app.post("/v1/models/{owner}/{name}/predictions")
+    async def model_predictions(owner: str, name: str, request: Request):
+        return await create_prediction(request, f"{owner}/{name}", None)
+
+    @app.get("/v1/predictions/{prediction_id}")
+    async def get_prediction(prediction_id: str):
+        prediction = fake.predictions.get(prediction_id)
+        if prediction is None:
+            return detail_error(404, "Not found.")
+        fake.count('replicate.predictions.get', '200')
+        return prediction_body(prediction)
+
+    @app.get("/v1/models/{owner}/{name}/versions/{version_id}")
+    async def get_version(owner: str, name: str, version_id: str):
+        return {'id': version_id, 'created_at': '2024-01-01T00:00:00Z', 'cog_version': '0.9.0',
+                'openapi_schema': {'components': {'schemas': {'Output': {'type': 'string', 'format': 'uri'}}}}}
+
+    @app.post("/v1/files")
+    async def upload_file(request: Request, content: UploadFile = File(...)):
+        data = await content.read()
+        file_id = uuid.uuid4().hex[:20]
+        fake.files[file_id] = (data, content.content_type or 'application/octet-stream')
+        fake.count('replicate.files', '201')
+        base_url = str(request.base_url)
+        return JSONResponse({
+            'id': file_id, 'name': content.filename or file_id, 'content_type': content.content_type,
+            'size': len(data), 'etag': file_id, 'checksums': {}, 'metadata': {},
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'expires_at': None,
+            'urls': {'get': f"{base_url}files/{file_id}"}
+        }, status_code=201)
+
+    @app.get("/files/{name}")
+    async def download_file(name: str):
+        data, content_type = fake.files.get(name, (PLACEHOLDER_PNG, 'image/png'))
+        return Response(data, media_type=content_type)
+
+    # --- Introspection ------------------------------------------------------
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {'routes': fake.stats, 'predictions': len(fake.predictions), 'files': len(fake.files)}
+
+    @app.post("/_fake/reset")
+    async def reset():
+        fake.stats.clear()
+        fake.predictions.clear()
+        fake.files.clear()
+        fake._windows.clear()
+        return {'reset': True}
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', action='append', default=[], metavar='GROUP=SPEC',
+                        help=f"Latency per group ({', '.join(LATENCY_GROUPS)}), e.g. chat=lognormal:0.8:0.5")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--rpm', type=int)
+    parser.add_argument('--tpm', type=int)
+    parser.add_argument('--chunk-chars', type=int, default=12)
+    parser.add_argument('--canned', help="JSON file overriding DEFAULT_CANNED entries")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    canned = {}
+    if args.canned:
+        with open(args.canned) as f:
+            canned = json.load(f)
+    config = FakeProviderConfig(
+        latency=dict(item.split('=', 1) for item in args.latency),
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        rpm=args.rpm, tpm=args.tpm, chunk_chars=args.chunk_chars, seed=args.seed, canned=canned
+    )
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level='warning')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Login latency benchmark for AuthService at different user counts.
+
+Usage: python benchmarks/login_benchmark.py [--sizes 10000,100000,1000000]
+
+Every synthetic user shares one password hash so setup does not pay for a
+million bcrypt rounds. Reported figures are the email lookup on its own
+(indexed vs. the previous linear scan) and a full ``login_user`` call, whose
+time is dominated by bcrypt verification once the lookup is O(1).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.auth import auth_service, users_db, users_by_email, UserLogin
+
+PASSWORD = "benchmark-pass-123"
+
+def populate(count: int, password_hash: str):
+    users_db.clear()
+    users_by_email.clear()
+    now = datetime.now(timezone.utc)
+    for index in range(count):
+        auth_service._add_user({
+            'id': f"user-{index}",
+            'email': f"user{index}@example.com",
+            'password_hash': password_hash,
+            'brand': 'viralsplit',
+            'created_at': now,
+            'updated_at': now
+        })
+
+def linear_scan(email: str):
+    """The lookup login_user used before the email index"""
+    for user in users_db.values():
+        if user['email'].lower() == email.lower().strip():
+            return user
+    return None
+
+def time_calls(fn, args_list) -> list:
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def summarize(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50={statistics.median(samples):.4f}ms p99={p99:.4f}ms"
+
+def run(count: int, password_hash: str, lookups: int, logins: int):
+    populate(count, password_hash)
+    # Random probes so the scan baseline sees the average, not the best, case
+    rng = random.Random(count)
+    emails = [f"user{rng.randrange(count)}@example.com" for _ in range(lookups)]
+
+    indexed = time_calls(auth_service.find_user_by_email, [(e,) for e in emails])
+    scanned = time_calls(linear_scan, [(e,) for e in emails[:max(1, lookups // 20)]])
+
+    login_samples = []
+    for email in emails[:logins]:
+        start = time.perf_counter()
+        asyncio.run(auth_service.login_user(UserLogin(email=email, password=PASSWORD)))
+        login_samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"{count:>9,} users | lookup indexed {summarize(indexed)} | "
+          f"lookup scan {summarize(scanned)} | login {summarize(login_samples)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--logins', type=int, default=20)
+    args = parser.parse_args()
+
+    password_hash = auth_service.hash_password(PASSWORD)
+    for size in (int(s) for s in args.sizes.split(',')):
+        run(size, password_hash, args.lookups, args.logins)
+
+if __name__ == '__main__':
+    main()
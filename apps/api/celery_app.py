@@ -1,6 +1,8 @@
 from celery import Celery
+from kombu import Queue
 import os
 from dotenv import load_dotenv
+from job_scheduler import TIER_WEIGHTS, video_queue_name
 
 load_dotenv()
 
@@ -12,6 +14,12 @@ celery_app = Celery(
     include=['main']
 )
 
+def route_video_task(name, args, kwargs, options, task=None, **kw):
+    """Route video jobs to their subscription tier's queue"""
+    if name == 'main.transform_video_task':
+        return {'queue': video_queue_name((kwargs or {}).get('tier'))}
+    return None
+
 # Configure celery
 celery_app.conf.update(
     task_serializer='json',
@@ -19,10 +27,15 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
-    task_routes={
-        'main.transform_video_task': {'queue': 'video_processing'}
-    }
+    # One queue per tier; workers list them with -Q in priority order
+    task_queues=[Queue('video_processing')] + [
+        Queue(video_queue_name(tier)) for tier in TIER_WEIGHTS
+    ],
+    task_routes=(route_video_task,),
+    # Don't let a worker reserve jobs ahead of the scheduler's fair ordering
+    worker_prefetch_multiplier=1,
+    task_acks_late=True
 )
 
 if __name__ == '__main__':
-    celery_app.start()
\ No newline at end of file
+    celery_app.start()
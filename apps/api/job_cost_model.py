@@ -0,0 +1,136 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from services.video_processor import VideoProcessor
+
+# Reference encode: 1080x1920 at 30fps
+REFERENCE_PIXELS = 1080 * 1920
+REFERENCE_FPS = 30
+
+# Defaults used when a project has not been probed yet
+DEFAULT_VIDEO_INFO = {
+    'duration': 30.0,
+    'width': 1920,
+    'height': 1080,
+    'fps': 30.0
+}
+
+# Relative cost of the optional operations that can be requested with a job
+OPERATION_MULTIPLIERS = {
+    'remove_background': 4.0,
+    'upscale_quality': 3.0,
+    'enhance_face': 2.0,
+    'stabilize_video': 2.0,
+    'add_subtitles': 1.5,
+    'color_grade': 1.3,
+    'fix_lighting': 1.2,
+    'denoise_audio': 1.1,
+    'auto_crop': 1.1,
+    'speed_optimize': 1.0
+}
+
+# Prior calibration: fixed overhead plus seconds per reference-second of output
+PRIOR_OVERHEAD_SECONDS = 5.0
+PRIOR_SECONDS_PER_UNIT = 0.5
+
+@dataclass
+class JobEstimate:
+    work_units: float
+    seconds: float
+    video_info: Dict[str, Any] = field(default_factory=dict)
+
+class JobCostModel:
+    """Estimates video job processing time from probe metadata.
+
+    A job's work is measured in reference units - one second of 1080x1920,
+    30fps output - summed over the requested platforms and scaled by the
+    requested operations. Processing time is modelled as
+    ``overhead + seconds_per_unit * work`` and both coefficients are fitted
+    online from observed job timings with exponentially weighted least squares.
+    """
+
+    def __init__(self, decay: float = 0.98, min_samples: int = 5):
+        self.decay = decay
+        self.min_samples = min_samples
+        self.overhead = PRIOR_OVERHEAD_SECONDS
+        self.seconds_per_unit = PRIOR_SECONDS_PER_UNIT
+        self.samples = 0
+        # Weighted sums for the regression of seconds on work units
+        self._w = 0.0
+        self._sx = 0.0
+        self._sy = 0.0
+        self._sxx = 0.0
+        self._sxy = 0.0
+
+    def work_units(self, video_info: Optional[Dict[str, Any]], platforms: List[str], operations: Optional[List[str]] = None) -> float:
+        info = {**DEFAULT_VIDEO_INFO, **{k: v for k, v in (video_info or {}).items() if v}}
+        duration = float(info['duration'])
+        input_scale = (info['width'] * info['height']) / REFERENCE_PIXELS
+        input_fps = float(info['fps']) or REFERENCE_FPS
+
+        units = 0.0
+        for platform in platforms:
+            spec = VideoProcessor.PLATFORM_SPECS.get(platform)
+            if not spec:
+                continue
+            output_seconds = min(duration, spec.get('duration', duration))
+            width, height = spec.get('resolution', (1080, 1920))
+            output_scale = (width * height) / REFERENCE_PIXELS
+            fps_scale = min(input_fps, spec.get('fps', REFERENCE_FPS)) / REFERENCE_FPS
+            # Decoding scales with the source, encoding with the output
+            units += output_seconds * fps_scale * (0.3 * input_scale + 0.7 * output_scale)
+
+        multiplier = 1.0
+        for operation in operations or []:
+            multiplier *= OPERATION_MULTIPLIERS.get(operation, 1.0)
+
+        return units * multiplier
+
+    def estimate(self, video_info: Optional[Dict[str, Any]], platforms: List[str], operations: Optional[List[str]] = None) -> JobEstimate:
+        units = self.work_units(video_info, platforms, operations)
+        return JobEstimate(
+            work_units=units,
+            seconds=round(self.predict(units), 1),
+            video_info={**DEFAULT_VIDEO_INFO, **(video_info or {})}
+        )
+
+    def predict(self, work_units: float) -> float:
+        return max(1.0, self.overhead + self.seconds_per_unit * work_units)
+
+    def observe(self, work_units: float, actual_seconds: float):
+        """Update the calibration with a finished job's timing"""
+        if actual_seconds <= 0:
+            return
+
+        self._w = self._w * self.decay + 1
+        self._sx = self._sx * self.decay + work_units
+        self._sy = self._sy * self.decay + actual_seconds
+        self._sxx = self._sxx * self.decay + work_units * work_units
+        self._sxy = self._sxy * self.decay + work_units * actual_seconds
+        self.samples += 1
+
+        if self.samples < self.min_samples:
+            return
+
+        mean_x = self._sx / self._w
+        mean_y = self._sy / self._w
+        variance = self._sxx / self._w - mean_x * mean_x
+        if variance > 1e-9:
+            slope = (self._sxy / self._w - mean_x * mean_y) / variance
+            if slope > 0:
+                self.seconds_per_unit = slope
+                self.overhead = max(0.0, mean_y - slope * mean_x)
+                return
+
+        # All jobs looked alike - fall back to rescaling the current slope
+        if mean_x > 0:
+            self.seconds_per_unit = max(1e-3, (mean_y - self.overhead) / mean_x)
+
+    def get_calibration(self) -> Dict[str, Any]:
+        return {
+            'overhead_seconds': round(self.overhead, 3),
+            'seconds_per_unit': round(self.seconds_per_unit, 4),
+            'samples': self.samples
+        }
+
+# Global cost model instance
+job_cost_model = JobCostModel()
@@ -0,0 +1,544 @@
+import asyncio
+import bisect
+import itertools
+import json
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+from job_cost_model import job_cost_model
+
+# Relative share of dispatch slots each subscription tier receives when all
+# tiers have work waiting. Every tier has a non-zero weight so lower tiers
+# keep making progress under load.
+TIER_WEIGHTS = {
+    'enterprise': 8,
+    'team': 4,
+    'pro': 2,
+    'free': 1,
+    'trial': 1
+}
+
+# Maximum number of jobs a single user may have running at once, per tier
+USER_CONCURRENCY_LIMITS = {
+    'enterprise': 8,
+    'team': 4,
+    'pro': 2,
+    'free': 1,
+    'trial': 1
+}
+
+DEFAULT_TIER = 'free'
+MAX_RUNNING_JOBS = int(os.getenv('VIDEO_MAX_RUNNING_JOBS', '8'))
+WAIT_SAMPLE_SIZE = 1000  # Recent wait times kept per tier for percentiles
+
+# Redis holding the scheduler lease and hand-off list (defaults to REDIS_URL;
+# empty keeps every submission in this process)
+SCHEDULER_LOCK_URL = os.getenv('VIDEO_SCHEDULER_LOCK_URL', os.getenv('REDIS_URL', ''))
+SCHEDULER_LEASE_SECONDS = float(os.getenv('VIDEO_SCHEDULER_LEASE_SECONDS', '30'))
+
+def video_queue_name(tier: str) -> str:
+    """Celery queue that carries jobs for a subscription tier"""
+    return f"video_processing.{tier if tier in TIER_WEIGHTS else DEFAULT_TIER}"
+
+@dataclass
+class VideoJob:
+    job_id: str
+    project_id: str
+    user_id: str
+    tier: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = 'queued'
+    estimated_seconds: float = 0.0  # Expected processing time from the cost model
+    work_units: float = 0.0
+    handle: Any = None  # Dispatcher-specific reference (e.g. Celery AsyncResult)
+    on_finished: Optional[Callable[['VideoJob'], None]] = None  # Called once with the final status set
+    meta: Dict[str, Any] = field(default_factory=dict)  # JSON data for completion hooks (e.g. reservation_id)
+
+    # Fields that travel with a job handed to the scheduler in another process
+    FORWARDED_FIELDS = ('job_id', 'project_id', 'user_id', 'tier', 'payload', 'enqueued_at',
+                        'estimated_seconds', 'work_units', 'meta')
+
+    def to_json(self) -> str:
+        return json.dumps({name: getattr(self, name) for name in self.FORWARDED_FIELDS})
+
+    @classmethod
+    def from_json(cls, raw) -> 'VideoJob':
+        return cls(**{name: value for name, value in json.loads(raw).items() if name in cls.FORWARDED_FIELDS})
+
+class SchedulerUnavailableError(RuntimeError):
+    """Raised when a job can neither be queued here nor handed to the scheduler's owner"""
+
+# Extend or release the lease only if this process still holds it
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class SchedulerLease:
+    """Redis lease naming the API process that owns the video scheduler,
+    plus the list other processes hand their submissions to.
+
+    The lease is taken with SET NX and renewed by the dispatch loop, so if the
+    owner dies another process takes over after ``ttl`` seconds. Uses
+    ``redis.asyncio`` so no call blocks the event loop.
+    """
+
+    KEY = 'video_scheduler:owner'
+    SUBMISSIONS_KEY = 'video_scheduler:submissions'
+
+    def __init__(self, client, ttl: float = SCHEDULER_LEASE_SECONDS):
+        self.client = client
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._renew = client.register_script(_RENEW_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    async def acquire(self) -> bool:
+        """Take or extend the lease; False while another process holds it"""
+        ttl_ms = int(self.ttl * 1000)
+        if await self.client.set(self.KEY, self.owner, nx=True, px=ttl_ms):
+            return True
+        return bool(await self._renew(keys=[self.KEY], args=[self.owner, ttl_ms]))
+
+    async def release(self):
+        await self._release(keys=[self.KEY], args=[self.owner])
+
+    async def forward(self, jobs: List[VideoJob]):
+        """Hand jobs to whichever process holds the lease"""
+        if jobs:
+            await self.client.rpush(self.SUBMISSIONS_KEY, *[job.to_json() for job in jobs])
+
+    async def take_forwarded(self, count: int = 100) -> List[VideoJob]:
+        raw = await self.client.lpop(self.SUBMISSIONS_KEY, count) or []
+        return [VideoJob.from_json(item) for item in raw]
+
+def create_scheduler_lease(url: str = SCHEDULER_LOCK_URL) -> Optional[SchedulerLease]:
+    if not url:
+        return None
+    import redis.asyncio as aioredis
+    return SchedulerLease(aioredis.from_url(url, socket_timeout=5))
+
+class VideoJobScheduler:
+    """Tier-aware admission control in front of the video workers.
+
+    Jobs wait here in one queue per subscription tier instead of piling up in
+    the broker. Tiers are served with smooth weighted round-robin, and a job is
+    only eligible while its owner is under the per-user concurrency cap, so a
+    single batch upload cannot take every worker slot.
+
+    Within a tier, jobs are ordered shortest-expected-job-first using their
+    cost model estimate. The key is ``enqueued_at + estimated_seconds`` so a
+    long job is overtaken only by short jobs that arrive before its virtual
+    deadline, which keeps it from starving.
+
+    Queue and running state lives in the memory of one process. With a
+    ``lease`` (any multi-worker deployment) every process accepts jobs through
+    ``enqueue``, but only the lease holder keeps queues: the others push their
+    jobs onto a Redis list that the holder's dispatch loop drains, so tier
+    shares and per-user caps are applied once for the whole deployment.
+    Completion hooks of forwarded jobs run in the holder, so they are rebuilt
+    from ``job.meta`` by ``on_job_finished`` rather than closures.
+
+    On ``shutdown`` the holder hands its queued jobs back to the list for the
+    next holder; without Redis they are cancelled so their hooks release any
+    held credits. Jobs already running when ownership moves are not counted
+    against the new holder's caps.
+    """
+
+    def __init__(
+        self,
+        tier_weights: Optional[Dict[str, int]] = None,
+        user_limits: Optional[Dict[str, int]] = None,
+        max_running: int = MAX_RUNNING_JOBS,
+        cost_model=None,
+        lease: Optional[SchedulerLease] = None,
+        on_job_finished: Optional[Callable[[VideoJob], None]] = None
+    ):
+        self.tier_weights = dict(tier_weights or TIER_WEIGHTS)
+        self.user_limits = dict(user_limits or USER_CONCURRENCY_LIMITS)
+        self.max_running = max_running
+        self.cost_model = cost_model
+        self.lease = lease
+        self.on_job_finished = on_job_finished  # Hook for jobs without their own ``on_finished``
+        self._lease_checked_at = 0.0
+        self._lease_held = False
+        self._forwarded = 0
+
+        # Per-tier lists of (sort_key, sequence, job), kept sorted
+        self._queues: Dict[str, List] = {tier: [] for tier in self.tier_weights}
+        self._current_weight: Dict[str, int] = {tier: 0 for tier in self.tier_weights}
+        self._sequence = itertools.count()
+        self._running: Dict[str, VideoJob] = {}
+        self._running_per_user: Dict[str, int] = {}
+        self._wait_samples: Dict[str, Deque[float]] = {
+            tier: deque(maxlen=WAIT_SAMPLE_SIZE) for tier in self.tier_weights
+        }
+        self._dispatched: Dict[str, int] = {tier: 0 for tier in self.tier_weights}
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._dispatch: Optional[Callable[[VideoJob], Any]] = None
+        self._is_finished: Optional[Callable[[VideoJob], Optional[str]]] = None
+
+    def _normalize_tier(self, tier: Optional[str]) -> str:
+        return tier if tier in self.tier_weights else DEFAULT_TIER
+
+    def _sort_key(self, job: VideoJob) -> float:
+        """Ordering within a tier (shortest expected job first, with aging)"""
+        return job.enqueued_at + job.estimated_seconds
+
+    def owns_lease(self) -> bool:
+        """Whether this process holds the queues, as of the dispatch loop's last renewal.
+
+        Never does I/O; always True without a lease.
+        """
+        return self.lease is None or self._lease_held
+
+    async def _renew_lease(self):
+        """Take or extend the lease; only called from the dispatch loop"""
+        now = time.time()
+        # Renew a third of the way into the lease instead of on every pass
+        if now - self._lease_checked_at < self.lease.ttl / 3:
+            return
+        held = self._lease_held
+        try:
+            self._lease_held = await self.lease.acquire()
+        except Exception as e:
+            print(f"Video scheduler lease check failed: {e}")
+            self._lease_held = False
+        self._lease_checked_at = now
+        if held and not self._lease_held:
+            print("Video scheduler lease lost, handing queued jobs to the new owner")
+            await self._hand_off_queued()
+
+    async def enqueue(self, job: VideoJob) -> VideoJob:
+        """Queue a job here if this process owns the scheduler, otherwise forward it to the owner"""
+        if self.owns_lease():
+            return self.submit(job)
+        try:
+            await self.lease.forward([job])
+        except Exception as e:
+            raise SchedulerUnavailableError(f"Could not hand the job to the video scheduler: {e}") from e
+        job.status = 'forwarded'
+        self._forwarded += 1
+        return job
+
+    def submit(self, job: VideoJob) -> VideoJob:
+        """Queue a job for its tier and wake the dispatcher"""
+        job.tier = self._normalize_tier(job.tier)
+        job.status = 'queued'
+        bisect.insort(self._queues[job.tier], (self._sort_key(job), next(self._sequence), job))
+        self._notify()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a queued job. Running jobs are left to finish."""
+        for tier, queue in self._queues.items():
+            for index, (_, _, job) in enumerate(queue):
+                if job.job_id == job_id:
+                    queue.pop(index)
+                    job.status = 'cancelled'
+                    self._finished(job)
+                    return True
+        return False
+
+    def _user_has_capacity(self, job: VideoJob) -> bool:
+        limit = self.user_limits.get(job.tier, 1)
+        return self._running_per_user.get(job.user_id, 0) < limit
+
+    def _peek_eligible(self, tier: str) -> Optional[int]:
+        """Index of the best job in a tier whose owner is under the cap"""
+        for index, (_, _, job) in enumerate(self._queues[tier]):
+            if self._user_has_capacity(job):
+                return index
+        return None
+
+    def next_job(self) -> Optional[VideoJob]:
+        """Pick the next job to run and mark it as running.
+
+        Returns None when the worker pool is full or nothing is eligible.
+        """
+        if len(self._running) >= self.max_running:
+            return None
+
+        candidates = {}
+        for tier in self.tier_weights:
+            if self._queues[tier]:
+                index = self._peek_eligible(tier)
+                if index is not None:
+                    candidates[tier] = index
+
+        if not candidates:
+            return None
+
+        # Smooth weighted round-robin across tiers that have eligible work
+        total = 0
+        for tier in candidates:
+            self._current_weight[tier] += self.tier_weights[tier]
+            total += self.tier_weights[tier]
+        tier = max(candidates, key=lambda t: self._current_weight[t])
+        self._current_weight[tier] -= total
+
+        _, _, job = self._queues[tier].pop(candidates[tier])
+
+        job.status = 'running'
+        job.started_at = time.time()
+        self._running[job.job_id] = job
+        self._running_per_user[job.user_id] = self._running_per_user.get(job.user_id, 0) + 1
+        self._wait_samples[tier].append(job.started_at - job.enqueued_at)
+        self._dispatched[tier] += 1
+        return job
+
+    def complete(self, job_id: str, status: str = 'completed') -> Optional[VideoJob]:
+        """Release a running job's slot"""
+        job = self._running.pop(job_id, None)
+        if not job:
+            return None
+
+        job.status = status
+        job.finished_at = time.time()
+        if self.cost_model and status == 'completed' and job.work_units:
+            self.cost_model.observe(job.work_units, job.finished_at - job.started_at)
+        remaining = self._running_per_user.get(job.user_id, 1) - 1
+        if remaining > 0:
+            self._running_per_user[job.user_id] = remaining
+        else:
+            self._running_per_user.pop(job.user_id, None)
+
+        self._finished(job)
+        self._notify()
+        return job
+
+    def _finished(self, job: VideoJob):
+        hook = job.on_finished or self.on_job_finished
+        if hook is None:
+            return
+        try:
+            hook(job)
+        except Exception as e:
+            print(f"Video job completion hook failed for {job.job_id}: {e}")
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Position of a queued job within its tier (0 = next)"""
+        for queue in self._queues.values():
+            for position, (_, _, job) in enumerate(queue):
+                if job.job_id == job_id:
+                    return position
+        return None
+
+    def estimate_eta(self, job_id: str) -> Optional[Dict[str, float]]:
+        """Expected queue wait and processing time for a job"""
+        now = time.time()
+        running = self._running.get(job_id)
+        if running:
+            remaining = max(0.0, running.estimated_seconds - (now - running.started_at))
+            return {'queue_seconds': 0.0, 'processing_seconds': round(remaining, 1), 'eta_seconds': round(remaining, 1)}
+
+        for tier, queue in self._queues.items():
+            ahead = 0.0
+            for _, _, job in queue:
+                if job.job_id == job_id:
+                    # Share of the worker pool this tier gets while others are busy
+                    active_weight = sum(self.tier_weights[t] for t, q in self._queues.items() if q) or 1
+                    slots = max(1.0, self.max_running * self.tier_weights[tier] / active_weight)
+                    queue_seconds = ahead / slots
+                    return {
+                        'queue_seconds': round(queue_seconds, 1),
+                        'processing_seconds': round(job.estimated_seconds, 1),
+                        'eta_seconds': round(queue_seconds + job.estimated_seconds, 1)
+                    }
+                ahead += job.estimated_seconds
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, running jobs and wait-time percentiles per tier"""
+        tiers = {}
+        for tier in self.tier_weights:
+            samples = sorted(self._wait_samples[tier])
+            tiers[tier] = {
+                'queued': len(self._queues[tier]),
+                'running': sum(1 for job in self._running.values() if job.tier == tier),
+                'dispatched': self._dispatched[tier],
+                'weight': self.tier_weights[tier],
+                'wait_seconds': {
+                    'p50': _percentile(samples, 50),
+                    'p90': _percentile(samples, 90),
+                    'p99': _percentile(samples, 99),
+                    'samples': len(samples)
+                }
+            }
+
+        return {
+            'tiers': tiers,
+            'running': len(self._running),
+            'max_running': self.max_running,
+            'users_running': len(self._running_per_user),
+            'owner': self.owns_lease(),
+            'forwarded': self._forwarded,
+            'cost_model': self.cost_model.get_calibration() if self.cost_model else None
+        }
+
+    def _take_queued(self) -> List[VideoJob]:
+        queued = [job for queue in self._queues.values() for _, _, job in queue]
+        for queue in self._queues.values():
+            queue.clear()
+        return queued
+
+    async def _hand_off_queued(self) -> List[VideoJob]:
+        """Push queued jobs back to the Redis list; returns the ones that could not be handed off"""
+        queued = self._take_queued()
+        if self.lease is None or not queued:
+            return queued
+        try:
+            await self.lease.forward(queued)
+            return []
+        except Exception as e:
+            print(f"Video scheduler hand-off failed for {len(queued)} jobs: {e}")
+            return queued
+
+    async def shutdown(self) -> List[VideoJob]:
+        """Stop dispatching, hand queued jobs to the next owner and give up the lease.
+
+        Jobs that could not be handed off are cancelled and returned so
+        callers can mark their projects.
+        """
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+        cancelled = await self._hand_off_queued()
+        for job in cancelled:
+            job.status = 'cancelled'
+            self._finished(job)
+
+        if self.lease is not None and self._lease_held:
+            try:
+                await self.lease.release()
+            except Exception as e:
+                print(f"Video scheduler lease release failed: {e}")
+            self._lease_held = False
+        return cancelled
+
+    # ----- dispatch loop -----
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def ensure_running(
+        self,
+        dispatch: Callable[[VideoJob], Any],
+        is_finished: Optional[Callable[[VideoJob], Optional[str]]] = None,
+        poll_interval: float = 1.0
+    ):
+        """Start the dispatch loop on the current event loop if it is not running"""
+        self._dispatch = dispatch
+        self._is_finished = is_finished
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run(poll_interval))
+
+    async def _run(self, poll_interval: float):
+        while True:
+            self._wakeup.clear()
+            await self._reap_finished()
+
+            if self.lease is not None:
+                # A process that lost the lease stops dispatching
+                await self._renew_lease()
+                if self._lease_held:
+                    await self._take_submissions()
+
+            while self.owns_lease():
+                job = self.next_job()
+                if job is None:
+                    break
+                try:
+                    # Broker calls are blocking, keep them off the event loop
+                    job.handle = await asyncio.to_thread(self._dispatch, job)
+                except Exception as e:
+                    print(f"Video job dispatch failed for {job.job_id}: {e}")
+                    self.complete(job.job_id, status='failed')
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _take_submissions(self):
+        """Queue jobs other processes forwarded to this owner"""
+        try:
+            jobs = await self.lease.take_forwarded()
+        except Exception as e:
+            print(f"Video scheduler could not read forwarded jobs: {e}")
+            return
+        for job in jobs:
+            self.submit(job)
+
+    async def _reap_finished(self):
+        """Release slots for jobs the dispatcher reports as finished"""
+        if not self._is_finished or not self._running:
+            return
+        jobs = list(self._running.values())
+        statuses = await asyncio.to_thread(lambda: [self._finished_status(job) for job in jobs])
+        for job, status in zip(jobs, statuses):
+            if status:
+                self.complete(job.job_id, status=status)
+
+    def _finished_status(self, job: VideoJob) -> Optional[str]:
+        try:
+            return self._is_finished(job)
+        except Exception:
+            return None
+
+def _percentile(sorted_samples: List[float], percent: float) -> Optional[float]:
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(percent / 100 * (len(sorted_samples) - 1))))
+    return round(sorted_samples[index], 3)
+
+def celery_dispatcher(task):
+    """Dispatch/completion hooks that run scheduled jobs on a Celery task"""
+    def dispatch(job: VideoJob):
+        return task.apply_async(
+            kwargs=job.payload,
+            queue=video_queue_name(job.tier),
+            task_id=job.job_id
+        )
+
+    def is_finished(job: VideoJob) -> Optional[str]:
+        if job.handle is None or not job.handle.ready():
+            return None
+        return 'completed' if job.handle.successful() else 'failed'
+
+    return dispatch, is_finished
+
+def _create_scheduler() -> VideoJobScheduler:
+    try:
+        lease = create_scheduler_lease()
+    except Exception as e:
+        print(f"Video scheduler lease unavailable, keeping jobs in this process: {e}")
+        lease = None
+    return VideoJobScheduler(cost_model=job_cost_model, lease=lease)
+
+# Global scheduler instance (one per deployment, see VideoJobScheduler)
+video_scheduler = _create_scheduler()
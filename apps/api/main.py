@@ -1,4 +1,6 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, Response, WebSocket, WebSocketDisconnect, Header
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
@@ -6,14 +8,24 @@ import asyncio
 import uuid
 import os
 import tempfile
+import shutil
 import time
 import json
+import hashlib
 from datetime import datetime
 from celery import Celery
 from celery.result import AsyncResult
 from dotenv import load_dotenv
 from services.storage import R2Storage
 from services.video_processor import VideoProcessor
+from services.password_hasher import password_hasher
+from services.token_cache import token_cache
+from services.email_outbox import email_outbox
+from services.credit_ledger import credit_ledger
+from services.llm_cache import llm_cache
+from services.single_flight import single_flight
+from services.provider_governor import provider_governors
+from services.llm_accounting import llm_accounting, EndpointTagMiddleware
 from services.auth import (
     auth_service, UserCreate, UserLogin, SocialAccount, User,
     EmailVerificationRequest, VerifyEmailRequest, PasswordResetRequest,
@@ -52,6 +64,9 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
+# Tag LLM calls with the endpoint that made them
+app.add_middleware(EndpointTagMiddleware)
+
 # Initialize services
 storage_service = R2Storage()
 video_processor = VideoProcessor(storage=storage_service)
@@ -62,6 +77,12 @@ multilang_optimizer = MultiLanguageOptimizer()
 
 # Import Celery app
 from celery_app import celery_app
+from job_scheduler import video_scheduler, VideoJob, celery_dispatcher, SchedulerUnavailableError
+from job_cost_model import job_cost_model
+from project_repository import create_project_repository, LIST_FIELDS
+from progress_bus import progress_bus, publish_progress
+from sse_events import sse_progress_stream, format_sse
+from websocket_manager import ConnectionManager
 
 # Request/Response models
 class UploadRequest(BaseModel):
@@ -80,39 +101,44 @@ class SocialAccountRequest(BaseModel):
     access_token: str
     refresh_token: Optional[str] = None
 
-# In-memory project store (replace with database in production)
-projects_db = {}
+# Project store (SQLite by default, see PROJECTS_DATABASE_URL)
+projects_db = create_project_repository()
 
 # WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, project_id: str):
-        await websocket.accept()
-        self.active_connections[project_id] = websocket
-        print(f"🔌 WebSocket connected for project {project_id}")
-
-    def disconnect(self, project_id: str):
-        if project_id in self.active_connections:
-            del self.active_connections[project_id]
-            print(f"🔌 WebSocket disconnected for project {project_id}")
-
-    async def send_progress(self, project_id: str, data: dict):
-        if project_id in self.active_connections:
-            try:
-                await self.active_connections[project_id].send_json(data)
-                print(f"📡 Sent WebSocket update to {project_id}: {data.get('message', 'unknown')}")
-            except Exception as e:
-                print(f"❌ WebSocket send failed for {project_id}: {e}")
-                self.disconnect(project_id)
-
 manager = ConnectionManager()
 
 # Set the WebSocket manager in background tasks
-from background_tasks import set_websocket_manager
+from background_tasks import set_websocket_manager, get_task_status, wait_for_task_change
 set_websocket_manager(manager)
 
+@app.on_event("startup")
+async def start_progress_bus():
+    """Subscribe this process to progress updates published by workers"""
+    await progress_bus.start()
+    await email_outbox.start()
+
+@app.on_event("shutdown")
+async def stop_progress_bus():
+    await progress_bus.stop()
+    await email_outbox.stop()
+
+@app.on_event("startup")
+async def start_video_scheduler():
+    """Every process contends for the scheduler lease; the holder dispatches for all of them"""
+    video_scheduler.ensure_running(*celery_dispatcher(transform_video_task))
+
+@app.on_event("shutdown")
+async def stop_video_scheduler():
+    """Queued jobs go back to Redis for the next owner; jobs that cannot are cancelled and their credits released"""
+    for job in await video_scheduler.shutdown():
+        try:
+            projects_db.update(job.project_id, {
+                "status": "failed",
+                "error": "Server restarted before the job started, please resubmit"
+            })
+        except Exception as e:
+            print(f"Failed to mark project {job.project_id} after scheduler shutdown: {e}")
+
 # Application start time for metrics
 start_time = time.time()
 print("🚀 ViralSplit API starting with WebSocket support...")
@@ -141,11 +167,33 @@ async def get_metrics():
             "uptime": time.time() - start_time,
             "memory_usage": psutil.virtual_memory().percent,
             "cpu_usage": psutil.cpu_percent(),
+            "video_queue": video_scheduler.get_stats(),
+            "progress_bus": progress_bus.get_stats(),
+            "websockets": manager.get_stats(),
+            "password_hashing": password_hasher.get_stats(),
+            "token_cache": token_cache.get_stats(),
+            "email_outbox": email_outbox.get_stats(),
+            "credits": credit_ledger.get_stats(),
+            "llm_cache": llm_cache.get_stats(),
+            "single_flight": single_flight.get_stats(),
+            "ai_providers": provider_governors.get_stats(),
+            "llm_calls": llm_accounting.get_stats(),
             "timestamp": datetime.utcnow().isoformat()
         }
     except ImportError:
         return {
             "uptime": time.time() - start_time,
+            "video_queue": video_scheduler.get_stats(),
+            "progress_bus": progress_bus.get_stats(),
+            "websockets": manager.get_stats(),
+            "password_hashing": password_hasher.get_stats(),
+            "token_cache": token_cache.get_stats(),
+            "email_outbox": email_outbox.get_stats(),
+            "credits": credit_ledger.get_stats(),
+            "llm_cache": llm_cache.get_stats(),
+            "single_flight": single_flight.get_stats(),
+            "ai_providers": provider_governors.get_stats(),
+            "llm_calls": llm_accounting.get_stats(),
             "timestamp": datetime.utcnow().isoformat(),
             "note": "psutil not available for detailed metrics"
         }
@@ -409,6 +457,19 @@ async def update_user(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update user: {str(e)}")
 
+@app.delete("/api/admin/users/{user_id}")
+async def delete_user(
+    user_id: str,
+    admin_user: User = Depends(auth_service.get_current_user)
+):
+    """Delete user (admin only)"""
+    try:
+        return await auth_service.delete_user_admin(admin_user.id, user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete user: {str(e)}")
+
 @app.get("/api/admin/pending-users")
 async def get_pending_users(user: User = Depends(auth_service.get_current_user)):
     """Get users pending approval (admin only)"""
@@ -484,7 +545,7 @@ async def request_upload(
             "file_key": file_key,
             "file_size": request.file_size,
             "status": "pending_upload",
-            "created_at": asyncio.get_event_loop().time(),
+            "created_at": time.time(),
             "transformations": {},
             "is_trial": user is None
         }
@@ -524,8 +585,14 @@ async def complete_upload(
                 raise HTTPException(status_code=403, detail="Not authorized to access this project")
         
         # Update project status
-        project["status"] = "ready_for_processing"
-        project["upload_completed_at"] = asyncio.get_event_loop().time()
+        project = projects_db.update(project_id, {
+            "status": "ready_for_processing",
+            "upload_completed_at": time.time()
+        })
+        
+        # Probe the upload in the background so transform jobs get an accurate cost estimate
+        if shutil.which("ffprobe"):
+            asyncio.create_task(_probe_uploaded_video(project))
         
         return {
             "message": "Upload completed successfully",
@@ -538,6 +605,15 @@ async def complete_upload(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload completion failed: {str(e)}")
 
+async def _probe_uploaded_video(project: dict):
+    """Record duration/resolution/fps of an uploaded video for the job cost model"""
+    try:
+        from background_tasks import probe_video
+        video_info = await probe_video(storage_service.get_video_url(project["file_key"]))
+        projects_db.update(project["id"], {"video_info": video_info})
+    except Exception as e:
+        print(f"Video probe failed for project {project.get('id')}: {e}")
+
 # YouTube upload endpoint for trial users
 class YouTubeUploadRequest(BaseModel):
     url: str
@@ -573,18 +649,16 @@ async def upload_from_youtube(
             "user_id": user_id,
             "youtube_url": request.url,
             "status": "processing",
-            "created_at": asyncio.get_event_loop().time(),
+            "created_at": time.time(),
             "transformations": {},
-            "is_trial": user is None
+            "is_trial": user is None,
+            "task_id": f"background-{project_id}"
         }
         
         # Start FastAPI background task (no Celery dependency)
         from background_tasks import process_youtube_background
         asyncio.create_task(process_youtube_background(project_id, request.url, user_id, user is None))
         
-        # Update project with task ID
-        projects_db[project_id]["task_id"] = f"background-{project_id}"
-        
         return {
             "project_id": project_id,
             "task_id": f"background-{project_id}",
@@ -597,6 +671,22 @@ async def upload_from_youtube(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"YouTube processing failed: {str(e)}")
 
+def _settle_job_credits(job: VideoJob):
+    """Scheduler hook: charge a job's reserved credits if it completed, otherwise release them.
+
+    Runs in whichever process owns the scheduler, so the reservation id comes
+    from ``job.meta`` and the ledger is the shared one.
+    """
+    reservation_id = job.meta.get("reservation_id")
+    if not reservation_id:
+        return
+    if job.status == 'completed':
+        credit_ledger.commit(reservation_id)
+    else:
+        credit_ledger.release(reservation_id)
+
+video_scheduler.on_job_finished = _settle_job_credits
+
 @app.post("/api/projects/{project_id}/transform")
 async def transform_video(
     project_id: str,
@@ -621,36 +711,102 @@ async def transform_video(
             if project.get("user_id") != user.id:
                 raise HTTPException(status_code=403, detail="Not authorized to access this project")
             
-            # Check user credits (only for authenticated users)
+        # Hold credits until the job finishes (only for authenticated users)
+        reservation_id = None
+        if not project.get("is_trial"):
             credits_needed = len(request.platforms) * 10  # 10 credits per platform
-            if user.credits < credits_needed:
-                raise HTTPException(status_code=402, detail=f"Insufficient credits. Need {credits_needed}, have {user.credits}")
+            reservation_id = await auth_service.reserve_credits(user.id, credits_needed, reason=f"transform:{project_id}")
         
-        # Update project status
-        project["status"] = "processing"
-        project["platforms"] = request.platforms
-        project["options"] = request.options
-        
-        # Start background task (simplified for now)
-        project["task_id"] = f"transform-{project_id}"
+        try:
+            # Update project status
+            project = projects_db.update(project_id, {
+                "status": "processing",
+                "platforms": request.platforms,
+                "options": request.options
+            })
+            
+            # Estimate processing time from probe metadata for shortest-job-first ordering
+            video_info = project.get("video_info") or get_task_status(project_id).get("video_info")
+            estimate = job_cost_model.estimate(video_info, request.platforms, request.options.get("enhancements", []))
+            
+            # Queue behind the tier-aware scheduler, which dispatches to Celery
+            tier = user.subscription_tier if user else "trial"
+            job = await video_scheduler.enqueue(VideoJob(
+                job_id=f"transform-{project_id}",
+                project_id=project_id,
+                user_id=project["user_id"],
+                tier=tier,
+                estimated_seconds=estimate.seconds,
+                work_units=estimate.work_units,
+                payload={
+                    "project_id": project_id,
+                    "platforms": request.platforms,
+                    "options": request.options,
+                    "user_id": project["user_id"],
+                    "tier": tier
+                },
+                meta={"reservation_id": reservation_id}
+            ))
+        except Exception:
+            if reservation_id:
+                credit_ledger.release(reservation_id)
+            raise
+        video_scheduler.ensure_running(*celery_dispatcher(transform_video_task))
+        projects_db.update(project_id, {"task_id": job.job_id})
         
         return {
-            "task_id": f"transform-{project_id}",
+            "task_id": job.job_id,
             "status": "processing",
-            "platforms": request.platforms
+            "platforms": request.platforms,
+            "tier": job.tier,
+            "queue_position": video_scheduler.queue_position(job.job_id),
+            "eta": video_scheduler.estimate_eta(job.job_id)
         }
     
     except HTTPException:
         raise
+    except SchedulerUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transformation failed: {str(e)}")
 
+# Longest a status request may be held open waiting for a change
+STATUS_MAX_WAIT = 30
+
+def _status_etag(status: dict) -> str:
+    """Weak ETag over the job state; the ETA is derived and excluded"""
+    state = {k: v for k, v in status.items() if k != "eta"}
+    digest = hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+def _project_status(project_id: str, project: dict) -> dict:
+    # Kept current by the progress bus, so no result-backend lookup per poll
+    task_status = get_task_status(project_id)
+    return {
+        "status": task_status.get("status", project.get("status", "unknown")),
+        "progress": task_status.get("progress", project.get("progress", 0)),
+        "error": task_status.get("error", project.get("error")),
+        "project_id": project_id,
+        "youtube_url": project.get("youtube_url"),
+        "message": task_status.get("message", project.get("message", "")),
+        "created_at": project.get("created_at"),
+        "updated_at": task_status.get("updated_at", project.get("updated_at")),
+        "eta": video_scheduler.estimate_eta(project["task_id"]) if project.get("task_id") else None
+    }
+
 @app.get("/api/projects/{project_id}/status")
 async def get_project_status(
     project_id: str,
+    response: Response,
+    wait: int = 0,
+    if_none_match: Optional[str] = Header(None),
     user: Optional[User] = Depends(auth_service.get_current_user_optional)
 ):
-    """Get project status with user authentication"""
+    """Get project status with user authentication.
+
+    Responses carry an ETag; a matching If-None-Match returns 304. With
+    ``?wait=N`` (max 30s) a matching request is held until the state changes.
+    """
     try:
         project = projects_db.get(project_id)
         if not project:
@@ -667,35 +823,21 @@ async def get_project_status(
             if project.get("user_id") != user.id:
                 raise HTTPException(status_code=403, detail="Not authorized to access this project")
         
-        # Get task status if processing (simplified to avoid AsyncResult issues)
-        task_status = None
-        if project.get("task_id"):
-            try:
-                from celery.result import AsyncResult
-                task_result = AsyncResult(project["task_id"], app=celery_app)
-                task_status = {
-                    "state": task_result.state,
-                    "progress": task_result.info.get("progress", 0) if task_result.info else 0
-                }
-            except Exception as e:
-                print(f"Task status check failed: {e}")
-                task_status = None
+        status = _project_status(project_id, project)
+        etag = _status_etag(status)
         
-        # Get status from background task if available
-        from background_tasks import get_task_status
-        task_status = get_task_status(project_id)
+        wait = min(max(wait, 0), STATUS_MAX_WAIT)
+        if wait and if_none_match == etag:
+            if await wait_for_task_change(project_id, timeout=wait):
+                status = _project_status(project_id, project)
+                etag = _status_etag(status)
         
-        # Return simplified status for frontend
-        return {
-            "status": task_status.get("status", project.get("status", "unknown")),
-            "progress": task_status.get("progress", project.get("progress", 0)),
-            "error": task_status.get("error", project.get("error")),
-            "project_id": project_id,
-            "youtube_url": project.get("youtube_url"),
-            "message": task_status.get("message", project.get("message", "")),
-            "created_at": project.get("created_at"),
-            "updated_at": task_status.get("updated_at", project.get("updated_at"))
-        }
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return status
     
     except HTTPException:
         raise
@@ -703,19 +845,28 @@ async def get_project_status(
         raise HTTPException(status_code=500, detail=f"Failed to get project status: {str(e)}")
 
 @app.get("/api/projects")
-async def get_user_projects(user: User = Depends(auth_service.get_current_user)):
-    """Get all projects for the current user"""
+async def get_user_projects(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    fields: Optional[str] = None,
+    user: User = Depends(auth_service.get_current_user)
+):
+    """Get the current user's projects, newest first, one page at a time.
+
+    Pass the returned ``next_cursor`` to fetch the following page. ``fields``
+    is a comma-separated projection (default: list view fields).
+    """
     try:
-        user_projects = [
-            project for project in projects_db.values()
-            if project.get("user_id") == user.id
-        ]
-        
-        # Sort by creation date (newest first)
-        user_projects.sort(key=lambda x: x.get("created_at", 0), reverse=True)
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else LIST_FIELDS
+        user_projects, next_cursor = projects_db.list_for_user(
+            user.id, limit=limit, cursor=cursor, status=status, fields=field_list
+        )
         
-        return {"projects": user_projects}
+        return {"projects": user_projects, "next_cursor": next_cursor}
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get projects: {str(e)}")
 
@@ -724,6 +875,7 @@ async def get_user_projects(user: User = Depends(auth_service.get_current_user))
 @app.post("/api/projects/{project_id}/viral-score")
 async def get_viral_score(
     project_id: str,
+    explain: bool = False,
     user: User = Depends(auth_service.get_current_user)
 ):
     """Get AI-powered viral score prediction for video"""
@@ -745,7 +897,7 @@ async def get_viral_score(
         }
         
         platforms = project.get('platforms', ['tiktok'])
-        viral_analysis = await ai_enhancer.calculate_viral_score(video_metadata, platforms)
+        viral_analysis = await ai_enhancer.calculate_viral_score(video_metadata, platforms, explain=explain)
         
         return viral_analysis
     
@@ -876,27 +1028,30 @@ async def get_analytics_dashboard(
         if user.id != user_id:
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        # Get user's projects
-        user_projects = [
-            project for project in projects_db.values()
-            if project.get("user_id") == user.id
-        ]
+        # Aggregates come from the project store's indexes, not a scan of every project
+        status_counts = projects_db.count_by_status(user.id)
+        platform_counts = projects_db.platform_counts(user.id)
+        recent_projects, _ = projects_db.list_for_user(
+            user.id, limit=10,
+            fields=['filename', 'status', 'platforms', 'created_at', 'completed_at']
+        )
         
         # Mock analytics data (would come from real analytics in production)
-        total_videos = len(user_projects)
-        completed_videos = len([p for p in user_projects if p.get('status') == 'completed'])
+        total_videos = sum(status_counts.values())
+        completed_videos = status_counts.get('completed', 0)
+        total_platforms = sum(platform_counts.values())
         
         analytics_data = {
             'overview': {
                 'total_videos_processed': total_videos,
                 'completed_videos': completed_videos,
                 'success_rate': (completed_videos / total_videos * 100) if total_videos > 0 else 0,
-                'total_platforms': sum(len(p.get('platforms', [])) for p in user_projects),
-                'credits_used': sum(len(p.get('platforms', [])) * 10 for p in user_projects),
+                'total_platforms': total_platforms,
+                'credits_used': total_platforms * 10,
                 'credits_remaining': user.credits
             },
-            'platform_breakdown': _calculate_platform_stats(user_projects),
-            'recent_activity': _get_recent_activity(user_projects),
+            'platform_breakdown': _calculate_platform_stats(platform_counts),
+            'recent_activity': _get_recent_activity(recent_projects),
             'performance_metrics': {
                 'avg_processing_time': '45 seconds',
                 'most_used_platform': 'tiktok',
@@ -912,20 +1067,16 @@ async def get_analytics_dashboard(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analytics retrieval failed: {str(e)}")
 
-def _calculate_platform_stats(projects):
+def _calculate_platform_stats(platform_counts):
     """Calculate platform usage statistics"""
     platform_stats = {}
-    for project in projects:
-        for platform in project.get('platforms', []):
-            if platform not in platform_stats:
-                platform_stats[platform] = {
-                    'count': 0,
-                    'success_rate': 0,
-                    'avg_viral_score': 0.65
-                }
-            platform_stats[platform]['count'] += 1
+    for platform, count in platform_counts.items():
+        platform_stats[platform] = {
+            'count': count,
             # Mock success rate calculation
-            platform_stats[platform]['success_rate'] = 95
+            'success_rate': 95,
+            'avg_viral_score': 0.65
+        }
     
     return platform_stats
 
@@ -1058,6 +1209,7 @@ async def get_engagement_hacks(
 @app.post("/api/projects/{project_id}/viral-ceiling")
 async def predict_viral_ceiling(
     project_id: str,
+    explain: bool = False,
     user: User = Depends(auth_service.get_current_user)
 ):
     """Predict maximum viral potential and reach"""
@@ -1078,7 +1230,7 @@ async def predict_viral_ceiling(
         }
         
         platforms = project.get('platforms', ['tiktok'])
-        ceiling = await ai_enhancer.predict_viral_ceiling(video_metadata, platforms)
+        ceiling = await ai_enhancer.predict_viral_ceiling(video_metadata, platforms, explain=explain)
         
         return ceiling
     
@@ -1154,18 +1306,21 @@ async def create_voice_video(
 ):
     """Create complete video from voice input"""
     try:
-        # Check user credits for voice-to-video (premium feature)
+        # Hold credits for voice-to-video (premium feature); charged only once the video is created
         credits_needed = len(platforms) * 20  # 20 credits per platform for premium feature
-        if user.credits < credits_needed:
-            raise HTTPException(status_code=402, detail=f"Insufficient credits. Need {credits_needed}, have {user.credits}")
+        reservation_id = await auth_service.reserve_credits(user.id, credits_needed, reason="voice_to_video")
         
-        # Generate voice video
-        result = await voice_video_generator.create_voice_video(
-            voice_input, platforms, preferences
-        )
-        
-        # Deduct credits
-        await auth_service.update_user_credits(user.id, credits_needed)
+        try:
+            # Generate voice video
+            result = await voice_video_generator.create_voice_video(
+                voice_input, platforms, preferences
+            )
+            
+            # Charge the held credits
+            await auth_service.commit_credits(reservation_id)
+        finally:
+            # No-op once committed; returns the hold if generation failed
+            await auth_service.release_credits(reservation_id)
         
         return result
     
@@ -1251,21 +1406,14 @@ async def start_trend_monitoring(
         raise HTTPException(status_code=500, detail=f"Trend monitoring startup failed: {str(e)}")
 
 def _get_recent_activity(projects):
-    """Get recent user activity"""
-    # Sort projects by creation time and get recent ones
-    sorted_projects = sorted(
-        projects, 
-        key=lambda x: x.get('created_at', 0), 
-        reverse=True
-    )
-    
+    """Get recent user activity (projects arrive newest first)"""
     recent_activity = []
-    for project in sorted_projects[:10]:  # Last 10 projects
+    for project in projects[:10]:  # Last 10 projects
         activity = {
             'project_id': project['id'],
-            'filename': project.get('filename', 'Unknown'),
-            'status': project.get('status', 'unknown'),
-            'platforms': project.get('platforms', []),
+            'filename': project.get('filename') or 'Unknown',
+            'status': project.get('status') or 'unknown',
+            'platforms': project.get('platforms') or [],
             'created_at': project.get('created_at', 0),
             'completed_at': project.get('completed_at')
         }
@@ -1275,8 +1423,13 @@ def _get_recent_activity(projects):
 
 # ===== CELERY TASKS =====
 
+def _report_task_progress(task, project_id: str, progress: int, message: str, status: str = "processing"):
+    """Record Celery task progress and publish it to connected clients"""
+    task.update_state(state='PROGRESS', meta={'progress': progress})
+    publish_progress(project_id, {"status": status, "progress": progress, "message": message})
+
 @celery_app.task(bind=True)
-def transform_video_task(self, project_id: str, platforms: List[str], options: dict, user_id: str):
+def transform_video_task(self, project_id: str, platforms: List[str], options: dict, user_id: str, tier: str = "free"):
     """Background task for video transformation with user info"""
     try:
         # Get project from database
@@ -1285,13 +1438,13 @@ def transform_video_task(self, project_id: str, platforms: List[str], options: d
             raise Exception(f"Project {project_id} not found")
         
         # Update progress
-        self.update_state(state='PROGRESS', meta={'progress': 10})
+        _report_task_progress(self, project_id, 10, "Preparing video...")
         
         # Get input video URL
         input_url = storage_service.get_video_url(project['file_key'])
         
         # Update progress
-        self.update_state(state='PROGRESS', meta={'progress': 30})
+        _report_task_progress(self, project_id, 30, "Transforming video...")
         
         # Process video for each platform using the video processor
         import asyncio
@@ -1311,32 +1464,31 @@ def transform_video_task(self, project_id: str, platforms: List[str], options: d
             # Update progress for each completed platform
             for i, platform in enumerate(platforms):
                 progress = 30 + ((i + 1) * 60 // len(platforms))
-                self.update_state(state='PROGRESS', meta={'progress': progress})
+                _report_task_progress(self, project_id, progress, f"{platform} version ready")
                 
         finally:
             loop.close()
         
         # Update project with results
-        project["transformations"] = results
-        project["status"] = "completed"
-        project["completed_at"] = asyncio.get_event_loop().time()
+        projects_db.update(project_id, {
+            "transformations": results,
+            "status": "completed",
+            "completed_at": time.time()
+        })
         
-        # Deduct credits from user
-        credits_used = len(platforms) * 10
-        asyncio.create_task(auth_service.update_user_credits(user_id, credits_used))
+        # Credits reserved by the endpoint are charged when the scheduler reaps this job
         
         # Final progress update
-        self.update_state(state='PROGRESS', meta={'progress': 100})
+        _report_task_progress(self, project_id, 100, "Transformation complete", status="completed")
         
         return results
         
     except Exception as e:
         # Update project status to failed
-        if project_id in projects_db:
-            projects_db[project_id]["status"] = "failed"
-            projects_db[project_id]["error"] = str(e)
+        projects_db.update(project_id, {"status": "failed", "error": str(e)})
         
-        # Update task state with error
+        # Notify clients and update task state with error
+        publish_progress(project_id, {"status": "failed", "progress": 0, "error": str(e)})
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise e
 
@@ -1352,47 +1504,38 @@ def process_youtube_task(self, project_id: str, youtube_url: str, user_id: str,
         import time
         
         # Update project status directly (no WebSocket dependency)
-        project["status"] = "processing"
-        project["progress"] = 10
-        project["message"] = "Starting YouTube video processing..."
-        project["updated_at"] = time.time()
+        projects_db.update(project_id, {
+            "status": "processing",
+            "progress": 10,
+            "message": "Starting YouTube video processing..."
+        })
         
         # Simulate processing steps with direct status updates
         time.sleep(2)
         
-        project["progress"] = 30
-        project["message"] = "Downloading video from YouTube..."
-        project["updated_at"] = time.time()
+        projects_db.update(project_id, {"progress": 30, "message": "Downloading video from YouTube..."})
         
         time.sleep(2)
         
-        project["progress"] = 60
-        project["message"] = "Analyzing video content..."
-        project["updated_at"] = time.time()
+        projects_db.update(project_id, {"progress": 60, "message": "Analyzing video content..."})
         
         time.sleep(2)
         
         # Mark as ready for transformation
-        project["status"] = "ready_for_processing"
-        project["progress"] = 100
-        project["message"] = "YouTube video processed successfully"
-        project["youtube_url"] = youtube_url
-        project["processed_at"] = time.time()
-        project["updated_at"] = time.time()
-        
-        # Try WebSocket update (but don't fail if it doesn't work)
-        try:
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(manager.send_progress(project_id, {
-                "status": "complete",
-                "progress": 100,
-                "message": "YouTube video processed successfully"
-            }))
-            loop.close()
-        except Exception as ws_error:
-            print(f"WebSocket update failed (expected): {ws_error}")
+        projects_db.update(project_id, {
+            "status": "ready_for_processing",
+            "progress": 100,
+            "message": "YouTube video processed successfully",
+            "youtube_url": youtube_url,
+            "processed_at": time.time()
+        })
+        
+        # Notify WebSocket/SSE clients on whichever API process holds them
+        publish_progress(project_id, {
+            "status": "complete",
+            "progress": 100,
+            "message": "YouTube video processed successfully"
+        })
         
         return {
             "status": "ready_for_processing",
@@ -1402,24 +1545,14 @@ def process_youtube_task(self, project_id: str, youtube_url: str, user_id: str,
         
     except Exception as e:
         # Update project status to failed
-        if project_id in projects_db:
-            projects_db[project_id]["status"] = "failed"
-            projects_db[project_id]["error"] = str(e)
-            projects_db[project_id]["updated_at"] = time.time()
+        projects_db.update(project_id, {"status": "failed", "error": str(e)})
         
-        # Try WebSocket error update (but don't fail if it doesn't work)
-        try:
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(manager.send_progress(project_id, {
-                "status": "error",
-                "progress": 0,
-                "error": str(e)
-            }))
-            loop.close()
-        except:
-            pass
+        # Notify WebSocket/SSE clients of the failure
+        publish_progress(project_id, {
+            "status": "error",
+            "progress": 0,
+            "error": str(e)
+        })
         
         # Update task state with error
         self.update_state(state='FAILURE', meta={'error': str(e)})
@@ -1428,15 +1561,44 @@ def process_youtube_task(self, project_id: str, youtube_url: str, user_id: str,
 # ===== WEBSOCKET ENDPOINTS =====
 
 @app.websocket("/ws/{project_id}")
-async def websocket_endpoint(websocket: WebSocket, project_id: str):
-    """WebSocket endpoint for real-time progress updates"""
-    await manager.connect(websocket, project_id)
+async def websocket_endpoint(websocket: WebSocket, project_id: str, since: Optional[str] = None):
+    """WebSocket endpoint for real-time progress updates.
+
+    Pass ``?since=<event_id>`` when reconnecting to receive missed events first.
+    """
+    backlog = (lambda: progress_bus.replay(project_id, since)) if since else None
+    subscriber = None
     try:
+        subscriber = await manager.connect(websocket, project_id, backlog=backlog)
         while True:
             # Keep connection alive
             await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(project_id)
+        pass
+    finally:
+        if subscriber is not None:
+            manager.disconnect(project_id, subscriber)
+
+@app.get("/api/projects/{project_id}/events")
+async def project_events(
+    project_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    since: Optional[str] = None
+):
+    """Server-Sent Events stream of project progress.
+
+    Browsers resend Last-Event-ID on reconnect; ``?since=`` does the same for
+    clients that cannot set headers.
+    """
+    async def event_stream():
+        async for event in sse_progress_stream(project_id, last_event_id or since):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ============================================================================
 # AI SCRIPT WRITER API ENDPOINTS
@@ -1460,21 +1622,22 @@ async def generate_viral_script(
 ):
     """🤖 Generate AI-powered viral script that guarantees engagement"""
     try:
-        # Check user credits
-        user_credits = await auth_service.get_credits(user.id)
-        if user_credits < 10:
-            raise HTTPException(status_code=402, detail="Insufficient credits")
-        
-        # Generate viral script
-        script_data = await script_writer.generate_viral_script(
-            concept=request.concept,
-            platform=request.platform,
-            duration=request.duration,
-            style=request.style
-        )
+        # Hold credits (10 credits for script generation); charged only once the script is generated
+        reservation_id = await auth_service.reserve_credits(user.id, 10, reason='script_generation')
         
-        # Deduct credits (10 credits for script generation)
-        await auth_service.deduct_credits(user.id, 10)
+        try:
+            # Generate viral script
+            script_data = await script_writer.generate_viral_script(
+                concept=request.concept,
+                platform=request.platform,
+                duration=request.duration,
+                style=request.style
+            )
+            
+            await auth_service.commit_credits(reservation_id)
+        finally:
+            # No-op once committed; returns the hold if generation failed
+            await auth_service.release_credits(reservation_id)
         remaining_credits = await auth_service.get_credits(user.id)
         
         return {
@@ -1492,6 +1655,52 @@ async def generate_viral_script(
         print(f"Script generation error: {e}")
         raise HTTPException(status_code=500, detail=f"Script generation failed: {str(e)}")
 
+@app.post("/api/scripts/generate/stream")
+async def stream_viral_script(
+    request: ScriptRequest,
+    user: User = Depends(auth_service.get_current_user)
+):
+    """🤖 Stream a viral script as Server-Sent Events.
+
+    ``token`` events carry the script text as it is written; ``script``,
+    ``viral_score``, ``variations`` and finally ``done`` (the full
+    /api/scripts/generate result) follow. Credits are held while streaming
+    and only charged once the script is complete.
+    """
+    reservation_id = await auth_service.reserve_credits(user.id, 10, reason='script_generation')
+
+    async def event_stream():
+        committed = False
+        try:
+            async for event, data in script_writer.stream_viral_script(
+                concept=request.concept,
+                platform=request.platform,
+                duration=request.duration,
+                style=request.style
+            ):
+                if event == "done":
+                    await auth_service.commit_credits(reservation_id)
+                    committed = True
+                    data = {
+                        **data,
+                        "credits_used": 10,
+                        "credits_remaining": await auth_service.get_credits(user.id)
+                    }
+                yield format_sse({"event": event, "data": json.dumps(jsonable_encoder(data))})
+        except Exception as e:
+            print(f"Script streaming error: {e}")
+            yield format_sse({"event": "error", "data": json.dumps({"detail": f"Script generation failed: {str(e)}"})})
+        finally:
+            # Client disconnected or generation failed before the script was complete
+            if not committed:
+                await auth_service.release_credits(reservation_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/scripts/refine")
 async def refine_script(
     request: RefineRequest,
@@ -1499,20 +1708,21 @@ async def refine_script(
 ):
     """✨ Refine and improve existing script for better viral potential"""
     try:
-        # Check user credits
-        user_credits = await auth_service.get_credits(user.id)
-        if user_credits < 5:
-            raise HTTPException(status_code=402, detail="Insufficient credits")
-        
-        # Refine script
-        refined_data = await script_writer.refine_script(
-            original_script=request.script,
-            feedback=request.feedback,
-            target_improvements=request.improvements
-        )
+        # Hold credits (5 credits for refinement); charged only once the script is refined
+        reservation_id = await auth_service.reserve_credits(user.id, 5, reason='script_refinement')
         
-        # Deduct credits (5 credits for refinement)
-        await auth_service.deduct_credits(user.id, 5)
+        try:
+            # Refine script
+            refined_data = await script_writer.refine_script(
+                original_script=request.script,
+                feedback=request.feedback,
+                target_improvements=request.improvements
+            )
+            
+            await auth_service.commit_credits(reservation_id)
+        finally:
+            # No-op once committed; returns the hold if refinement failed
+            await auth_service.release_credits(reservation_id)
         remaining_credits = await auth_service.get_credits(user.id)
         
         return {
@@ -1646,67 +1856,66 @@ async def magic_enhance_video(
         
         total_credits = base_credits + sum(enhancement_costs.get(enh, 0) for enh in enhancement_list)
         
-        # Check user credits
-        user_credits = await auth_service.get_credits(user.id)
-        if user_credits < total_credits:
-            raise HTTPException(
-                status_code=402, 
-                detail=f"Insufficient credits. Need {total_credits}, have {user_credits}"
-            )
-        
-        # Save uploaded video
-        temp_dir = tempfile.mkdtemp()
-        video_path = os.path.join(temp_dir, f"input_{video.filename}")
-        
-        with open(video_path, "wb") as buffer:
-            content = await video.read()
-            buffer.write(content)
+        # Hold credits while enhancing; charged only if the enhancement succeeds
+        reservation_id = await auth_service.reserve_credits(user.id, total_credits, reason="magic_enhance")
         
-        # Create enhancement options
-        options = MagicEditOptions(
-            remove_background='remove_background' in enhancement_list,
-            enhance_face='enhance_face' in enhancement_list,
-            fix_lighting='fix_lighting' in enhancement_list,
-            stabilize_video='stabilize_video' in enhancement_list,
-            upscale_quality='upscale_quality' in enhancement_list,
-            denoise_audio='denoise_audio' in enhancement_list,
-            auto_crop='auto_crop' in enhancement_list,
-            color_grade='color_grade' in enhancement_list,
-            add_subtitles='add_subtitles' in enhancement_list,
-            speed_optimize='speed_optimize' in enhancement_list
-        )
+        try:
+            # Save uploaded video
+            temp_dir = tempfile.mkdtemp()
+            video_path = os.path.join(temp_dir, f"input_{video.filename}")
+        
+            with open(video_path, "wb") as buffer:
+                content = await video.read()
+                buffer.write(content)
+        
+            # Create enhancement options
+            options = MagicEditOptions(
+                remove_background='remove_background' in enhancement_list,
+                enhance_face='enhance_face' in enhancement_list,
+                fix_lighting='fix_lighting' in enhancement_list,
+                stabilize_video='stabilize_video' in enhancement_list,
+                upscale_quality='upscale_quality' in enhancement_list,
+                denoise_audio='denoise_audio' in enhancement_list,
+                auto_crop='auto_crop' in enhancement_list,
+                color_grade='color_grade' in enhancement_list,
+                add_subtitles='add_subtitles' in enhancement_list,
+                speed_optimize='speed_optimize' in enhancement_list
+            )
         
-        # Apply magic enhancements
-        result = await magic_editor.magic_enhance(video_path, options, preset)
+            # Apply magic enhancements
+            result = await magic_editor.magic_enhance(video_path, options, preset)
         
-        if result.get("success"):
-            # Deduct credits
-            await auth_service.deduct_credits(user.id, total_credits)
-            remaining_credits = await auth_service.get_credits(user.id)
+            if result.get("success"):
+                # Charge the held credits
+                await auth_service.commit_credits(reservation_id)
+                remaining_credits = await auth_service.get_credits(user.id)
             
-            # Store enhanced video (you'd upload to your storage service here)
-            # For now, we'll return the local path
+                # Store enhanced video (you'd upload to your storage service here)
+                # For now, we'll return the local path
             
-            return {
-                "success": True,
-                "enhanced_video_url": result["enhanced_video"],  # In production, upload to R2/S3
-                "before_preview": result.get("before_preview"),
-                "after_preview": result.get("after_preview"),
-                "processing_time": result["processing_time"],
-                "enhancements_applied": result["enhancements_applied"],
-                "quality_improvement": result["quality_improvement"],
-                "file_size_change": result.get("file_size_reduction", "Optimized"),
-                "processing_stats": result.get("processing_stats", {}),
-                "credits_used": total_credits,
-                "credits_remaining": remaining_credits,
-                "message": "🎬 Video enhanced to professional quality!"
-            }
-        else:
-            return {
-                "success": False,
-                "error": result.get("error", "Enhancement failed"),
-                "message": "Enhancement failed, please try again"
-            }
+                return {
+                    "success": True,
+                    "enhanced_video_url": result["enhanced_video"],  # In production, upload to R2/S3
+                    "before_preview": result.get("before_preview"),
+                    "after_preview": result.get("after_preview"),
+                    "processing_time": result["processing_time"],
+                    "enhancements_applied": result["enhancements_applied"],
+                    "quality_improvement": result["quality_improvement"],
+                    "file_size_change": result.get("file_size_reduction", "Optimized"),
+                    "processing_stats": result.get("processing_stats", {}),
+                    "credits_used": total_credits,
+                    "credits_remaining": remaining_credits,
+                    "message": "🎬 Video enhanced to professional quality!"
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": result.get("error", "Enhancement failed"),
+                    "message": "Enhancement failed, please try again"
+                }
+        finally:
+            # No-op once committed; returns the hold if enhancement failed
+            await auth_service.release_credits(reservation_id)
         
     except HTTPException:
         raise
@@ -1984,65 +2193,64 @@ async def remix_content(
         variation_credits = sum(variation_costs.get(var, 0) for var in variation_list)
         total_credits = base_credits + (variation_credits * platform_multiplier) + (remix_count * 2)
         
-        # Check user credits
-        user_credits = await auth_service.get_credits(user.id)
-        if user_credits < total_credits:
-            raise HTTPException(
-                status_code=402, 
-                detail=f"Insufficient credits. Need {total_credits}, have {user_credits}"
-            )
-        
-        # Save uploaded video
-        temp_dir = tempfile.mkdtemp()
-        video_path = os.path.join(temp_dir, f"remix_input_{video.filename}")
-        
-        with open(video_path, "wb") as buffer:
-            content = await video.read()
-            buffer.write(content)
+        # Hold credits while remixing; charged only if the remix succeeds
+        reservation_id = await auth_service.reserve_credits(user.id, total_credits, reason="content_remix")
         
-        # Create remix options
-        options = RemixOptions(
-            platform_variations='platform' in variation_list,
-            style_variations='style' in variation_list,
-            length_variations='length' in variation_list,
-            format_variations='format' in variation_list,
-            trending_adaptations='trending' in variation_list,
-            language_variations='language' in variation_list,
-            audience_targeting='audience' in variation_list,
-            mood_variations='mood' in variation_list,
-            hook_variations='hook' in variation_list,
-            cta_variations='cta' in variation_list,
-            target_count=remix_count
-        )
+        try:
+            # Save uploaded video
+            temp_dir = tempfile.mkdtemp()
+            video_path = os.path.join(temp_dir, f"remix_input_{video.filename}")
+        
+            with open(video_path, "wb") as buffer:
+                content = await video.read()
+                buffer.write(content)
+        
+            # Create remix options
+            options = RemixOptions(
+                platform_variations='platform' in variation_list,
+                style_variations='style' in variation_list,
+                length_variations='length' in variation_list,
+                format_variations='format' in variation_list,
+                trending_adaptations='trending' in variation_list,
+                language_variations='language' in variation_list,
+                audience_targeting='audience' in variation_list,
+                mood_variations='mood' in variation_list,
+                hook_variations='hook' in variation_list,
+                cta_variations='cta' in variation_list,
+                target_count=remix_count
+            )
         
-        # Apply content remixing
-        result = await content_remixer.remix_content(video_path, options, platform_list)
+            # Apply content remixing
+            result = await content_remixer.remix_content(video_path, options, platform_list)
         
-        if result.get("success"):
-            # Deduct credits
-            await auth_service.deduct_credits(user.id, total_credits)
-            remaining_credits = await auth_service.get_credits(user.id)
+            if result.get("success"):
+                # Charge the held credits
+                await auth_service.commit_credits(reservation_id)
+                remaining_credits = await auth_service.get_credits(user.id)
             
-            return {
-                "success": True,
-                "remix_results": result["variations"],
-                "total_variations": result["total_variations"],
-                "platforms_covered": result["platforms_covered"],
-                "processing_time": result["processing_time"],
-                "variation_breakdown": result["variation_breakdown"],
-                "viral_scores": result["viral_scores"],
-                "platform_optimization": result["platform_optimization"],
-                "trending_analysis": result.get("trending_analysis", {}),
-                "credits_used": total_credits,
-                "credits_remaining": remaining_credits,
-                "message": f"🎬 {result['total_variations']} viral variations created!"
-            }
-        else:
-            return {
-                "success": False,
-                "error": result.get("error", "Content remixing failed"),
-                "message": "Remixing failed, please try again"
-            }
+                return {
+                    "success": True,
+                    "remix_results": result["variations"],
+                    "total_variations": result["total_variations"],
+                    "platforms_covered": result["platforms_covered"],
+                    "processing_time": result["processing_time"],
+                    "variation_breakdown": result["variation_breakdown"],
+                    "viral_scores": result["viral_scores"],
+                    "platform_optimization": result["platform_optimization"],
+                    "trending_analysis": result.get("trending_analysis", {}),
+                    "credits_used": total_credits,
+                    "credits_remaining": remaining_credits,
+                    "message": f"🎬 {result['total_variations']} viral variations created!"
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": result.get("error", "Content remixing failed"),
+                    "message": "Remixing failed, please try again"
+                }
+        finally:
+            # No-op once committed; returns the hold if remixing failed
+            await auth_service.release_credits(reservation_id)
         
     except HTTPException:
         raise
@@ -2310,66 +2518,63 @@ async def batch_remix_videos(
         
         total_credits = len(videos) * single_video_credits
         
-        # Check user credits
-        user_credits = await auth_service.get_credits(user.id)
-        if user_credits < total_credits:
-            raise HTTPException(
-                status_code=402, 
-                detail=f"Insufficient credits for batch processing. Need {total_credits}, have {user_credits}"
-            )
-        
-        batch_results = []
-        processed_count = 0
+        # Hold credits for the whole batch up front so concurrent requests cannot overdraw
+        reservation_id = await auth_service.reserve_credits(user.id, total_credits, reason="batch_remix")
         
-        # Process each video
-        for video in videos:
-            try:
-                # Save video
-                temp_dir = tempfile.mkdtemp()
-                video_path = os.path.join(temp_dir, f"batch_{video.filename}")
+        try:
+            batch_results = []
+            processed_count = 0
+        
+            # Process each video
+            for video in videos:
+                try:
+                    # Save video
+                    temp_dir = tempfile.mkdtemp()
+                    video_path = os.path.join(temp_dir, f"batch_{video.filename}")
                 
-                with open(video_path, "wb") as buffer:
-                    content = await video.read()
-                    buffer.write(content)
+                    with open(video_path, "wb") as buffer:
+                        content = await video.read()
+                        buffer.write(content)
                 
-                # Create remix options
-                options = RemixOptions(
-                    platform_variations='platform' in variation_list,
-                    style_variations='style' in variation_list,
-                    length_variations='length' in variation_list,
-                    target_count=remix_count
-                )
+                    # Create remix options
+                    options = RemixOptions(
+                        platform_variations='platform' in variation_list,
+                        style_variations='style' in variation_list,
+                        length_variations='length' in variation_list,
+                        target_count=remix_count
+                    )
                 
-                # Process video
-                result = await content_remixer.remix_content(video_path, options, platform_list)
+                    # Process video
+                    result = await content_remixer.remix_content(video_path, options, platform_list)
                 
-                if result.get("success"):
-                    batch_results.append({
-                        "video_name": video.filename,
-                        "status": "success",
-                        "variations_created": result["total_variations"],
-                        "processing_time": result["processing_time"],
-                        "variations": result["variations"]
-                    })
-                    processed_count += 1
-                else:
+                    if result.get("success"):
+                        batch_results.append({
+                            "video_name": video.filename,
+                            "status": "success",
+                            "variations_created": result["total_variations"],
+                            "processing_time": result["processing_time"],
+                            "variations": result["variations"]
+                        })
+                        processed_count += 1
+                    else:
+                        batch_results.append({
+                            "video_name": video.filename,
+                            "status": "failed",
+                            "error": result.get("error", "Unknown error")
+                        })
+                
+                except Exception as video_error:
                     batch_results.append({
                         "video_name": video.filename,
                         "status": "failed",
-                        "error": result.get("error", "Unknown error")
+                        "error": str(video_error)
                     })
-                
-            except Exception as video_error:
-                batch_results.append({
-                    "video_name": video.filename,
-                    "status": "failed",
-                    "error": str(video_error)
-                })
-        
-        # Deduct credits based on successful processing
-        credits_used = processed_count * single_video_credits
-        if credits_used > 0:
-            await auth_service.deduct_credits(user.id, credits_used)
+            
+            # Charge only for videos that processed successfully; the rest of the hold is released
+            credits_used = processed_count * single_video_credits
+            await auth_service.commit_credits(reservation_id, credits_used)
+        finally:
+            await auth_service.release_credits(reservation_id)
         
         remaining_credits = await auth_service.get_credits(user.id)
         
@@ -2926,6 +3131,29 @@ async def predict_viral_score(
         print(f"Viral prediction error: {e}")
         raise HTTPException(status_code=500, detail=f"Viral prediction failed: {str(e)}")
 
+MAX_SCORE_VARIANTS = 5000
+
+class ViralScoreBatchRequest(BaseModel):
+    variants: List[Dict]
+    platforms: List[str] = ["tiktok"]
+
+@app.post("/api/viral/score-batch")
+async def score_viral_variants(
+    request: ViralScoreBatchRequest,
+    user: User = Depends(auth_service.get_current_user)
+):
+    """Score metadata variants (title, duration, tags, transcript) on each platform with the local model"""
+    try:
+        if len(request.variants) > MAX_SCORE_VARIANTS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_SCORE_VARIANTS} variants per request")
+        
+        return ai_enhancer.score_variants(request.variants, request.platforms)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Viral score batch failed: {str(e)}")
+
 # ============================================================================
 # ELEVENLABS ADVANCED VOICE SOLUTIONS - REAL PROBLEM SOLVERS
 # ============================================================================
@@ -0,0 +1,56 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict
+
+# Statuses that end a job; these are never coalesced or dropped
+TERMINAL_STATUSES = {
+    'completed', 'complete', 'failed', 'error', 'cancelled', 'ready_for_processing'
+}
+
+def is_terminal(data: Dict[str, Any]) -> bool:
+    return data.get('status') in TERMINAL_STATUSES
+
+class CoalescingQueue:
+    """Bounded per-subscriber queue with latest-state semantics.
+
+    Writers never block: when the queue is full the oldest pending progress
+    snapshot is discarded to make room, because a newer snapshot supersedes
+    it. Terminal events are always kept so clients learn how a job ended.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = max(1, maxsize)
+        self._items: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def put_nowait(self, data: Dict[str, Any]) -> bool:
+        """Queue an update; returns False if it was dropped"""
+        if len(self._items) >= self.maxsize:
+            for index, pending in enumerate(self._items):
+                if not is_terminal(pending):
+                    del self._items[index]
+                    self.coalesced += 1
+                    break
+            else:
+                if not is_terminal(data):
+                    # Only terminal events are pending; a late progress update is moot
+                    self.dropped += 1
+                    return False
+
+        self._items.append(data)
+        self._ready.set()
+        return True
+
+    async def get(self) -> Dict[str, Any]:
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._items.popleft()
@@ -0,0 +1,279 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import redis
+import redis.asyncio as aioredis
+
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+PROGRESS_CHANNEL_PREFIX = 'progress:'
+PROGRESS_LOG_PREFIX = 'progress_log:'
+PROGRESS_LOG_MAXLEN = int(os.getenv('PROGRESS_LOG_MAXLEN', '200'))  # approximate cap per project
+PROGRESS_LOG_TTL = int(os.getenv('PROGRESS_LOG_TTL', str(24 * 3600)))  # seconds after the last event
+LOCAL_LOG_PROJECTS = 1000  # projects kept by the in-process fallback log
+
+ProgressListener = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+def progress_channel(project_id: str) -> str:
+    """Redis pub/sub channel carrying progress for a project"""
+    return f"{PROGRESS_CHANNEL_PREFIX}{project_id}"
+
+def progress_log_key(project_id: str) -> str:
+    """Capped Redis Stream holding recent progress events for a project"""
+    return f"{PROGRESS_LOG_PREFIX}{project_id}"
+
+def event_id_key(event_id: Optional[str]) -> Tuple[int, int]:
+    """Sortable form of a stream entry id such as ``1700000000000-3``"""
+    try:
+        millis, _, seq = str(event_id).partition('-')
+        return int(millis), int(seq or 0)
+    except (TypeError, ValueError):
+        return (0, 0)
+
+# Append to the project's stream and publish in one round trip, so the live
+# message carries the same id a reconnecting client will resume from.
+APPEND_AND_PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('PUBLISH', KEYS[2], '{"event_id":"' .. id .. '","data":' .. ARGV[3] .. '}')
+return id
+"""
+
+def _stamped(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Set updated_at once at the publisher so every receiving process stores the same value"""
+    return data if 'updated_at' in data else {**data, 'updated_at': time.time()}
+
+def _append_args(project_id: str, data: Dict[str, Any]):
+    keys = [progress_log_key(project_id), progress_channel(project_id)]
+    args = [PROGRESS_LOG_MAXLEN, PROGRESS_LOG_TTL, json.dumps(data, default=str)]
+    return keys, args
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+# Lazily created client for synchronous publishers (Celery workers)
+_sync_client: Optional[redis.Redis] = None
+_sync_append = None
+
+def publish_progress(project_id: str, data: Dict[str, Any]) -> Optional[str]:
+    """Publish a progress update from synchronous code such as a Celery task.
+
+    The update is appended to the project's progress log and every API
+    process subscribed to the bus relays it to its local clients. Returns the
+    event id, or None if Redis was unreachable.
+    """
+    global _sync_client, _sync_append
+    try:
+        if _sync_client is None:
+            _sync_client = redis.Redis.from_url(REDIS_URL, socket_timeout=5)
+            _sync_append = _sync_client.register_script(APPEND_AND_PUBLISH_SCRIPT)
+        keys, args = _append_args(project_id, _stamped(data))
+        return _decode(_sync_append(keys=keys, args=args))
+    except Exception as e:
+        print(f"Progress publish failed for {project_id}: {e}")
+        return None
+
+class LocalProgressLog:
+    """In-process stand-in for the Redis progress streams.
+
+    Used when the bus has no Redis connection so reconnecting clients can
+    still resume within a single API process. Ids follow the stream format.
+    """
+
+    def __init__(self, maxlen: int = PROGRESS_LOG_MAXLEN, max_projects: int = LOCAL_LOG_PROJECTS):
+        self.maxlen = maxlen
+        self.max_projects = max_projects
+        self._logs: "OrderedDict[str, Deque[Tuple[str, Dict[str, Any]]]]" = OrderedDict()
+        self._last_millis = 0
+        self._seq = itertools.count()
+
+    def _next_id(self) -> str:
+        millis = int(time.time() * 1000)
+        if millis > self._last_millis:
+            self._last_millis = millis
+            self._seq = itertools.count()
+        return f"{self._last_millis}-{next(self._seq)}"
+
+    def append(self, project_id: str, data: Dict[str, Any]) -> str:
+        log = self._logs.get(project_id)
+        if log is None:
+            log = self._logs[project_id] = deque(maxlen=self.maxlen)
+            while len(self._logs) > self.max_projects:
+                self._logs.popitem(last=False)
+        else:
+            self._logs.move_to_end(project_id)
+        event_id = self._next_id()
+        log.append((event_id, data))
+        return event_id
+
+    def since(self, project_id: str, last_event_id: Optional[str], count: int) -> List[Tuple[str, Dict[str, Any]]]:
+        log = self._logs.get(project_id, ())
+        after = event_id_key(last_event_id)
+        return [(event_id, data) for event_id, data in log if event_id_key(event_id) > after][:count]
+
+class ProgressBus:
+    """Per-process relay between Redis progress channels and local listeners.
+
+    Each API process holds a single pattern subscription on ``progress:*`` and
+    hands every message to the registered listeners (WebSocket manager, SSE
+    streams), so updates reach clients no matter which process produced them.
+
+    Every update is also appended to a capped per-project Redis Stream and
+    delivered with its stream id as ``event_id``. A reconnecting client passes
+    the last id it saw and ``replay`` returns what it missed with one XRANGE.
+    Without Redis the bus delivers and logs in-process only.
+    """
+
+    def __init__(self, redis_url: str = REDIS_URL):
+        self.redis_url = redis_url
+        self.listeners: List[ProgressListener] = []
+        self._redis: Optional[aioredis.Redis] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._append = None
+        self.local_log = LocalProgressLog()
+        self.messages_received = 0
+        self.messages_published = 0
+        self.events_replayed = 0
+
+    def add_listener(self, listener: ProgressListener):
+        """Register a coroutine called with (project_id, data) for every update"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def start(self):
+        """Subscribe once for this process; safe to call repeatedly"""
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_forever())
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        await self._close_redis()
+        self._connected.clear()
+
+    async def _close_redis(self, pubsub=None):
+        """Release the subscription and client connection pool before they are replaced"""
+        redis, self._redis, self._append = self._redis, None, None
+        for resource in (pubsub, redis):
+            if resource is None:
+                continue
+            try:
+                await resource.aclose()
+            except Exception:
+                pass
+
+    async def publish(self, project_id: str, data: Dict[str, Any]) -> str:
+        """Log and publish an update; falls back to local delivery when Redis is unavailable"""
+        data = _stamped(data)
+        if self.connected:
+            try:
+                keys, args = _append_args(project_id, data)
+                event_id = _decode(await self._append(keys=keys, args=args))
+                self.messages_published += 1
+                return event_id
+            except Exception as e:
+                print(f"Progress publish failed for {project_id}, delivering locally: {e}")
+        event_id = self.local_log.append(project_id, data)
+        await self.deliver(project_id, {**data, 'event_id': event_id})
+        return event_id
+
+    async def replay(self, project_id: str, last_event_id: Optional[str], count: int = PROGRESS_LOG_MAXLEN) -> List[Dict[str, Any]]:
+        """Events logged after ``last_event_id``, oldest first, each tagged with its event_id"""
+        if not last_event_id:
+            return []
+
+        entries = None
+        if self.connected:
+            try:
+                raw = await self._redis.xrange(
+                    progress_log_key(project_id), min=f"({last_event_id}", max='+', count=count
+                )
+                entries = []
+                for entry_id, fields in raw:
+                    payload = fields.get(b'data', fields.get('data'))
+                    try:
+                        entries.append((_decode(entry_id), json.loads(payload)))
+                    except (TypeError, ValueError):
+                        continue
+            except Exception as e:
+                print(f"Progress replay failed for {project_id}: {e}")
+                entries = None
+        if entries is None:
+            entries = self.local_log.since(project_id, last_event_id, count)
+
+        self.events_replayed += len(entries)
+        return [{**data, 'event_id': event_id} for event_id, data in entries]
+
+    async def deliver(self, project_id: str, data: Dict[str, Any]):
+        """Fan an update out to this process's listeners"""
+        for listener in self.listeners:
+            try:
+                await listener(project_id, data)
+            except Exception as e:
+                print(f"Progress listener failed for {project_id}: {e}")
+
+    async def _read_forever(self):
+        backoff = 1.0
+        while True:
+            pubsub = None
+            try:
+                self._redis = aioredis.from_url(self.redis_url)
+                self._append = self._redis.register_script(APPEND_AND_PUBLISH_SCRIPT)
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                await pubsub.psubscribe(f"{PROGRESS_CHANNEL_PREFIX}*")
+                self._connected.set()
+                backoff = 1.0
+                print("📡 Progress bus subscribed to Redis")
+
+                async for message in pubsub.listen():
+                    if message.get('type') != 'pmessage':
+                        continue
+                    channel = message['channel']
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    project_id = channel[len(PROGRESS_CHANNEL_PREFIX):]
+                    try:
+                        envelope = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    if isinstance(envelope, dict) and 'event_id' in envelope and isinstance(envelope.get('data'), dict):
+                        data = {**envelope['data'], 'event_id': envelope['event_id']}
+                    else:
+                        data = envelope  # plain publish without a log entry
+                    self.messages_received += 1
+                    await self.deliver(project_id, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Progress bus connection lost ({e}), retrying in {backoff:.0f}s")
+            finally:
+                self._connected.clear()
+                await self._close_redis(pubsub)
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'connected': self.connected,
+            'listeners': len(self.listeners),
+            'messages_received': self.messages_received,
+            'messages_published': self.messages_published,
+            'events_replayed': self.events_replayed
+        }
+
+# Global progress bus instance (one subscription per process)
+progress_bus = ProgressBus()
@@ -0,0 +1,287 @@
+import base64
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECTS_DATABASE_URL = os.getenv('PROJECTS_DATABASE_URL', 'sqlite:///:memory:')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Fields returned by list views; the heavy ``transformations`` dict is left out
+LIST_FIELDS = [
+    'id', 'user_id', 'filename', 'youtube_url', 'status', 'progress', 'platforms',
+    'task_id', 'is_trial', 'created_at', 'updated_at', 'completed_at'
+]
+
+FIELD_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def encode_cursor(created_at: float, project_id: str) -> str:
+    """Opaque pagination cursor pointing just past a project"""
+    raw = json.dumps([created_at, project_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, project_id = json.loads(raw)
+        return float(created_at), str(project_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def validate_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    if fields is None:
+        return None
+    invalid = [f for f in fields if not FIELD_NAME_RE.match(f)]
+    if invalid:
+        raise ValueError(f"Invalid field names: {', '.join(invalid)}")
+    return list(dict.fromkeys(['id', *fields]))
+
+class ProjectRepository(ABC):
+    """Storage interface for projects.
+
+    Backends keep ``user_id``, ``status`` and ``created_at`` in indexed
+    columns and the rest of the project as a JSON document, so per-user
+    listings are an index range scan instead of a walk over every project.
+    Register other backends (e.g. Postgres with JSONB) in PROJECT_BACKENDS.
+
+    Dict-style access (``repo[project_id]``, ``in``, ``clear``) is kept for
+    existing callers; returned projects are copies, so changes must be
+    written back with ``update`` or ``save``.
+    """
+
+    @abstractmethod
+    def get(self, project_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def save(self, project: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def update(self, project_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def delete(self, project_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list_for_user(
+        self,
+        user_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of a user's projects, newest first, plus the next page's cursor"""
+
+    @abstractmethod
+    def count_by_status(self, user_id: str) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def platform_counts(self, user_id: str) -> Dict[str, int]:
+        """How many of the user's projects target each platform"""
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def __getitem__(self, project_id: str) -> Dict[str, Any]:
+        project = self.get(project_id)
+        if project is None:
+            raise KeyError(project_id)
+        return project
+
+    def __setitem__(self, project_id: str, project: Dict[str, Any]):
+        self.save({**project, 'id': project_id})
+
+    def __delitem__(self, project_id: str):
+        if not self.delete(project_id):
+            raise KeyError(project_id)
+
+    def __contains__(self, project_id: str) -> bool:
+        return self.get(project_id, fields=['id']) is not None
+
+class SQLiteProjectRepository(ProjectRepository):
+    """Single-node project store on SQLite (file-backed or in-memory)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            status TEXT,
+            created_at REAL NOT NULL DEFAULT 0,
+            updated_at REAL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_projects_user_created ON projects (user_id, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_projects_status ON projects (status);
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            # Let Celery workers on the same host read while the API writes
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.executescript(self.SCHEMA)
+
+    @classmethod
+    def from_url(cls, url: str) -> 'SQLiteProjectRepository':
+        path = url.split('://', 1)[1]
+        return cls(path[1:] if path.startswith('/') else path)
+
+    def _select(self, fields: Optional[List[str]]) -> Tuple[str, List[str]]:
+        """SELECT expression and parameters returning each row as one JSON object"""
+        if fields is None:
+            return 'data', []
+        parts, params = [], []
+        for field in fields:
+            parts.append('?, json_extract(data, ?)')
+            params.extend([field, f'$."{field}"'])
+        return f"json_object({', '.join(parts)})", params
+
+    def get(self, project_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        select, params = self._select(validate_fields(fields))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {select} FROM projects WHERE id = ?", (*params, project_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, project: Dict[str, Any]):
+        self._conn.execute(
+            """
+            INSERT INTO projects (id, user_id, status, created_at, updated_at, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                user_id = excluded.user_id,
+                status = excluded.status,
+                created_at = excluded.created_at,
+                updated_at = excluded.updated_at,
+                data = excluded.data
+            """,
+            (
+                project['id'],
+                project.get('user_id'),
+                project.get('status'),
+                float(project.get('created_at') or 0),
+                project.get('updated_at'),
+                json.dumps(project, default=str)
+            )
+        )
+
+    def save(self, project: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._write(project)
+        return project
+
+    def update(self, project_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge changes into a stored project atomically"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute("SELECT data FROM projects WHERE id = ?", (project_id,)).fetchone()
+                if not row:
+                    self._conn.execute('ROLLBACK')
+                    return None
+                project = {**json.loads(row[0]), 'updated_at': time.time(), **changes}
+                self._write(project)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return project
+
+    def delete(self, project_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM projects WHERE id = ?", (project_id,)).rowcount > 0
+
+    def list_for_user(
+        self,
+        user_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        select, params = self._select(validate_fields(fields))
+
+        where = ["user_id = ?"]
+        params.append(user_id)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if cursor:
+            created_at, project_id = decode_cursor(cursor)
+            where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params.extend([created_at, created_at, project_id])
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT {select}, created_at, id FROM projects
+                WHERE {' AND '.join(where)}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                """,
+                (*params, limit + 1)
+            ).fetchall()
+
+        projects = [json.loads(row[0]) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[1], last[2])
+        return projects, next_cursor
+
+    def count_by_status(self, user_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM projects WHERE user_id = ? GROUP BY status", (user_id,)
+            ).fetchall()
+        return {status or 'unknown': count for status, count in rows}
+
+    def platform_counts(self, user_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT platform.value, COUNT(*)
+                FROM projects, json_each(projects.data, '$.platforms') AS platform
+                WHERE projects.user_id = ?
+                GROUP BY platform.value
+                """,
+                (user_id,)
+            ).fetchall()
+        return {platform: count for platform, count in rows}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM projects")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+
+# URL scheme -> backend class with a ``from_url`` constructor
+PROJECT_BACKENDS = {
+    'sqlite': SQLiteProjectRepository
+}
+
+def create_project_repository(url: str = PROJECTS_DATABASE_URL) -> ProjectRepository:
+    """Open the project store named by a database URL such as sqlite:///projects.db"""
+    scheme = url.split('://', 1)[0].split('+', 1)[0]
+    backend = PROJECT_BACKENDS.get(scheme)
+    if backend is None:
+        raise ValueError(f"Unsupported projects database URL scheme: {scheme}")
+    return backend.from_url(url)
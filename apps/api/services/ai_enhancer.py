@@ -4,16 +4,76 @@ from typing import List, Dict, Optional
 import os
 import json
 import asyncio
+import numpy as np
 from datetime import datetime
 from dotenv import load_dotenv
+from services.llm_gateway import chat_completion, transcription
+from services.viral_score_model import viral_score_model, describe_factors
 
 load_dotenv()
 
+# Concurrent OpenAI requests allowed per process across all AIEnhancer calls
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))
+# Score/hook/hashtag requests cover all platforms in one prompt unless disabled
+AI_BATCH_PLATFORMS = os.getenv('AI_BATCH_PLATFORMS', 'true').lower() == 'true'
+# Viral scores and ceilings come from the local model; the LLM only writes explanations
+AI_LOCAL_VIRAL_SCORE = os.getenv('AI_LOCAL_VIRAL_SCORE', 'true').lower() == 'true'
+
+# Response cache lifetimes for call sites whose answers stay valid for a while
+VIRAL_SCORE_CACHE_TTL = 6 * 3600
+HASHTAG_CACHE_TTL = 6 * 3600  # cached despite temperature 0.6; hashtags change slowly
+TREND_PREDICTION_CACHE_TTL = 30 * 60
+
+# Typical views per platform, scaled by viral score for ceiling predictions
+CEILING_BASE_VIEWS = {
+    'tiktok': 50000,
+    'instagram_reels': 30000,
+    'youtube_shorts': 45000,
+    'instagram_feed': 15000,
+    'twitter': 8000,
+    'linkedin': 5000
+}
+
+# Platform-specific hashtag counts
+HASHTAG_COUNTS = {
+    'tiktok': 5,
+    'instagram_reels': 8,
+    'youtube_shorts': 5,
+    'instagram_feed': 10,
+    'twitter': 3,
+    'linkedin': 5
+}
+
+def _parse_score(entry) -> Optional[float]:
+    """``{"score": 0-100}`` from a batched response as a 0-1 value, or None if malformed"""
+    if not isinstance(entry, dict) or isinstance(entry.get('score'), bool):
+        return None
+    try:
+        score = float(entry['score'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max(0, min(100, int(score))) / 100.0
+
+def _parse_string_list(key: str):
+    """Parser for ``{key: ["...", ...]}`` entries; None unless it is a non-empty list of strings"""
+    def parse(entry) -> Optional[List[str]]:
+        values = entry.get(key) if isinstance(entry, dict) else None
+        if not isinstance(values, list) or not values or not all(isinstance(v, str) and v.strip() for v in values):
+            return None
+        return values
+    return parse
+
 class AIEnhancer:
     """AI-powered viral content optimization service"""
     
     def __init__(self):
-        self.openai_client = openai.Client(api_key=os.getenv('OPENAI_API_KEY'))
+        self.openai_client = openai.AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.max_concurrency = OPENAI_MAX_CONCURRENCY
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop = None
+        self.batch_platforms = AI_BATCH_PLATFORMS
+        self.local_viral_scores = AI_LOCAL_VIRAL_SCORE
+        self.viral_model = viral_score_model
         self.replicate_client = replicate.Client(api_token=os.getenv('REPLICATE_API_TOKEN'))
         
         # Platform-specific optimization parameters
@@ -68,15 +128,118 @@ class AIEnhancer:
             }
         }
     
+    def _openai_slot(self) -> asyncio.Semaphore:
+        """Semaphore bounding in-flight OpenAI requests (one per event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    async def _chat_completion(self, site: str, cache_ttl: Optional[float] = None, **kwargs):
+        """chat.completions.create through the response cache, under the shared concurrency limit"""
+        return await chat_completion(self.openai_client, site=site, cache_ttl=cache_ttl, limit=self._openai_slot(), **kwargs)
+    
+    async def _gather_platforms(self, platforms: List[str], call) -> Dict:
+        """Run ``call(platform, spec)`` concurrently for each supported platform.
+        
+        Latency is that of the slowest platform rather than the sum. If one
+        call fails the others are cancelled and the error propagates, so
+        callers keep falling back to their mock results as before.
+        """
+        targets = [p for p in dict.fromkeys(platforms) if p in self.platform_specs]
+        tasks = [asyncio.ensure_future(call(p, self.platform_specs[p])) for p in targets]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return dict(zip(targets, results))
+    
+    def _specs_for(self, platforms: List[str]) -> Dict[str, Dict]:
+        return {platform: self.platform_specs[platform] for platform in dict.fromkeys(platforms) if platform in self.platform_specs}
+    
+    def _use_batch(self, batched: Optional[bool]) -> bool:
+        return self.batch_platforms if batched is None else batched
+    
+    def _platform_briefs(self, platforms: List[str], fields: List[str]) -> str:
+        """One line per supported platform with the given spec fields, for batched prompts"""
+        lines = []
+        for platform in dict.fromkeys(platforms):
+            spec = self.platform_specs.get(platform)
+            if spec is None:
+                continue
+            details = '; '.join(
+                f"{field.replace('_', ' ')}: {', '.join(spec[field]) if isinstance(spec[field], list) else spec[field]}"
+                for field in fields
+            )
+            lines.append(f"- {platform}: {details}")
+        return '\n        '.join(lines)
+    
+    async def _batched_platforms(self, platforms: List[str], single, parse, prompt: str, system: str,
+                                 model: str, max_tokens: int, temperature: float, site: str,
+                                 cache_ttl: Optional[float] = None) -> Dict:
+        """Ask for every platform in one JSON-mode request.
+        
+        The shared content is sent once instead of once per platform. Each
+        platform's entry in ``{"platforms": {...}}`` must pass ``parse``;
+        platforms whose entry is missing or malformed (or all of them, if the
+        request or JSON fails) are retried with the per-platform ``single`` call.
+        """
+        targets = [p for p in dict.fromkeys(platforms) if p in self.platform_specs]
+        if len(targets) < 2:
+            return await self._gather_platforms(targets, single)
+        
+        def parse_batch(response) -> Dict:
+            entries = json.loads(response.choices[0].message.content).get('platforms', {})
+            if not isinstance(entries, dict):
+                return {}
+            parsed = {platform: parse(entries.get(platform)) for platform in targets}
+            return {platform: value for platform, value in parsed.items() if value is not None}
+        
+        def complete(response) -> bool:
+            # Only cache batches that answered every platform
+            try:
+                return len(parse_batch(response)) == len(targets)
+            except Exception:
+                return False
+        
+        results = {}
+        try:
+            response = await self._chat_completion(
+                site=site,
+                cache_ttl=cache_ttl,
+                cache_if=complete,
+                model=model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=max_tokens * len(targets),
+                temperature=temperature
+            )
+            results = parse_batch(response)
+        except Exception as e:
+            print(f"Batched platform request failed, falling back to per-platform calls: {e}")
+        
+        missing = [p for p in targets if p not in results]
+        if missing:
+            results.update(await self._gather_platforms(missing, single))
+        return {platform: results[platform] for platform in targets}
+    
     async def generate_captions(self, audio_path: str) -> str:
         """Generate captions using Whisper"""
         try:
-            with open(audio_path, "rb") as audio_file:
-                response = self.openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="srt"
-                )
+            response = await transcription(
+                self.openai_client,
+                site="AIEnhancer.generate_captions",
+                file_path=audio_path,
+                limit=self._openai_slot(),
+                model="whisper-1",
+                response_format="srt"
+            )
             return response.text
         except Exception as e:
             print(f"Caption generation error: {e}")
@@ -94,7 +257,8 @@ class AIEnhancer:
         """
         
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self._chat_completion(
+                site="AIEnhancer.generate_hooks",
                 model="gpt-4-turbo-preview",
                 messages=[{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"}
@@ -149,14 +313,7 @@ class AIEnhancer:
             if not self.openai_client.api_key:
                 return self._mock_trending_prediction(platforms)
             
-            trending_predictions = {}
-            
-            for platform in platforms:
-                if platform not in self.platform_specs:
-                    continue
-                
-                spec = self.platform_specs[platform]
-                
+            async def predict(platform: str, spec: Dict):
                 prompt = f"""
                 Based on current cultural moments, news cycles, and platform behavior patterns,
                 predict 5 topics that will likely trend on {platform} in the next 24-48 hours.
@@ -176,7 +333,9 @@ class AIEnhancer:
                 Return as JSON with topics and confidence scores (0-100).
                 """
                 
-                response = self.openai_client.chat.completions.create(
+                response = await self._chat_completion(
+                    site="AIEnhancer.predict_trending_topics",
+                    cache_ttl=TREND_PREDICTION_CACHE_TTL,
                     model="gpt-4-turbo-preview",
                     messages=[
                         {"role": "system", "content": f"You are a viral content trend predictor specializing in {platform}. Predict future trending topics with high accuracy."},
@@ -188,7 +347,9 @@ class AIEnhancer:
                 )
                 
                 result = json.loads(response.choices[0].message.content)
-                trending_predictions[platform] = result.get('trending_topics', [])
+                return result.get('trending_topics', [])
+            
+            trending_predictions = await self._gather_platforms(platforms, predict)
             
             return {
                 'trending_predictions': trending_predictions,
@@ -222,7 +383,8 @@ class AIEnhancer:
             Return as JSON with actionable insights and opportunity scores.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await self._chat_completion(
+                site="AIEnhancer.generate_competitor_analysis",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a competitive intelligence analyst for content creators. Find unique opportunities and gaps."},
@@ -250,14 +412,7 @@ class AIEnhancer:
             if not self.openai_client.api_key:
                 return self._mock_format_suggestions(platforms)
             
-            format_suggestions = {}
-            
-            for platform in platforms:
-                if platform not in self.platform_specs:
-                    continue
-                
-                spec = self.platform_specs[platform]
-                
+            async def suggest(platform: str, spec: Dict):
                 prompt = f"""
                 Suggest 3 viral video formats for {platform} based on current trends:
                 
@@ -277,7 +432,8 @@ class AIEnhancer:
                 Return as JSON with detailed format breakdowns.
                 """
                 
-                response = self.openai_client.chat.completions.create(
+                response = await self._chat_completion(
+                    site="AIEnhancer.generate_viral_format_suggestions",
                     model="gpt-4-turbo-preview",
                     messages=[
                         {"role": "system", "content": f"You are a viral format specialist for {platform}. Suggest proven formats that drive massive engagement."},
@@ -289,7 +445,9 @@ class AIEnhancer:
                 )
                 
                 result = json.loads(response.choices[0].message.content)
-                format_suggestions[platform] = result.get('viral_formats', [])
+                return result.get('viral_formats', [])
+            
+            format_suggestions = await self._gather_platforms(platforms, suggest)
             
             return {
                 'format_suggestions': format_suggestions,
@@ -331,7 +489,8 @@ class AIEnhancer:
             Return as JSON with detailed psychological insights.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await self._chat_completion(
+                site="AIEnhancer.analyze_emotional_triggers",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a behavioral psychologist specializing in viral content. Analyze content for maximum emotional engagement."},
@@ -359,14 +518,7 @@ class AIEnhancer:
             if not self.openai_client.api_key:
                 return self._mock_engagement_hacks(platforms)
             
-            engagement_hacks = {}
-            
-            for platform in platforms:
-                if platform not in self.platform_specs:
-                    continue
-                
-                spec = self.platform_specs[platform]
-                
+            async def generate(platform: str, spec: Dict):
                 prompt = f"""
                 Generate 5 advanced engagement hacks for {platform} that most creators don't know:
                 
@@ -387,7 +539,8 @@ class AIEnhancer:
                 Return as JSON with hack categories and implementation steps.
                 """
                 
-                response = self.openai_client.chat.completions.create(
+                response = await self._chat_completion(
+                    site="AIEnhancer.generate_engagement_hacks",
                     model="gpt-4-turbo-preview",
                     messages=[
                         {"role": "system", "content": f"You are a growth hacking expert specializing in {platform} algorithms. Reveal advanced engagement tactics."},
@@ -399,7 +552,9 @@ class AIEnhancer:
                 )
                 
                 result = json.loads(response.choices[0].message.content)
-                engagement_hacks[platform] = result.get('engagement_hacks', [])
+                return result.get('engagement_hacks', [])
+            
+            engagement_hacks = await self._gather_platforms(platforms, generate)
             
             return {
                 'engagement_hacks': engagement_hacks,
@@ -410,20 +565,16 @@ class AIEnhancer:
             print(f"Engagement hacks error: {e}")
             return self._mock_engagement_hacks(platforms)
     
-    async def predict_viral_ceiling(self, video_metadata: Dict, platforms: List[str]) -> Dict:
+    async def predict_viral_ceiling(self, video_metadata: Dict, platforms: List[str], explain: bool = False) -> Dict:
         """Predict maximum potential reach and engagement"""
         try:
+            if self.local_viral_scores:
+                return await self._local_viral_ceiling(video_metadata, platforms, explain)
+            
             if not self.openai_client.api_key:
                 return self._mock_viral_ceiling(platforms)
             
-            ceiling_predictions = {}
-            
-            for platform in platforms:
-                if platform not in self.platform_specs:
-                    continue
-                
-                spec = self.platform_specs[platform]
-                
+            async def predict(platform: str, spec: Dict):
                 prompt = f"""
                 Predict the viral ceiling for this content on {platform}:
                 
@@ -449,7 +600,8 @@ class AIEnhancer:
                 Return as JSON with numeric predictions and confidence intervals.
                 """
                 
-                response = self.openai_client.chat.completions.create(
+                response = await self._chat_completion(
+                    site="AIEnhancer.predict_viral_ceiling",
                     model="gpt-4-turbo-preview",
                     messages=[
                         {"role": "system", "content": f"You are a viral analytics expert. Predict content performance ceilings with high accuracy based on platform data."},
@@ -461,7 +613,9 @@ class AIEnhancer:
                 )
                 
                 result = json.loads(response.choices[0].message.content)
-                ceiling_predictions[platform] = result.get('predictions', {})
+                return result.get('predictions', {})
+            
+            ceiling_predictions = await self._gather_platforms(platforms, predict)
             
             return {
                 'viral_ceiling': ceiling_predictions,
@@ -473,71 +627,81 @@ class AIEnhancer:
             print(f"Viral ceiling prediction error: {e}")
             return self._mock_viral_ceiling(platforms)
     
+    async def _local_viral_ceiling(self, video_metadata: Dict, platforms: List[str], explain: bool) -> Dict:
+        specs = self._specs_for(platforms)
+        scores = self.viral_model.score_batch([video_metadata], specs)[0]
+        base = np.array([CEILING_BASE_VIEWS.get(platform, 25000) for platform in specs])
+        # Reach grows roughly tenfold for every third of the score range above average
+        conservative = (base * 10 ** (3 * (scores - 0.6))).astype(int)
+        
+        ceiling_predictions = {}
+        for i, platform in enumerate(specs):
+            score = float(scores[i])
+            ceiling_predictions[platform] = {
+                'viral_score': round(score, 2),
+                'max_views_range': {
+                    'conservative': int(conservative[i]),
+                    'optimistic': int(conservative[i]) * 5,
+                    'viral_breakout': int(conservative[i]) * 25
+                },
+                'peak_engagement_rate': round(4 + 12 * score, 1),
+                'viral_velocity': f"{round(48 - 40 * score)} hours to peak",
+                'demographic_penetration': f"{round(10 + 30 * score)}% of target demo",
+                'platform_reach_percentage': f"{0.01 + 0.07 * score:.3f}%",
+                'cross_platform_spillover': round(10 + 40 * score)
+            }
+        
+        result = {
+            'viral_ceiling': ceiling_predictions,
+            'prediction_confidence': self.viral_model.confidence,
+            'analyzed_at': datetime.utcnow().isoformat()
+        }
+        if explain:
+            scores_by_platform = {platform: round(float(score), 2) for platform, score in zip(specs, scores)}
+            result['explanation'] = await self.explain_viral_scores(
+                video_metadata, scores_by_platform, self.viral_model.top_factors(video_metadata, specs)
+            )
+        return result
+    
     # ===== VIRAL OPTIMIZATION FEATURES =====
     
-    async def calculate_viral_score(self, video_metadata: Dict, platforms: List[str]) -> Dict:
+    async def calculate_viral_score(self, video_metadata: Dict, platforms: List[str], batched: Optional[bool] = None,
+                                    explain: bool = False) -> Dict:
         """Calculate viral potential score for each platform (0-100)"""
         try:
+            if self.local_viral_scores:
+                specs = self._specs_for(platforms)
+                result = {
+                    'viral_scores': self.viral_model.score(video_metadata, specs),
+                    'factors': self.viral_model.top_factors(video_metadata, specs),
+                    'analyzed_at': datetime.utcnow().isoformat(),
+                    'confidence': self.viral_model.confidence
+                }
+                if explain:
+                    result['explanation'] = await self.explain_viral_scores(video_metadata, result['viral_scores'], result['factors'])
+                return result
+            
             if not self.openai_client.api_key:
                 return self._mock_viral_scores(platforms)
             
-            # Extract video characteristics
-            duration = video_metadata.get('duration', 30)
-            title = video_metadata.get('title', '')
-            description = video_metadata.get('description', '')
-            transcript = video_metadata.get('transcript', '')
+            async def rate(platform: str, spec: Dict):
+                return await self._viral_score_for_platform(video_metadata, platform, spec)
             
-            viral_scores = {}
-            
-            for platform in platforms:
-                if platform not in self.platform_specs:
-                    continue
-                
-                spec = self.platform_specs[platform]
-                
-                prompt = f"""
-                Analyze this video content for viral potential on {platform}:
-                
-                Title: {title}
-                Description: {description}
-                Duration: {duration}s
-                Transcript: {transcript[:300]}...
-                
-                Platform Context:
-                - Target Audience: {spec['audience']}
-                - Optimal Length: {spec['optimal_length']}s
-                - Content Style: {spec['content_style']}
-                - Trending Tags: {', '.join(spec['trending_tags'])}
-                
-                Rate viral potential (0-100) considering:
-                1. Hook strength (first 3 seconds)
-                2. Emotional engagement triggers
-                3. Platform-specific optimization
-                4. Shareability factors
-                5. Trending potential
-                6. Content quality and uniqueness
-                
-                Return just the numeric score (0-100).
-                """
-                
-                response = self.openai_client.chat.completions.create(
+            if self._use_batch(batched):
+                viral_scores = await self._batched_platforms(
+                    platforms,
+                    single=rate,
+                    parse=_parse_score,
+                    prompt=self._viral_score_batch_prompt(video_metadata, platforms),
+                    system="You are a viral content expert across short-form video platforms. Rate content viral potential from 0-100 for each platform.",
                     model="gpt-4-turbo-preview",
-                    messages=[
-                        {"role": "system", "content": f"You are a viral content expert specializing in {platform}. Rate content viral potential from 0-100."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=50,
-                    temperature=0.3
+                    max_tokens=40,
+                    temperature=0.3,
+                    site="AIEnhancer.calculate_viral_score",
+                    cache_ttl=VIRAL_SCORE_CACHE_TTL
                 )
-                
-                score_text = response.choices[0].message.content.strip()
-                try:
-                    score = int(''.join(filter(str.isdigit, score_text)))
-                    score = max(0, min(100, score))  # Clamp between 0-100
-                except:
-                    score = 65  # Default score if parsing fails
-                
-                viral_scores[platform] = score / 100.0  # Convert to 0-1 range
+            else:
+                viral_scores = await self._gather_platforms(platforms, rate)
             
             return {
                 'viral_scores': viral_scores,
@@ -549,55 +713,163 @@ class AIEnhancer:
             print(f"Viral score calculation error: {e}")
             return self._mock_viral_scores(platforms)
     
-    async def generate_viral_hooks(self, content_summary: str, platforms: List[str]) -> Dict:
+    async def _viral_score_for_platform(self, video_metadata: Dict, platform: str, spec: Dict) -> float:
+        # Extract video characteristics
+        duration = video_metadata.get('duration', 30)
+        title = video_metadata.get('title', '')
+        description = video_metadata.get('description', '')
+        transcript = video_metadata.get('transcript', '')
+        
+        prompt = f"""
+        Analyze this video content for viral potential on {platform}:
+        
+        Title: {title}
+        Description: {description}
+        Duration: {duration}s
+        Transcript: {transcript[:300]}...
+        
+        Platform Context:
+        - Target Audience: {spec['audience']}
+        - Optimal Length: {spec['optimal_length']}s
+        - Content Style: {spec['content_style']}
+        - Trending Tags: {', '.join(spec['trending_tags'])}
+        
+        Rate viral potential (0-100) considering:
+        1. Hook strength (first 3 seconds)
+        2. Emotional engagement triggers
+        3. Platform-specific optimization
+        4. Shareability factors
+        5. Trending potential
+        6. Content quality and uniqueness
+        
+        Return just the numeric score (0-100).
+        """
+        
+        response = await self._chat_completion(
+            site="AIEnhancer.calculate_viral_score",
+            cache_ttl=VIRAL_SCORE_CACHE_TTL,
+            model="gpt-4-turbo-preview",
+            messages=[
+                {"role": "system", "content": f"You are a viral content expert specializing in {platform}. Rate content viral potential from 0-100."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=50,
+            temperature=0.3
+        )
+        
+        score_text = response.choices[0].message.content.strip()
+        try:
+            score = int(''.join(filter(str.isdigit, score_text)))
+            score = max(0, min(100, score))  # Clamp between 0-100
+        except:
+            score = 65  # Default score if parsing fails
+        
+        return score / 100.0  # Convert to 0-1 range
+    
+    def score_variants(self, variants: List[Dict], platforms: List[str]) -> Dict:
+        """Score many metadata variants (titles, durations, tags...) on each platform in one pass"""
+        specs = self._specs_for(platforms)
+        scores = self.viral_model.score_batch(variants, specs)
+        best = scores.argmax(axis=0) if len(variants) else []
+        return {
+            'platforms': list(specs),
+            'scores': scores.round(2).tolist(),
+            'best_variant': {platform: int(best[i]) for i, platform in enumerate(specs)} if len(variants) else {},
+            'analyzed_at': datetime.utcnow().isoformat()
+        }
+    
+    async def explain_viral_scores(self, video_metadata: Dict, scores: Dict[str, float], factors: Dict[str, List[Dict]]) -> str:
+        """Short explanation of locally computed scores, written by the LLM when available"""
+        fallback = describe_factors(factors)
+        if not self.openai_client.api_key or not scores:
+            return fallback
+        try:
+            response = await self._chat_completion(
+                site="AIEnhancer.explain_viral_scores",
+                cache_ttl=VIRAL_SCORE_CACHE_TTL,
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a viral content coach. Explain viral potential scores briefly and suggest one concrete improvement."},
+                    {"role": "user", "content": f"""
+                    Title: {video_metadata.get('title', '')}
+                    Duration: {video_metadata.get('duration', 30)}s
+                    
+                    Scores (0-1) per platform: {json.dumps(scores)}
+                    Strongest factors per platform (impact on the score): {json.dumps(factors)}
+                    
+                    Explain these scores in 2-3 sentences.
+                    """}
+                ],
+                max_tokens=200,
+                temperature=0.3
+            )
+            return response.choices[0].message.content.strip() or fallback
+        except Exception as e:
+            print(f"Viral score explanation error: {e}")
+            return fallback
+    
+    def _viral_score_batch_prompt(self, video_metadata: Dict, platforms: List[str]) -> str:
+        return f"""
+        Analyze this video content for viral potential on each platform listed below:
+        
+        Title: {video_metadata.get('title', '')}
+        Description: {video_metadata.get('description', '')}
+        Duration: {video_metadata.get('duration', 30)}s
+        Transcript: {video_metadata.get('transcript', '')[:300]}...
+        
+        Platforms:
+        {self._platform_briefs(platforms, ['audience', 'optimal_length', 'content_style', 'trending_tags'])}
+        
+        Rate viral potential (0-100) for each platform considering:
+        1. Hook strength (first 3 seconds)
+        2. Emotional engagement triggers
+        3. Platform-specific optimization
+        4. Shareability factors
+        5. Trending potential
+        6. Content quality and uniqueness
+        
+        Return JSON: {{"platforms": {{"<platform>": {{"score": <0-100>}}}}}} with one entry per platform.
+        """
+    
+    async def generate_viral_hooks(self, content_summary: str, platforms: List[str], batched: Optional[bool] = None) -> Dict:
         """Generate platform-specific viral hooks"""
         try:
             if not self.openai_client.api_key:
                 return self._mock_hook_generation(platforms)
             
-            hooks = {}
+            async def generate(platform: str, spec: Dict):
+                return await self._hooks_for_platform(content_summary, platform, spec)
             
-            for platform in platforms:
-                if platform not in self.platform_specs:
-                    continue
-                
-                spec = self.platform_specs[platform]
-                
-                prompt = f"""
-                Create 5 viral hook variations for {platform} based on this content:
-                
-                Content Summary: {content_summary}
-                
-                Platform Guidelines:
-                - Audience: {spec['audience']}
-                - Hook Style: {spec['hook_style']}
-                - Content Style: {spec['content_style']}
-                - Trending Tags: {', '.join(spec['trending_tags'])}
-                
-                Generate hooks that:
-                1. Grab attention in first 3 seconds
-                2. Create curiosity or emotional response
-                3. Are optimized for {platform} algorithm
-                4. Include trending elements when appropriate
-                5. Drive engagement (comments, shares, saves)
-                
-                Return as JSON array of 5 hook strings.
-                """
-                
-                response = self.openai_client.chat.completions.create(
+            if self._use_batch(batched):
+                hooks = await self._batched_platforms(
+                    platforms,
+                    single=generate,
+                    parse=_parse_string_list('hooks'),
+                    prompt=f"""
+                    Create 5 viral hook variations for each platform listed below, based on this content:
+                    
+                    Content Summary: {content_summary}
+                    
+                    Platforms:
+                    {self._platform_briefs(platforms, ['audience', 'hook_style', 'content_style', 'trending_tags'])}
+                    
+                    Generate hooks that:
+                    1. Grab attention in first 3 seconds
+                    2. Create curiosity or emotional response
+                    3. Are optimized for that platform's algorithm
+                    4. Include trending elements when appropriate
+                    5. Drive engagement (comments, shares, saves)
+                    
+                    Return JSON: {{"platforms": {{"<platform>": {{"hooks": ["...", "..."]}}}}}} with one entry per platform.
+                    """,
+                    system="You are a viral content creator across short-form video platforms. Generate compelling hooks tailored to each platform.",
                     model="gpt-4-turbo-preview",
-                    messages=[
-                        {"role": "system", "content": f"You are a viral content creator specializing in {platform}. Generate compelling hooks that drive massive engagement."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    max_tokens=500,
-                    temperature=0.8
+                    max_tokens=400,
+                    temperature=0.8,
+                    site="AIEnhancer.generate_viral_hooks"
                 )
-                
-                result = json.loads(response.choices[0].message.content)
-                platform_hooks = result.get('hooks', [])
-                hooks[platform] = platform_hooks if isinstance(platform_hooks, list) else [platform_hooks]
+            else:
+                hooks = await self._gather_platforms(platforms, generate)
             
             return {
                 'hooks': hooks,
@@ -608,61 +880,87 @@ class AIEnhancer:
             print(f"Hook generation error: {e}")
             return self._mock_hook_generation(platforms)
     
-    async def optimize_hashtags(self, content: str, platforms: List[str]) -> Dict:
+    async def _hooks_for_platform(self, content_summary: str, platform: str, spec: Dict) -> List[str]:
+        prompt = f"""
+        Create 5 viral hook variations for {platform} based on this content:
+        
+        Content Summary: {content_summary}
+        
+        Platform Guidelines:
+        - Audience: {spec['audience']}
+        - Hook Style: {spec['hook_style']}
+        - Content Style: {spec['content_style']}
+        - Trending Tags: {', '.join(spec['trending_tags'])}
+        
+        Generate hooks that:
+        1. Grab attention in first 3 seconds
+        2. Create curiosity or emotional response
+        3. Are optimized for {platform} algorithm
+        4. Include trending elements when appropriate
+        5. Drive engagement (comments, shares, saves)
+        
+        Return as JSON array of 5 hook strings.
+        """
+        
+        response = await self._chat_completion(
+            site="AIEnhancer.generate_viral_hooks",
+            model="gpt-4-turbo-preview",
+            messages=[
+                {"role": "system", "content": f"You are a viral content creator specializing in {platform}. Generate compelling hooks that drive massive engagement."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=500,
+            temperature=0.8
+        )
+        
+        result = json.loads(response.choices[0].message.content)
+        platform_hooks = result.get('hooks', [])
+        return platform_hooks if isinstance(platform_hooks, list) else [platform_hooks]
+    
+    async def optimize_hashtags(self, content: str, platforms: List[str], batched: Optional[bool] = None) -> Dict:
         """Generate optimized hashtags for each platform"""
         try:
             if not self.openai_client.api_key:
                 return self._mock_hashtag_optimization(platforms)
             
-            hashtags = {}
+            async def generate(platform: str, spec: Dict):
+                return await self._hashtags_for_platform(content, platform, spec)
             
-            for platform in platforms:
-                if platform not in self.platform_specs:
-                    continue
-                
-                spec = self.platform_specs[platform]
-                
-                # Platform-specific hashtag counts
-                hashtag_counts = {
-                    'tiktok': 5,
-                    'instagram_reels': 8,
-                    'youtube_shorts': 5,
-                    'instagram_feed': 10,
-                    'twitter': 3,
-                    'linkedin': 5
-                }
-                
-                count = hashtag_counts.get(platform, 5)
-                
-                prompt = f"""
-                Generate {count} optimized hashtags for {platform} based on this content:
-                
-                Content: {content}
-                
-                Requirements:
-                - Mix of trending and niche hashtags
-                - Include some from: {', '.join(spec['trending_tags'])}
-                - Balance reach vs. competition
-                - Consider {platform} algorithm preferences
-                - Target audience: {spec['audience']}
-                
-                Return as JSON array of {count} hashtag strings (without # symbol).
-                """
-                
-                response = self.openai_client.chat.completions.create(
+            if self._use_batch(batched):
+                counts = '\n'.join(f"- {platform}: {HASHTAG_COUNTS.get(platform, 5)} hashtags" for platform in platforms if platform in self.platform_specs)
+                hashtags = await self._batched_platforms(
+                    platforms,
+                    single=generate,
+                    parse=_parse_string_list('hashtags'),
+                    prompt=f"""
+                    Generate optimized hashtags for each platform listed below, based on this content:
+                    
+                    Content: {content}
+                    
+                    Platforms:
+                    {self._platform_briefs(platforms, ['audience', 'trending_tags'])}
+                    
+                    Hashtags per platform:
+                    {counts}
+                    
+                    Requirements:
+                    - Mix of trending and niche hashtags
+                    - Include some of that platform's trending tags
+                    - Balance reach vs. competition
+                    - Consider each platform's algorithm preferences
+                    
+                    Return JSON: {{"platforms": {{"<platform>": {{"hashtags": ["...", "..."]}}}}}} with hashtags without the # symbol.
+                    """,
+                    system="You are a hashtag optimization expert across social platforms. Generate hashtags that maximize reach and engagement on each platform.",
                     model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": f"You are a hashtag optimization expert for {platform}. Generate hashtags that maximize reach and engagement."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    max_tokens=300,
-                    temperature=0.6
+                    max_tokens=150,
+                    temperature=0.6,
+                    site="AIEnhancer.optimize_hashtags",
+                    cache_ttl=HASHTAG_CACHE_TTL
                 )
-                
-                result = json.loads(response.choices[0].message.content)
-                platform_hashtags = result.get('hashtags', [])
-                hashtags[platform] = platform_hashtags if isinstance(platform_hashtags, list) else [platform_hashtags]
+            else:
+                hashtags = await self._gather_platforms(platforms, generate)
             
             return {
                 'hashtags': hashtags,
@@ -673,6 +971,41 @@ class AIEnhancer:
             print(f"Hashtag optimization error: {e}")
             return self._mock_hashtag_optimization(platforms)
     
+    async def _hashtags_for_platform(self, content: str, platform: str, spec: Dict) -> List[str]:
+        count = HASHTAG_COUNTS.get(platform, 5)
+        
+        prompt = f"""
+        Generate {count} optimized hashtags for {platform} based on this content:
+        
+        Content: {content}
+        
+        Requirements:
+        - Mix of trending and niche hashtags
+        - Include some from: {', '.join(spec['trending_tags'])}
+        - Balance reach vs. competition
+        - Consider {platform} algorithm preferences
+        - Target audience: {spec['audience']}
+        
+        Return as JSON array of {count} hashtag strings (without # symbol).
+        """
+        
+        response = await self._chat_completion(
+            site="AIEnhancer.optimize_hashtags",
+            cache_ttl=HASHTAG_CACHE_TTL,
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": f"You are a hashtag optimization expert for {platform}. Generate hashtags that maximize reach and engagement."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=300,
+            temperature=0.6
+        )
+        
+        result = json.loads(response.choices[0].message.content)
+        platform_hashtags = result.get('hashtags', [])
+        return platform_hashtags if isinstance(platform_hashtags, list) else [platform_hashtags]
+    
     async def suggest_optimal_timing(self, user_analytics: Dict, platforms: List[str]) -> Dict:
         """Suggest optimal posting times based on platform data and user analytics"""
         timing_suggestions = {}
@@ -737,7 +1070,8 @@ class AIEnhancer:
             Return as JSON with scores and brief explanations for each element.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await self._chat_completion(
+                site="AIEnhancer.analyze_viral_elements",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a viral content analyst. Rate content elements that contribute to virality."},
@@ -1074,16 +1408,7 @@ class AIEnhancer:
         
         for platform in platforms:
             # Generate realistic but optimistic predictions
-            base_views = {
-                'tiktok': 50000,
-                'instagram_reels': 30000,
-                'youtube_shorts': 45000,
-                'instagram_feed': 15000,
-                'twitter': 8000,
-                'linkedin': 5000
-            }
-            
-            base = base_views.get(platform, 25000)
+            base = CEILING_BASE_VIEWS.get(platform, 25000)
             
             ceiling_predictions[platform] = {
                 'max_views_range': {
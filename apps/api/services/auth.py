@@ -1,5 +1,4 @@
 import jwt
-import bcrypt
 import os
 import secrets
 import string
@@ -13,9 +12,11 @@ from pydantic import BaseModel, EmailStr
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
+from services.email_outbox import email_outbox, SMTP_USERNAME, SMTP_PASSWORD
+from services.password_hasher import password_hasher
+from services.token_cache import token_cache
+from services.token_store import create_token_store
+from services.credit_ledger import credit_ledger
 
 load_dotenv()
 
@@ -26,6 +27,9 @@ JWT_REFRESH_SECRET = os.getenv('JWT_REFRESH_SECRET', 'refresh-secret-key-change-
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 JWT_REFRESH_EXPIRATION_DAYS = 7
+EMAIL_VERIFICATION_TTL = timedelta(hours=24)
+PASSWORD_RESET_TTL = timedelta(hours=1)
+MFA_SETUP_TTL = timedelta(minutes=15)
 
 # Models
 class UserCreate(BaseModel):
@@ -97,35 +101,80 @@ class SocialAccount(BaseModel):
 
 # In-memory user store (replace with database in production)
 users_db: Dict[str, Dict] = {}
+# Normalized email -> user_id index over users_db; becomes a unique index on
+# the email column once users are persisted
+users_by_email: Dict[str, str] = {}
 social_accounts_db: Dict[str, Dict] = {}
-email_verification_tokens: Dict[str, Dict] = {}
-password_reset_tokens: Dict[str, Dict] = {}
+# Short-lived tokens expire on their own (in-memory heap or Redis TTL)
+email_verification_tokens = create_token_store('email_verification')
+password_reset_tokens = create_token_store('password_reset')
+mfa_pending_setups = create_token_store('mfa_setup')  # user_id -> secret/backup codes until verified
 mfa_secrets: Dict[str, str] = {}
 mfa_backup_codes: Dict[str, List[str]] = {}
 
-# Email configuration
-SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
-SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
-SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
-FROM_EMAIL = os.getenv('FROM_EMAIL', 'noreply@viralsplit.io')
+# Email configuration (SMTP settings live in services.email_outbox)
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'https://viralsplit.io')
 
+def normalize_email(email: str) -> str:
+    return email.lower().strip()
+
 class AuthService:
     def __init__(self):
         self.jwt_secret = JWT_SECRET
         self.jwt_algorithm = JWT_ALGORITHM
         # Create default admin user if none exists
         self._create_default_admin()
+        credit_ledger.add_listener(self._sync_credits)
     
     def hash_password(self, password: str) -> str:
-        """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash password using bcrypt (blocking; async code uses hash_password_async)"""
+        return password_hasher.hash_sync(password)
     
     def verify_password(self, password: str, hashed_password: str) -> bool:
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+        """Verify password against hash (blocking; async code uses verify_password_async)"""
+        return password_hasher.verify_sync(password, hashed_password)
+    
+    async def hash_password_async(self, password: str) -> str:
+        """Hash password on the bcrypt worker pool"""
+        return await password_hasher.hash(password)
+    
+    async def verify_password_async(self, password: str, hashed_password: str) -> bool:
+        """Verify password on the bcrypt worker pool"""
+        return await password_hasher.verify(password, hashed_password)
+    
+    async def _rehash_if_needed(self, user: Dict, password: str):
+        """Upgrade a stored hash to the configured bcrypt cost after a successful login"""
+        if password_hasher.needs_rehash(user['password_hash']):
+            user['password_hash'] = await self.hash_password_async(password)
+            password_hasher.rehashed += 1
+    
+    def find_user_by_email(self, email: str) -> Optional[Dict]:
+        """Look up a user by email in O(1) via the email index"""
+        key = normalize_email(email)
+        user_id = users_by_email.get(key)
+        if user_id is None:
+            return None
+        user = users_db.get(user_id)
+        if user is None or normalize_email(user['email']) != key:
+            # The user was removed or renamed outside the service; drop the stale entry
+            users_by_email.pop(key, None)
+            return None
+        return user
+    
+    def _add_user(self, user: Dict):
+        users_db[user['id']] = user
+        users_by_email[normalize_email(user['email'])] = user['id']
+    
+    def _remove_user(self, user_id: str) -> Optional[Dict]:
+        user = users_db.pop(user_id, None)
+        token_cache.invalidate_user(user_id)
+        if user is not None and users_by_email.get(normalize_email(user['email'])) == user_id:
+            del users_by_email[normalize_email(user['email'])]
+        return user
+    
+    def _user_changed(self, user_id: str):
+        """Call after mutating a user record so cached User snapshots are rebuilt"""
+        token_cache.invalidate_user(user_id)
     
     def create_jwt_token(self, user_id: str, email: str) -> str:
         """Create JWT access token for user"""
@@ -179,7 +228,7 @@ class AuthService:
                 'approval_requested_at': None
             }
             
-            users_db[admin_id] = admin_user
+            self._add_user(admin_user)
     
     def generate_verification_token(self) -> str:
         """Generate a secure verification token"""
@@ -190,31 +239,11 @@ class AuthService:
         return [''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8)) for _ in range(count)]
     
     def send_email(self, to_email: str, subject: str, body: str, is_html: bool = False) -> bool:
-        """Send email via SMTP"""
+        """Queue an email on the outbox; delivery happens in the background"""
         if not SMTP_USERNAME or not SMTP_PASSWORD:
             print(f"Email would be sent to {to_email}: {subject}")
             return True  # Mock success for development
-            
-        try:
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = FROM_EMAIL
-            msg['To'] = to_email
-            
-            if is_html:
-                msg.attach(MIMEText(body, 'html'))
-            else:
-                msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(msg)
-            
-            return True
-        except Exception as e:
-            print(f"Failed to send email: {e}")
-            return False
+        return email_outbox.enqueue(to_email, subject, body, is_html)
     
     def send_verification_email(self, email: str, token: str) -> bool:
         """Send email verification"""
@@ -284,14 +313,13 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
         
         # Check if user already exists
-        for user in users_db.values():
-            if user['email'].lower() == user_data.email.lower():
-                raise HTTPException(status_code=400, detail="A user with this email already exists")
+        if self.find_user_by_email(user_data.email):
+            raise HTTPException(status_code=400, detail="A user with this email already exists")
         
         # Create new user
         import uuid
         user_id = str(uuid.uuid4())
-        hashed_password = self.hash_password(user_data.password)
+        hashed_password = await self.hash_password_async(user_data.password)
         
         user = {
             'id': user_id,
@@ -311,16 +339,14 @@ class AuthService:
             'approval_requested_at': datetime.now(timezone.utc) if require_approval else None
         }
         
-        users_db[user_id] = user
+        self._add_user(user)
         
         # Generate and send email verification
         verification_token = self.generate_verification_token()
-        email_verification_tokens[verification_token] = {
+        await email_verification_tokens.put_async(verification_token, {
             'user_id': user_id,
-            'email': user_data.email.lower().strip(),
-            'created_at': datetime.now(timezone.utc),
-            'expires_at': datetime.now(timezone.utc) + timedelta(hours=24)
-        }
+            'email': user_data.email.lower().strip()
+        }, ttl=EMAIL_VERIFICATION_TTL)
         
         # Send verification email
         if self.send_verification_email(user_data.email, verification_token):
@@ -343,18 +369,15 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Email and password are required")
         
         # Find user by email (case insensitive)
-        user = None
-        for u in users_db.values():
-            if u['email'].lower() == login_data.email.lower().strip():
-                user = u
-                break
+        user = self.find_user_by_email(login_data.email)
         
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Verify password
-        if not self.verify_password(login_data.password, user['password_hash']):
+        if not await self.verify_password_async(login_data.password, user['password_hash']):
             raise HTTPException(status_code=401, detail="Invalid email or password")
+        await self._rehash_if_needed(user, login_data.password)
         
         # Check if account is approved
         if not user.get('registration_approved', True):
@@ -369,6 +392,7 @@ class AuthService:
         # Update last login
         user['last_login'] = datetime.now(timezone.utc)
         user['updated_at'] = datetime.now(timezone.utc)
+        self._user_changed(user['id'])
         
         # Generate tokens
         access_token = self.create_jwt_token(user['id'], user['email'])
@@ -382,17 +406,27 @@ class AuthService:
             'user': User(**{k: v for k, v in user.items() if k != 'password_hash'})
         }
     
-    async def get_current_user(self, credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-        """Get current authenticated user"""
-        token = credentials.credentials
+    def authenticate_token(self, token: str) -> User:
+        """Resolve an access token to its user, using the verified-token cache"""
+        # A cache hit skips signature verification and the User rebuild
+        entry = token_cache.get(token, users_db.get)
+        if entry is not None:
+            return entry.user.model_copy()
+        
         payload = self.verify_jwt_token(token)
         
         user_id = payload.get('user_id')
         if not user_id or user_id not in users_db:
             raise HTTPException(status_code=401, detail="User not found")
         
-        user = users_db[user_id]
-        return User(**{k: v for k, v in user.items() if k != 'password_hash'})
+        record = users_db[user_id]
+        user = User(**{k: v for k, v in record.items() if k != 'password_hash'})
+        token_cache.put(token, payload, user, record)
+        return user.model_copy()
+    
+    async def get_current_user(self, credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+        """Get current authenticated user"""
+        return self.authenticate_token(credentials.credentials)
     
     async def get_current_user_optional(self, request: Request) -> Optional[User]:
         """Get current authenticated user (optional - returns None if not authenticated)"""
@@ -402,14 +436,7 @@ class AuthService:
                 return None
             
             token = auth_header.replace('Bearer ', '')
-            payload = self.verify_jwt_token(token)
-            
-            user_id = payload.get('user_id')
-            if not user_id or user_id not in users_db:
-                return None
-            
-            user = users_db[user_id]
-            return User(**{k: v for k, v in user.items() if k != 'password_hash'})
+            return self.authenticate_token(token)
         except:
             return None
     
@@ -453,15 +480,46 @@ class AuthService:
         else:
             raise HTTPException(status_code=404, detail=f'{platform} account not found')
     
+    def _credit_account(self, user_id: str) -> str:
+        """Make sure the ledger has an account, opened with the credits on the user record"""
+        if not credit_ledger.has_account(user_id):
+            if user_id not in users_db:
+                raise HTTPException(status_code=404, detail="User not found")
+            credit_ledger.open_account(user_id, users_db[user_id].get('credits', 0))
+        return user_id
+    
+    def _sync_credits(self, user_id: str, available: int):
+        """Ledger listener: mirror the spendable balance onto the user record"""
+        user = users_db.get(user_id)
+        if user is not None and user.get('credits') != available:
+            user['credits'] = available
+            user['updated_at'] = datetime.now(timezone.utc)
+            self._user_changed(user_id)
+    
+    async def get_credits(self, user_id: str) -> int:
+        """Credits the user can spend right now (excludes open reservations)"""
+        return credit_ledger.available(self._credit_account(user_id))
+    
+    async def reserve_credits(self, user_id: str, amount: int, reason: Optional[str] = None) -> str:
+        """Hold credits for pending work (402 if short); settle with commit/release_credits"""
+        return credit_ledger.reserve(self._credit_account(user_id), amount, reason)
+    
+    async def commit_credits(self, reservation_id: str, amount: Optional[int] = None) -> Optional[int]:
+        """Charge a reservation, optionally only ``amount`` of it"""
+        return credit_ledger.commit(reservation_id, amount)
+    
+    async def release_credits(self, reservation_id: str) -> Optional[int]:
+        """Return a reservation's credits; no-op once it has been settled"""
+        return credit_ledger.release(reservation_id)
+    
+    async def deduct_credits(self, user_id: str, amount: int, reason: Optional[str] = None) -> int:
+        """Atomically check and charge credits; returns the credits left"""
+        return credit_ledger.charge(self._credit_account(user_id), amount, reason)
+    
     async def update_user_credits(self, user_id: str, credits_used: int) -> User:
-        """Update user credits after video processing"""
-        if user_id not in users_db:
-            raise HTTPException(status_code=404, detail="User not found")
-        
+        """Charge credits after video processing"""
+        await self.deduct_credits(user_id, credits_used, reason='video_processing')
         user = users_db[user_id]
-        user['credits'] = max(0, user['credits'] - credits_used)
-        user['updated_at'] = datetime.now(timezone.utc)
-        
         return User(**{k: v for k, v in user.items() if k != 'password_hash'})
     
     async def refresh_access_token(self, refresh_token: str) -> Dict[str, Any]:
@@ -484,11 +542,7 @@ class AuthService:
     async def send_verification_email_endpoint(self, email_data: EmailVerificationRequest) -> Dict[str, str]:
         """Send or resend email verification"""
         # Find user by email
-        user = None
-        for u in users_db.values():
-            if u['email'].lower() == email_data.email.lower():
-                user = u
-                break
+        user = self.find_user_by_email(email_data.email)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -498,12 +552,10 @@ class AuthService:
         
         # Generate new verification token
         verification_token = self.generate_verification_token()
-        email_verification_tokens[verification_token] = {
+        await email_verification_tokens.put_async(verification_token, {
             'user_id': user['id'],
-            'email': user['email'],
-            'created_at': datetime.now(timezone.utc),
-            'expires_at': datetime.now(timezone.utc) + timedelta(hours=24)
-        }
+            'email': user['email']
+        }, ttl=EMAIL_VERIFICATION_TTL)
         
         # Send verification email
         if self.send_verification_email(user['email'], verification_token):
@@ -513,13 +565,13 @@ class AuthService:
     
     async def verify_email(self, verify_data: VerifyEmailRequest) -> Dict[str, str]:
         """Verify email address with token"""
-        token_data = email_verification_tokens.get(verify_data.token)
+        # Consume the token before checking it so concurrent requests cannot both redeem it
+        token_data = await email_verification_tokens.pop_async(verify_data.token)
         
         if not token_data:
             raise HTTPException(status_code=400, detail="Invalid verification token")
         
         if datetime.now(timezone.utc) > token_data['expires_at']:
-            del email_verification_tokens[verify_data.token]
             raise HTTPException(status_code=400, detail="Verification token has expired")
         
         user_id = token_data['user_id']
@@ -529,20 +581,14 @@ class AuthService:
         # Mark email as verified
         users_db[user_id]['email_verified'] = True
         users_db[user_id]['updated_at'] = datetime.now(timezone.utc)
-        
-        # Remove used token
-        del email_verification_tokens[verify_data.token]
+        self._user_changed(user_id)
         
         return {'message': 'Email verified successfully'}
     
     async def request_password_reset(self, reset_data: PasswordResetRequest) -> Dict[str, str]:
         """Request password reset"""
         # Find user by email
-        user = None
-        for u in users_db.values():
-            if u['email'].lower() == reset_data.email.lower():
-                user = u
-                break
+        user = self.find_user_by_email(reset_data.email)
         
         if not user:
             # Don't reveal if user exists or not
@@ -550,12 +596,10 @@ class AuthService:
         
         # Generate reset token
         reset_token = self.generate_verification_token()
-        password_reset_tokens[reset_token] = {
+        await password_reset_tokens.put_async(reset_token, {
             'user_id': user['id'],
-            'email': user['email'],
-            'created_at': datetime.now(timezone.utc),
-            'expires_at': datetime.now(timezone.utc) + timedelta(hours=1)
-        }
+            'email': user['email']
+        }, ttl=PASSWORD_RESET_TTL)
         
         # Send reset email
         self.send_password_reset_email(user['email'], reset_token)
@@ -564,28 +608,27 @@ class AuthService:
     
     async def reset_password(self, reset_data: ResetPasswordRequest) -> Dict[str, str]:
         """Reset password with token"""
-        token_data = password_reset_tokens.get(reset_data.token)
+        # Checked first so a too-short password does not use up the token
+        if len(reset_data.new_password) < 8:
+            raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
+        
+        # Consume the token before checking it so concurrent requests cannot both redeem it
+        token_data = await password_reset_tokens.pop_async(reset_data.token)
         
         if not token_data:
             raise HTTPException(status_code=400, detail="Invalid reset token")
         
         if datetime.now(timezone.utc) > token_data['expires_at']:
-            del password_reset_tokens[reset_data.token]
             raise HTTPException(status_code=400, detail="Reset token has expired")
         
         user_id = token_data['user_id']
         if user_id not in users_db:
             raise HTTPException(status_code=404, detail="User not found")
         
-        if len(reset_data.new_password) < 8:
-            raise HTTPException(status_code=400, detail="Password must be at least 8 characters long")
-        
         # Update password
-        users_db[user_id]['password_hash'] = self.hash_password(reset_data.new_password)
+        users_db[user_id]['password_hash'] = await self.hash_password_async(reset_data.new_password)
         users_db[user_id]['updated_at'] = datetime.now(timezone.utc)
-        
-        # Remove used token
-        del password_reset_tokens[reset_data.token]
+        self._user_changed(user_id)
         
         return {'message': 'Password reset successfully'}
     
@@ -597,7 +640,7 @@ class AuthService:
         user = users_db[user_id]
         
         # Verify current password
-        if not self.verify_password(mfa_data.password, user['password_hash']):
+        if not await self.verify_password_async(mfa_data.password, user['password_hash']):
             raise HTTPException(status_code=400, detail="Invalid password")
         
         if user['mfa_enabled']:
@@ -605,11 +648,12 @@ class AuthService:
         
         # Generate TOTP secret
         secret = pyotp.random_base32()
-        mfa_secrets[user_id] = secret
         
         # Generate backup codes
         backup_codes = self.generate_backup_codes()
-        mfa_backup_codes[user_id] = backup_codes
+        
+        # Kept pending until the user proves the authenticator works
+        await mfa_pending_setups.put_async(user_id, {'secret': secret, 'backup_codes': backup_codes}, ttl=MFA_SETUP_TTL)
         
         # Generate QR code
         totp = pyotp.TOTP(secret)
@@ -640,18 +684,23 @@ class AuthService:
         if user_id not in users_db:
             raise HTTPException(status_code=404, detail="User not found")
         
-        if user_id not in mfa_secrets:
-            raise HTTPException(status_code=400, detail="MFA setup not initiated")
+        pending = await mfa_pending_setups.get_async(user_id)
+        if not pending:
+            raise HTTPException(status_code=400, detail="MFA setup not initiated or expired")
         
-        secret = mfa_secrets[user_id]
+        secret = pending['secret']
         totp = pyotp.TOTP(secret)
         
         if not totp.verify(mfa_data.code):
             raise HTTPException(status_code=400, detail="Invalid MFA code")
         
         # Enable MFA for user
+        await mfa_pending_setups.pop_async(user_id)
+        mfa_secrets[user_id] = secret
+        mfa_backup_codes[user_id] = pending['backup_codes']
         users_db[user_id]['mfa_enabled'] = True
         users_db[user_id]['updated_at'] = datetime.now(timezone.utc)
+        self._user_changed(user_id)
         
         return {'message': 'MFA enabled successfully'}
     
@@ -663,7 +712,7 @@ class AuthService:
         user = users_db[user_id]
         
         # Verify current password
-        if not self.verify_password(mfa_data.password, user['password_hash']):
+        if not await self.verify_password_async(mfa_data.password, user['password_hash']):
             raise HTTPException(status_code=400, detail="Invalid password")
         
         if not user['mfa_enabled']:
@@ -672,6 +721,7 @@ class AuthService:
         # Disable MFA
         users_db[user_id]['mfa_enabled'] = False
         users_db[user_id]['updated_at'] = datetime.now(timezone.utc)
+        self._user_changed(user_id)
         
         # Clean up MFA data
         if user_id in mfa_secrets:
@@ -687,18 +737,15 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Email and password are required")
         
         # Find user by email
-        user = None
-        for u in users_db.values():
-            if u['email'].lower() == login_data.email.lower():
-                user = u
-                break
+        user = self.find_user_by_email(login_data.email)
         
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Verify password
-        if not self.verify_password(login_data.password, user['password_hash']):
+        if not await self.verify_password_async(login_data.password, user['password_hash']):
             raise HTTPException(status_code=401, detail="Invalid email or password")
+        await self._rehash_if_needed(user, login_data.password)
         
         # Check if account is approved
         if not user.get('registration_approved', True):
@@ -723,6 +770,7 @@ class AuthService:
         # Update last login
         user['last_login'] = datetime.now(timezone.utc)
         user['updated_at'] = datetime.now(timezone.utc)
+        self._user_changed(user['id'])
         
         # Generate tokens
         access_token = self.create_jwt_token(user['id'], user['email'])
@@ -767,20 +815,46 @@ class AuthService:
         
         # Update fields
         if update_data.email is not None:
-            user['email'] = update_data.email.lower()
+            new_email = normalize_email(update_data.email)
+            existing = self.find_user_by_email(new_email)
+            if existing and existing['id'] != target_user_id:
+                raise HTTPException(status_code=400, detail="A user with this email already exists")
+            users_by_email.pop(normalize_email(user['email']), None)
+            user['email'] = new_email
+            users_by_email[new_email] = target_user_id
         if update_data.subscription_tier is not None:
             user['subscription_tier'] = update_data.subscription_tier
         if update_data.credits is not None:
-            user['credits'] = update_data.credits
+            credit_ledger.set_balance(self._credit_account(target_user_id), update_data.credits, reason=f"admin:{admin_user_id}")
         if update_data.registration_approved is not None:
             user['registration_approved'] = update_data.registration_approved
         if update_data.is_admin is not None:
             user['is_admin'] = update_data.is_admin
         
         user['updated_at'] = datetime.now(timezone.utc)
+        self._user_changed(target_user_id)
         
         return User(**{k: v for k, v in user.items() if k != 'password_hash'})
     
+    async def delete_user_admin(self, admin_user_id: str, target_user_id: str) -> Dict[str, str]:
+        """Delete a user and their auth data (admin only)"""
+        if admin_user_id not in users_db or not users_db[admin_user_id].get('is_admin', False):
+            raise HTTPException(status_code=403, detail="Admin access required")
+        
+        if target_user_id == admin_user_id:
+            raise HTTPException(status_code=400, detail="Admins cannot delete their own account")
+        
+        if not self._remove_user(target_user_id):
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        mfa_secrets.pop(target_user_id, None)
+        await mfa_pending_setups.pop_async(target_user_id)
+        mfa_backup_codes.pop(target_user_id, None)
+        for key in [k for k, account in social_accounts_db.items() if account['user_id'] == target_user_id]:
+            del social_accounts_db[key]
+        
+        return {'message': 'User deleted successfully'}
+    
     async def get_pending_users(self, admin_user_id: str) -> List[User]:
         """Get users pending approval (admin only)"""
         if admin_user_id not in users_db or not users_db[admin_user_id].get('is_admin', False):
@@ -809,8 +883,9 @@ class AuthService:
             'verified_users': verified_users,
             'mfa_enabled_users': mfa_users,
             'pending_approval_users': pending_users,
-            'active_verification_tokens': len(email_verification_tokens),
-            'active_reset_tokens': len(password_reset_tokens)
+            'active_verification_tokens': email_verification_tokens.count(),
+            'active_reset_tokens': password_reset_tokens.count(),
+            'pending_mfa_setups': mfa_pending_setups.count()
         }
 
 # Initialize auth service
@@ -14,6 +14,7 @@ from dataclasses import dataclass
 import time
 import random
 from PIL import Image, ImageDraw, ImageFont
+from services.llm_gateway import chat_completion
 
 @dataclass
 class RemixVariation:
@@ -580,7 +581,9 @@ class ContentRemixer:
             Make it irresistible to engage with!
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="ContentRemixer.generate_platform_caption",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": f"You are a viral {platform} content strategist who creates captions that guarantee engagement."},
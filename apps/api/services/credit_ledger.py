@@ -0,0 +1,310 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+
+CREDITS_DATABASE_URL = os.getenv('CREDITS_DATABASE_URL', 'sqlite:///:memory:')
+
+class CreditLedger:
+    """Atomic credit accounting with reservations.
+
+    Each account has a ``balance`` and a ``reserved`` amount; what a user can
+    spend is ``balance - reserved``. Work that costs credits first
+    ``reserve``s them (failing with 402 when the available amount is short),
+    then ``commit``s the amount actually used or ``release``s the hold. Every
+    change is appended to the ``credit_ledger`` history table inside the same
+    transaction as the balance update.
+
+    Balances are served from an in-memory cache that is written through on
+    every change made here. SQLite's ``data_version`` pragma tells us when
+    another connection (e.g. a worker sharing the database file) committed,
+    in which case the cache is dropped.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS credit_accounts (
+            user_id TEXT PRIMARY KEY,
+            balance INTEGER NOT NULL,
+            reserved INTEGER NOT NULL DEFAULT 0,
+            CHECK (reserved >= 0 AND balance >= reserved)
+        );
+        CREATE TABLE IF NOT EXISTS credit_reservations (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            reason TEXT,
+            status TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS credit_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            balance_after INTEGER NOT NULL,
+            reservation_id TEXT,
+            reason TEXT,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_credit_ledger_user ON credit_ledger (user_id, id DESC);
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.executescript(self.SCHEMA)
+        self._cache: Dict[str, Tuple[int, int]] = {}  # user_id -> (balance, reserved)
+        self._data_version = self._read_data_version()
+        self._listeners: List[Callable[[str, int], None]] = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rejections = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> 'CreditLedger':
+        path = url.split('://', 1)[1]
+        return cls(path[1:] if path.startswith('/') else path)
+
+    def add_listener(self, listener: Callable[[str, int], None]):
+        """Call ``listener(user_id, available)`` after each balance change"""
+        self._listeners.append(listener)
+
+    # ----- reads -----
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _account(self, user_id: str) -> Optional[Tuple[int, int]]:
+        version = self._read_data_version()
+        if version != self._data_version:
+            # Another connection changed the database since we last looked
+            self._cache.clear()
+            self._data_version = version
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+        row = self._conn.execute(
+            "SELECT balance, reserved FROM credit_accounts WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row:
+            self._cache[user_id] = (row[0], row[1])
+        return self._cache.get(user_id)
+
+    def has_account(self, user_id: str) -> bool:
+        with self._lock:
+            return self._account(user_id) is not None
+
+    def available(self, user_id: str) -> int:
+        """Credits the user can still reserve"""
+        with self._lock:
+            account = self._account(user_id)
+        return account[0] - account[1] if account else 0
+
+    def get_balance(self, user_id: str) -> Dict[str, int]:
+        with self._lock:
+            balance, reserved = self._account(user_id) or (0, 0)
+        return {'balance': balance, 'reserved': reserved, 'available': balance - reserved}
+
+    def history(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent ledger entries for a user, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT id, kind, amount, balance_after, reservation_id, reason, created_at
+                FROM credit_ledger WHERE user_id = ? ORDER BY id DESC LIMIT ?
+                """,
+                (user_id, limit)
+            ).fetchall()
+        keys = ('id', 'kind', 'amount', 'balance_after', 'reservation_id', 'reason', 'created_at')
+        return [dict(zip(keys, row)) for row in rows]
+
+    # ----- writes -----
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                self._cache.clear()
+                raise
+            # Our own commits do not change data_version for this connection
+            self._data_version = self._read_data_version()
+
+    def _apply(self, conn, user_id: str, kind: str, amount: int, balance_delta: int = 0, reserved_delta: int = 0,
+               reservation_id: Optional[str] = None, reason: Optional[str] = None) -> Tuple[int, int]:
+        """Change an account and append the matching history row (inside a transaction)"""
+        conn.execute(
+            "UPDATE credit_accounts SET balance = balance + ?, reserved = reserved + ? WHERE user_id = ?",
+            (balance_delta, reserved_delta, user_id)
+        )
+        balance, reserved = conn.execute(
+            "SELECT balance, reserved FROM credit_accounts WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        conn.execute(
+            """
+            INSERT INTO credit_ledger (user_id, kind, amount, balance_after, reservation_id, reason, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, kind, amount, balance, reservation_id, reason, time.time())
+        )
+        self._cache[user_id] = (balance, reserved)
+        return balance, reserved
+
+    def _notify(self, user_id: str):
+        available = self.available(user_id)
+        for listener in self._listeners:
+            try:
+                listener(user_id, available)
+            except Exception as e:
+                print(f"Credit listener failed for {user_id}: {e}")
+
+    def open_account(self, user_id: str, opening_balance: int = 0, reason: str = 'opening_balance') -> bool:
+        """Create an account if it does not exist yet"""
+        with self._transaction() as conn:
+            created = conn.execute(
+                "INSERT OR IGNORE INTO credit_accounts (user_id, balance, reserved) VALUES (?, 0, 0)", (user_id,)
+            ).rowcount > 0
+            if created:
+                self._apply(conn, user_id, 'grant', opening_balance, balance_delta=opening_balance, reason=reason)
+        if created:
+            self._notify(user_id)
+        return created
+
+    def grant(self, user_id: str, amount: int, reason: str = 'grant') -> int:
+        """Add credits (subscription renewal, refunds, ...); returns the new balance"""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO credit_accounts (user_id, balance, reserved) VALUES (?, 0, 0)", (user_id,))
+            balance, _ = self._apply(conn, user_id, 'grant', amount, balance_delta=amount, reason=reason)
+        self._notify(user_id)
+        return balance
+
+    def set_balance(self, user_id: str, balance: int, reason: str = 'adjustment') -> int:
+        """Set the balance to an absolute value, recording the difference"""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO credit_accounts (user_id, balance, reserved) VALUES (?, 0, 0)", (user_id,))
+            current, reserved = conn.execute(
+                "SELECT balance, reserved FROM credit_accounts WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if balance < reserved:
+                raise HTTPException(status_code=409, detail=f"Balance cannot go below the {reserved} credits currently reserved")
+            self._apply(conn, user_id, 'adjustment', balance - current, balance_delta=balance - current, reason=reason)
+        self._notify(user_id)
+        return balance
+
+    def reserve(self, user_id: str, amount: int, reason: Optional[str] = None) -> str:
+        """Hold credits for pending work; raises 402 when not enough are available"""
+        if amount < 0:
+            raise ValueError("Cannot reserve a negative amount")
+        reservation_id = f"res_{uuid.uuid4().hex}"
+        with self._transaction() as conn:
+            # BEGIN IMMEDIATE holds the write lock, so check-then-update cannot interleave
+            row = conn.execute(
+                "SELECT balance - reserved FROM credit_accounts WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            available = row[0] if row else 0
+            if available < amount:
+                self.rejections += 1
+                raise HTTPException(status_code=402, detail=f"Insufficient credits. Need {amount}, have {available}")
+            conn.execute(
+                "INSERT INTO credit_reservations (id, user_id, amount, reason, status, created_at) VALUES (?, ?, ?, ?, 'open', ?)",
+                (reservation_id, user_id, amount, reason, time.time())
+            )
+            self._apply(conn, user_id, 'reserve', amount, reserved_delta=amount, reservation_id=reservation_id, reason=reason)
+        self._notify(user_id)
+        return reservation_id
+
+    def _settle(self, reservation_id: str, used: Optional[int]) -> Optional[int]:
+        """Close an open reservation, charging ``used`` credits (all when None) and releasing the rest"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT user_id, amount, reason FROM credit_reservations WHERE id = ? AND status = 'open'",
+                (reservation_id,)
+            ).fetchone()
+            if not row:
+                return None  # unknown or already settled
+            user_id, amount, reason = row
+            charged = amount if used is None else min(max(used, 0), amount)
+            conn.execute(
+                "UPDATE credit_reservations SET status = ? WHERE id = ?",
+                ('committed' if charged else 'released', reservation_id)
+            )
+            if charged:
+                self._apply(conn, user_id, 'commit', charged, balance_delta=-charged, reserved_delta=-charged,
+                            reservation_id=reservation_id, reason=reason)
+            if amount - charged:
+                self._apply(conn, user_id, 'release', amount - charged, reserved_delta=-(amount - charged),
+                            reservation_id=reservation_id, reason=reason)
+        self._notify(user_id)
+        return charged
+
+    def commit(self, reservation_id: str, amount: Optional[int] = None) -> Optional[int]:
+        """Charge a reservation (all of it, or ``amount`` with the rest released)"""
+        return self._settle(reservation_id, amount)
+
+    def release(self, reservation_id: str) -> Optional[int]:
+        """Return a reservation's credits unused"""
+        return self._settle(reservation_id, 0)
+
+    def charge(self, user_id: str, amount: int, reason: Optional[str] = None) -> int:
+        """Reserve and commit in one step; returns the credits left"""
+        self.commit(self.reserve(user_id, amount, reason))
+        return self.available(user_id)
+
+    @contextmanager
+    def hold(self, user_id: str, amount: int, reason: Optional[str] = None):
+        """Reserve for the duration of a block: committed on success, released on error.
+
+        The block may ``commit(reservation_id, used)`` itself to charge only part of the hold.
+        """
+        reservation_id = self.reserve(user_id, amount, reason)
+        try:
+            yield reservation_id
+        except BaseException:
+            self.release(reservation_id)
+            raise
+        self.commit(reservation_id)  # no-op if the block already settled it
+
+    def clear(self):
+        with self._lock:
+            self._conn.executescript(
+                "DELETE FROM credit_accounts; DELETE FROM credit_reservations; DELETE FROM credit_ledger;"
+            )
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_count, open_amount = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM credit_reservations WHERE status = 'open'"
+            ).fetchone()
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'open_reservations': open_count,
+            'reserved_credits': open_amount,
+            'rejections': self.rejections,
+            'cached_accounts': len(self._cache),
+            'cache_hit_rate': round(self.cache_hits / lookups, 3) if lookups else None
+        }
+
+def create_credit_ledger(url: str = CREDITS_DATABASE_URL) -> CreditLedger:
+    """Open the ledger named by a database URL such as sqlite:///credits.db"""
+    scheme = url.split('://', 1)[0]
+    if scheme != 'sqlite':
+        raise ValueError(f"Unsupported credits database URL scheme: {scheme}")
+    return CreditLedger.from_url(url)
+
+# Global credit ledger
+credit_ledger = create_credit_ledger()
@@ -10,6 +10,7 @@ from dataclasses import dataclass
 
 # Import existing services to leverage full ecosystem
 from .storage import R2Storage
+from .single_flight import single_flight, request_key
 from supabase import create_client, Client
 
 @dataclass
@@ -35,7 +36,7 @@ class VoiceCloneResult:
 class ElevenLabsAdvancedService:
     def __init__(self):
         self.api_key = os.getenv('ELEVENLABS_API_KEY')
-        self.base_url = "https://api.elevenlabs.io/v1"
+        self.base_url = os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io/v1')
         self.headers = {
             'Accept': 'application/json',
             'xi-api-key': self.api_key
@@ -442,27 +443,32 @@ class ElevenLabsAdvancedService:
         
     async def generate_speech_with_config(self, text: str, config: Dict) -> bytes:
         """Generate speech with specific configuration"""
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "text": text,
-                "voice_settings": {
-                    "stability": config.get('stability', 0.5),
-                    "similarity_boost": config.get('similarity_boost', 0.5),
-                    "style": config.get('style', 0.0),
-                    "use_speaker_boost": True
-                }
+        payload = {
+            "text": text,
+            "voice_settings": {
+                "stability": config.get('stability', 0.5),
+                "similarity_boost": config.get('similarity_boost', 0.5),
+                "style": config.get('style', 0.0),
+                "use_speaker_boost": True
             }
-            
-            response = await client.post(
-                f"{self.base_url}/text-to-speech/{config['voice_id']}",
-                headers=self.headers,
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                return response.content
-            else:
-                raise Exception(f"Speech generation failed: {response.text}")
+        }
+        url = f"{self.base_url}/text-to-speech/{config['voice_id']}"
+        
+        async def synthesize() -> bytes:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(url, headers=self.headers, json=payload)
+                
+                if response.status_code == 200:
+                    return response.content
+                else:
+                    raise Exception(f"Speech generation failed: {response.text}")
+        
+        # Identical concurrent requests share one synthesis
+        return await single_flight.do(
+            request_key('elevenlabs_tts', url, payload),
+            synthesize,
+            site="ElevenLabsAdvancedService.generate_speech_with_config"
+        )
 
     async def store_voice_clone(self, user_id: str, voice_id: str, name: str, source: str):
         """Store voice clone info in Supabase"""
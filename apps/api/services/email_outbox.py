@@ -0,0 +1,246 @@
+import asyncio
+import os
+import random
+import smtplib
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Deque, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Email configuration
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+FROM_EMAIL = os.getenv('FROM_EMAIL', 'noreply@viralsplit.io')
+
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '20'))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '5'))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv('EMAIL_RETRY_BASE_SECONDS', '2'))
+EMAIL_SESSION_IDLE_SECONDS = float(os.getenv('EMAIL_SESSION_IDLE_SECONDS', '60'))
+
+@dataclass
+class OutboxMessage:
+    to_email: str
+    subject: str
+    body: str
+    is_html: bool = False
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+    enqueued_at: float = field(default_factory=time.time)
+    last_error: Optional[str] = None
+
+class EmailOutbox:
+    """Queue of outgoing email drained by one background sender.
+
+    ``enqueue`` returns immediately. The sender keeps a single SMTP session
+    open while there is mail to send (closing it after
+    EMAIL_SESSION_IDLE_SECONDS idle), pushes up to ``batch_size`` messages per
+    round, and retries failures with jittered exponential backoff until
+    ``max_attempts`` is reached.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_SERVER,
+        port: int = SMTP_PORT,
+        username: Optional[str] = SMTP_USERNAME,
+        password: Optional[str] = SMTP_PASSWORD,
+        use_tls: bool = SMTP_USE_TLS,
+        from_email: str = FROM_EMAIL,
+        batch_size: int = EMAIL_BATCH_SIZE,
+        max_attempts: int = EMAIL_MAX_ATTEMPTS,
+        retry_base: float = EMAIL_RETRY_BASE_SECONDS,
+        idle_timeout: float = EMAIL_SESSION_IDLE_SECONDS
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.from_email = from_email
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.idle_timeout = idle_timeout
+
+        self._queue: Deque[OutboxMessage] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self.connections_opened = 0
+
+    def enqueue(self, to_email: str, subject: str, body: str, is_html: bool = False) -> bool:
+        """Queue a message for background delivery"""
+        self._queue.append(OutboxMessage(to_email, subject, body, is_html))
+        self._ensure_worker()
+        return True
+
+    def _ensure_worker(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop yet; the worker starts with the next enqueue or start()
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    async def start(self):
+        self._ensure_worker()
+
+    async def stop(self, timeout: float = 10.0):
+        """Try to flush pending mail, then stop the sender and close the session"""
+        deadline = time.time() + timeout
+        while self._ready_count() and time.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await asyncio.to_thread(self._close_session)
+
+    def _ready_count(self) -> int:
+        now = time.time()
+        return sum(1 for message in self._queue if message.next_attempt_at <= now)
+
+    def _take_batch(self) -> List[OutboxMessage]:
+        now = time.time()
+        batch, waiting = [], deque()
+        while self._queue and len(batch) < self.batch_size:
+            message = self._queue.popleft()
+            (batch if message.next_attempt_at <= now else waiting).append(message)
+        self._queue.extendleft(reversed(waiting))
+        return batch
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            batch = self._take_batch()
+            if batch:
+                try:
+                    failed = await asyncio.to_thread(self._send_batch, batch)
+                except Exception as e:
+                    # Never let one bad batch end the worker; retry it like a connection failure
+                    print(f"Email batch of {len(batch)} failed unexpectedly: {e}")
+                    self._smtp = None
+                    for message in batch:
+                        message.last_error = str(e)
+                    failed = batch
+                self._schedule_retries(failed)
+                continue
+
+            # Sleep until new mail, the next retry, or the idle session timeout
+            now = time.time()
+            timeouts = [m.next_attempt_at - now for m in self._queue]
+            if self._smtp is not None:
+                timeouts.append(self._last_used + self.idle_timeout - now)
+            timeout = max(0.01, min(timeouts)) if timeouts else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            if self._smtp is not None and time.time() - self._last_used >= self.idle_timeout:
+                await asyncio.to_thread(self._close_session)
+
+    def _schedule_retries(self, failed: List[OutboxMessage]):
+        for message in failed:
+            message.attempts += 1
+            if message.attempts >= self.max_attempts:
+                self.failed += 1
+                print(f"Email to {message.to_email} dropped after {message.attempts} attempts: {message.last_error}")
+                continue
+            delay = self.retry_base * (2 ** (message.attempts - 1))
+            message.next_attempt_at = time.time() + delay * random.uniform(0.5, 1.5)
+            self.retried += 1
+            self._queue.append(message)
+
+    # ----- blocking SMTP work, run in a worker thread -----
+
+    def _open_session(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self.connections_opened += 1
+        return smtp
+
+    def _close_session(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+    def _build_message(self, message: OutboxMessage) -> MIMEMultipart:
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = message.subject
+        msg['From'] = self.from_email
+        msg['To'] = message.to_email
+        msg.attach(MIMEText(message.body, 'html' if message.is_html else 'plain'))
+        return msg
+
+    def _send_batch(self, batch: List[OutboxMessage]) -> List[OutboxMessage]:
+        """Send a batch over the shared session; returns the messages that failed"""
+        self.batches += 1
+        failed = []
+        for index, message in enumerate(batch):
+            try:
+                self._send_one(message)
+                self.sent += 1
+            except (smtplib.SMTPServerDisconnected, OSError) as e:
+                # Connection-level failure: the rest of the batch waits for a retry
+                self._smtp = None
+                for pending in batch[index:]:
+                    pending.last_error = str(e)
+                failed.extend(batch[index:])
+                break
+            except Exception as e:
+                # Rejected by the server or unsendable (e.g. an address that cannot be encoded)
+                message.last_error = str(e)
+                failed.append(message)
+        self._last_used = time.time()
+        return failed
+
+    def _send_one(self, message: OutboxMessage):
+        if self._smtp is None:
+            self._smtp = self._open_session()
+        try:
+            self._smtp.send_message(self._build_message(message))
+        except smtplib.SMTPServerDisconnected:
+            # The server closed an idle session; reconnect once and resend
+            self._smtp = self._open_session()
+            self._smtp.send_message(self._build_message(message))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': len(self._queue),
+            'ready': self._ready_count(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'batches': self.batches,
+            'connections_opened': self.connections_opened,
+            'oldest_age_seconds': round(time.time() - min(m.enqueued_at for m in self._queue), 1) if self._queue else 0
+        }
+
+# Global email outbox
+email_outbox = EmailOutbox()
@@ -0,0 +1,186 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+# Sampled per-call JSONL log for offline analysis (empty disables it)
+LLM_CALL_LOG = os.getenv('LLM_CALL_LOG', '')
+LLM_CALL_LOG_SAMPLE_RATE = float(os.getenv('LLM_CALL_LOG_SAMPLE_RATE', '0.05'))
+LATENCY_SAMPLE_SIZE = 1000  # Recent latencies kept per site/endpoint for percentiles
+
+# Cache outcomes whose tokens were billed by the provider; the rest were served without a new request
+BILLED = {'miss', 'bypass', 'aborted'}
+
+_request_scope: contextvars.ContextVar = contextvars.ContextVar('llm_request_scope', default=None)
+
+def current_endpoint() -> Optional[str]:
+    """Route template of the HTTP request being handled, e.g. ``GET /api/trends/live``"""
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get('route')
+    return f"{scope.get('method', 'WS')} {route.path}" if route is not None else None
+
+class EndpointTagMiddleware:
+    """ASGI middleware that lets LLM calls made while serving a request see its route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket'):
+            return await self.app(scope, receive, send)
+        # The router adds the matched route to this same scope dict
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+class LLMCall:
+    """One call as seen by its caller; the gateway fills in cache status and response"""
+    __slots__ = ('site', 'kind', 'model', 'cache', 'response', 'started', 'endpoint')
+
+    def __init__(self, site: str, kind: str, model: Optional[str]):
+        self.site = site
+        self.kind = kind
+        self.model = model or 'unknown'
+        self.cache = 'miss'
+        self.response = None
+        self.started = time.perf_counter()
+        self.endpoint = current_endpoint()
+
+class _Totals:
+    __slots__ = ('calls', 'errors', 'cache', 'models', 'prompt_tokens', 'completion_tokens',
+                 'saved_tokens', 'audio_seconds', 'latencies')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache: Dict[str, int] = {}
+        self.models: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.saved_tokens = 0
+        self.audio_seconds = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLE_SIZE)
+
+    def add(self, entry: Dict[str, Any]):
+        self.calls += 1
+        if entry['error']:
+            self.errors += 1
+        self.cache[entry['cache']] = self.cache.get(entry['cache'], 0) + 1
+        self.models[entry['model']] = self.models.get(entry['model'], 0) + 1
+        if entry['cache'] in BILLED:
+            self.prompt_tokens += entry['prompt_tokens']
+            self.completion_tokens += entry['completion_tokens']
+        else:
+            self.saved_tokens += entry['prompt_tokens'] + entry['completion_tokens']
+        self.audio_seconds += entry['audio_seconds'] or 0
+        self.latencies.append(entry['latency_ms'])
+
+    def summary(self) -> Dict[str, Any]:
+        samples = sorted(self.latencies)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'cache': dict(self.cache),
+            'models': dict(self.models),
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'saved_tokens': self.saved_tokens,
+            'audio_seconds': round(self.audio_seconds, 1),
+            'latency_ms': {
+                'p50': _percentile(samples, 50),
+                'p90': _percentile(samples, 90),
+                'p99': _percentile(samples, 99),
+                'max': round(samples[-1], 1) if samples else None
+            }
+        }
+
+class LLMAccounting:
+    """Latency, token and cache accounting for LLM calls.
+
+    Totals are kept per call site (``AIEnhancer.predict_viral_ceiling``) and
+    per API endpoint for /metrics; a sample of individual calls (and every
+    failed one) is appended to a JSONL file when LLM_CALL_LOG is set.
+    """
+
+    def __init__(self, log_path: str = LLM_CALL_LOG, sample_rate: float = LLM_CALL_LOG_SAMPLE_RATE):
+        self.log_path = log_path
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._log = None
+        self._sites: Dict[str, _Totals] = {}
+        self._endpoints: Dict[str, _Totals] = {}
+
+    @contextmanager
+    def track(self, site: str, kind: str, model: Optional[str]):
+        """Record the wrapped call when it returns or raises (cancellation is not recorded)"""
+        call = LLMCall(site, kind, model)
+        try:
+            yield call
+        except Exception as e:
+            self.record(call, error=type(e).__name__)
+            raise
+        else:
+            self.record(call)
+
+    def record(self, call: LLMCall, error: Optional[str] = None):
+        usage = getattr(call.response, 'usage', None)
+        entry = {
+            'ts': datetime.utcnow().isoformat(),
+            'site': call.site,
+            'endpoint': call.endpoint,
+            'kind': call.kind,
+            'model': call.model,
+            'cache': 'error' if error else call.cache,
+            'latency_ms': round((time.perf_counter() - call.started) * 1000, 1),
+            'prompt_tokens': getattr(usage, 'prompt_tokens', None) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', None) or 0,
+            'audio_seconds': getattr(call.response, 'duration', None) if call.kind == 'transcription' else None,
+            'error': error
+        }
+        with self._lock:
+            self._sites.setdefault(call.site, _Totals()).add(entry)
+            if call.endpoint:
+                self._endpoints.setdefault(call.endpoint, _Totals()).add(entry)
+            if self.log_path and (error or random.random() < self.sample_rate):
+                self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]):
+        try:
+            if self._log is None:
+                self._log = open(self.log_path, 'a', buffering=1)
+            self._log.write(json.dumps(entry) + '\n')
+        except Exception as e:
+            print(f"LLM call log write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._sites.clear()
+            self._endpoints.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sample_log': self.log_path or None,
+                'sample_rate': self.sample_rate,
+                'sites': {site: totals.summary() for site, totals in sorted(self._sites.items())},
+                'endpoints': {endpoint: totals.summary() for endpoint, totals in sorted(self._endpoints.items())}
+            }
+
+def _percentile(sorted_samples: List[float], percent: float) -> Optional[float]:
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(percent / 100 * (len(sorted_samples) - 1))))
+    return round(sorted_samples[index], 1)
+
+# Global LLM call accounting
+llm_accounting = LLMAccounting()
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Second cache tier shared between processes: redis://... or sqlite:///path.db
+# (empty keeps the in-process LRU only)
+LLM_CACHE_URL = os.getenv('LLM_CACHE_URL', '')
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '2000'))
+LLM_CACHE_DEFAULT_TTL = float(os.getenv('LLM_CACHE_DEFAULT_TTL', '3600'))
+# Calls sampled above this temperature are not cached unless the call site sets a TTL
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv('LLM_CACHE_MAX_TEMPERATURE', '0.5'))
+# How long past expiry an entry may still be served while a provider is unavailable
+LLM_CACHE_STALE_SECONDS = float(os.getenv('LLM_CACHE_STALE_SECONDS', '86400'))
+
+# Request parameters that do not change the completion and stay out of the key
+UNKEYED_PARAMS = {'stream', 'timeout', 'user', 'extra_headers'}
+
+def cache_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """Stable hash of everything that determines a completion"""
+    keyed = {k: v for k, v in params.items() if k not in UNKEYED_PARAMS}
+    raw = json.dumps([model, messages, keyed], sort_keys=True, separators=(',', ':'), default=str)
+    return 'llm:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class SQLiteCacheTier:
+    """Completions stored as JSON in SQLite with an expiry column"""
+
+    PRUNE_EVERY = 500  # writes between sweeps of expired rows
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._writes = 0
+
+    def get(self, key: str, stale_for: float = 0.0) -> Optional[Tuple[str, float]]:
+        """Stored value and its expiry timestamp"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time() - stale_for)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time() - LLM_CACHE_STALE_SECONDS,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+class RedisCacheTier:
+    """Completions stored in Redis with native expiry (no stale reads)"""
+
+    blocking = True  # Network round trips; async callers go through a worker thread
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str, stale_for: float = 0.0) -> Optional[Tuple[str, float]]:
+        """Stored value and its expiry timestamp, from PTTL"""
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        value, pttl = pipe.execute()
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        # PTTL is -1 for keys without expiry; set() always gives one
+        expires_at = time.time() + pttl / 1000 if pttl >= 0 else time.time() + LLM_CACHE_DEFAULT_TTL
+        return value, expires_at
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+    def clear(self):
+        for key in self.client.scan_iter(match='llm:*'):
+            self.client.delete(key)
+
+def create_cache_tier(url: str = LLM_CACHE_URL):
+    if not url:
+        return None
+    scheme, path = url.split('://', 1)
+    if scheme.startswith('redis'):
+        import redis
+        return RedisCacheTier(redis.Redis.from_url(url))
+    if scheme == 'sqlite':
+        return SQLiteCacheTier(path[1:] if path.startswith('/') else path)
+    raise ValueError(f"Unsupported LLM cache URL scheme: {scheme}")
+
+class LLMResponseCache:
+    """Two-tier cache of LLM responses.
+
+    An in-process LRU holds response objects as returned by the client; the
+    optional shared tier (Redis or SQLite) holds their JSON form so other
+    processes and restarts can reuse them. Hits and misses are counted per
+    call site (e.g. ``AIEnhancer.calculate_viral_score``).
+    """
+
+    def __init__(self, maxsize: int = LLM_CACHE_SIZE, tier=None):
+        self.maxsize = maxsize
+        self.tier = tier
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._sites: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, site: str, outcome: str):
+        counts = self._sites.setdefault(site, {'hits': 0, 'shared_hits': 0, 'misses': 0, 'bypassed': 0, 'stale_hits': 0})
+        counts[outcome] += 1
+
+    def get(self, key: str, site: str, restore=None) -> Optional[Any]:
+        """Cached response for a key, trying the LRU first and then the shared tier.
+
+        ``restore`` turns the shared tier's JSON back into a response object.
+        """
+        return self._lookup(key, site, restore, stale_for=0.0)
+
+    def get_stale(self, key: str, site: str, restore=None) -> Optional[Any]:
+        """Like ``get``, but also serves entries up to LLM_CACHE_STALE_SECONDS
+        past expiry. Used when the provider is unavailable."""
+        return self._lookup(key, site, restore, stale_for=LLM_CACHE_STALE_SECONDS)
+
+    async def get_async(self, key: str, site: str, restore=None) -> Optional[Any]:
+        """``get`` for async callers; a blocking shared tier is read in a worker thread"""
+        return await self._lookup_async(key, site, restore, stale_for=0.0)
+
+    async def get_stale_async(self, key: str, site: str, restore=None) -> Optional[Any]:
+        return await self._lookup_async(key, site, restore, stale_for=LLM_CACHE_STALE_SECONDS)
+
+    async def set_async(self, key: str, response: Any, ttl: float, serialized: Optional[str] = None):
+        self._remember(key, response, time.time() + ttl)
+        if self._uses_tier(serialized):
+            await self._tier_call(self._tier_set, key, serialized, ttl)
+
+    def _lookup(self, key: str, site: str, restore, stale_for: float) -> Optional[Any]:
+        found, response = self._local_lookup(key, site, stale_for)
+        if found:
+            return response
+        stored = self._tier_get(key, stale_for) if self._uses_tier(restore) else None
+        return self._shared_result(key, site, restore, stale_for, stored)
+
+    async def _lookup_async(self, key: str, site: str, restore, stale_for: float) -> Optional[Any]:
+        found, response = self._local_lookup(key, site, stale_for)
+        if found:
+            return response
+        # Only the tier round trip leaves the loop; the LRU and counters stay on it
+        stored = await self._tier_call(self._tier_get, key, stale_for) if self._uses_tier(restore) else None
+        return self._shared_result(key, site, restore, stale_for, stored)
+
+    def _uses_tier(self, value) -> bool:
+        return self.tier is not None and value is not None
+
+    async def _tier_call(self, method, *args):
+        if getattr(self.tier, 'blocking', False):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _local_lookup(self, key: str, site: str, stale_for: float) -> Tuple[bool, Any]:
+        now = time.time()
+        # Expired entries stay in the LRU until evicted so they can still be served stale
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now - stale_for:
+            self._entries.move_to_end(key)
+            self._count(site, 'hits' if entry[0] > now else 'stale_hits')
+            return True, entry[1]
+        return False, None
+
+    def _tier_get(self, key: str, stale_for: float) -> Optional[Tuple[str, float]]:
+        try:
+            return self.tier.get(key, stale_for)
+        except Exception as e:
+            print(f"LLM cache read failed: {e}")
+            return None
+
+    def _shared_result(self, key: str, site: str, restore, stale_for: float, stored) -> Optional[Any]:
+        if stored is not None:
+            raw, expires_at = stored
+            try:
+                response = restore(raw)
+            except Exception as e:
+                print(f"LLM cache read failed: {e}")
+            else:
+                if not stale_for:
+                    # Keep the local copy only as long as the shared entry lives
+                    self._remember(key, response, expires_at)
+                self._count(site, 'stale_hits' if stale_for else 'shared_hits')
+                return response
+
+        if not stale_for:
+            self._count(site, 'misses')
+        return None
+
+    def set(self, key: str, response: Any, ttl: float, serialized: Optional[str] = None):
+        self._remember(key, response, time.time() + ttl)
+        if self._uses_tier(serialized):
+            self._tier_set(key, serialized, ttl)
+
+    def _tier_set(self, key: str, serialized: str, ttl: float):
+        try:
+            self.tier.set(key, serialized, ttl)
+        except Exception as e:
+            print(f"LLM cache write failed: {e}")
+
+    def bypass(self, site: str):
+        """Record a call that was not eligible for caching"""
+        self._count(site, 'bypassed')
+
+    def _remember(self, key: str, response: Any, expires_at: float):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._sites.clear()
+        if self.tier is not None:
+            self.tier.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        sites = {}
+        for site, counts in sorted(self._sites.items()):
+            lookups = counts['hits'] + counts['shared_hits'] + counts['misses']
+            hits = counts['hits'] + counts['shared_hits']
+            sites[site] = {**counts, 'hit_rate': round(hits / lookups, 3) if lookups else None}
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'shared_tier': type(self.tier).__name__ if self.tier is not None else None,
+            'sites': sites
+        }
+
+# Global LLM response cache
+llm_cache = LLMResponseCache(tier=create_cache_tier())
@@ -0,0 +1,274 @@
+import asyncio
+import inspect
+import json
+import os
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+import openai
+from services.llm_cache import llm_cache, cache_key, LLM_CACHE_DEFAULT_TTL, LLM_CACHE_MAX_TEMPERATURE
+from services.single_flight import single_flight, request_key
+from services.provider_governor import provider_governors, ProviderUnavailable, is_retryable
+from services.llm_accounting import llm_accounting
+
+def _restore_chat_completion(raw: str):
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate_json(raw)
+
+def _serialize(response: Any) -> Optional[str]:
+    return response.model_dump_json() if hasattr(response, 'model_dump_json') else None
+
+async def _call(client, method, limit: Optional[asyncio.Semaphore], **params):
+    """Invoke a sync or async client method without blocking the event loop"""
+    is_async = isinstance(client, openai.AsyncOpenAI) or inspect.iscoroutinefunction(method)
+    if limit is None:
+        return await method(**params) if is_async else await asyncio.to_thread(method, **params)
+    async with limit:
+        return await method(**params) if is_async else await asyncio.to_thread(method, **params)
+
+def _prompt_tokens(params: dict) -> int:
+    """Rough prompt size (~4 characters per token)"""
+    return sum(len(str(message.get('content') or '')) for message in params.get('messages') or []) // 4
+
+def _estimate_tokens(params: dict) -> int:
+    """Rough prompt plus completion size"""
+    return _prompt_tokens(params) + (params.get('max_tokens') or 512)
+
+async def _governed(client, resource, limit: Optional[asyncio.Semaphore], governor, tokens: int = 0, **params):
+    """``resource(client).create(**params)`` under the provider governor.
+
+    For OpenAI clients the SDK's own retries are turned off (the governor
+    retries) and the raw response is read so rate limit headers reach the
+    token buckets.
+    """
+    is_sdk = isinstance(client, (openai.OpenAI, openai.AsyncOpenAI))
+    target = resource(client.with_options(max_retries=0) if is_sdk else client)
+
+    async def attempt():
+        if not is_sdk:
+            return await _call(client, target.create, limit, **params)
+        raw = await _call(client, target.with_raw_response.create, limit, **params)
+        governor.observe_headers(raw.headers)
+        return raw.parse()
+
+    response = await governor.run(attempt, tokens=tokens)
+    if tokens and not is_sdk:
+        # Without headers, correct the estimate from reported usage
+        governor.settle_tokens(tokens, getattr(getattr(response, 'usage', None), 'total_tokens', None))
+    return response
+
+def _chat_completions(client):
+    return client.chat.completions
+
+def _transcriptions(client):
+    return client.audio.transcriptions
+
+def _json_content_ok(response: Any) -> bool:
+    try:
+        json.loads(response.choices[0].message.content)
+        return True
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return False
+
+def cache_ttl_for(params: dict, cache_ttl: Optional[float]) -> float:
+    """TTL for a call: the call site's choice, else the default for low-temperature calls"""
+    if cache_ttl is not None:
+        return cache_ttl
+    return LLM_CACHE_DEFAULT_TTL if params.get('temperature', 1.0) <= LLM_CACHE_MAX_TEMPERATURE else 0
+
+async def chat_completion(
+    client,
+    *,
+    site: str,
+    cache_ttl: Optional[float] = None,
+    limit: Optional[asyncio.Semaphore] = None,
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    **params
+):
+    """``client.chat.completions.create(**params)`` through the shared response cache.
+
+    ``site`` names the calling method for metrics. ``cache_ttl`` overrides the
+    default TTL (0 disables caching); without it only calls at or below
+    LLM_CACHE_MAX_TEMPERATURE are cached. ``limit`` bounds concurrent
+    upstream requests and is not held for cache hits. Responses are only
+    stored if ``cache_if`` accepts them (JSON-mode responses must parse).
+
+    Concurrent identical cacheable calls share one upstream request.
+    Uncached calls are sampled independently on purpose and never coalesced.
+    Requests go through the per-model provider governor; when it gives up
+    (circuit open, throttled or retries exhausted) an expired cached answer
+    is served if there is one, otherwise the error reaches the caller's
+    mock fallback. Every call is recorded in ``llm_accounting``.
+    """
+    with llm_accounting.track(site, 'chat', params.get('model')) as call:
+        call.response = await _cached_chat_completion(client, call, site, cache_ttl, limit, cache_if, params)
+        return call.response
+
+async def _cached_chat_completion(client, call, site, cache_ttl, limit, cache_if, params):
+    governor = provider_governors.get('openai', params.get('model'))
+    tokens = _estimate_tokens(params)
+    ttl = cache_ttl_for(params, cache_ttl)
+    if not ttl:
+        llm_cache.bypass(site)
+        call.cache = 'bypass'
+        return await _governed(client, _chat_completions, limit, governor, tokens, **params)
+
+    extra = {k: v for k, v in params.items() if k not in ('model', 'messages')}
+    key = cache_key(params.get('model'), params.get('messages'), extra)
+    cached = await llm_cache.get_async(key, site, restore=_restore_chat_completion)
+    if cached is not None:
+        call.cache = 'hit'
+        return cached
+
+    if cache_if is None and (params.get('response_format') or {}).get('type') == 'json_object':
+        cache_if = _json_content_ok
+
+    async def fetch():
+        call.cache = 'miss'
+        response = await _governed(client, _chat_completions, limit, governor, tokens, **params)
+        if cache_if is None or cache_if(response):
+            await llm_cache.set_async(key, response, ttl, serialized=_serialize(response))
+        return response
+
+    call.cache = 'coalesced'
+    try:
+        return await single_flight.do(key, fetch, site)
+    except Exception as e:
+        if not (isinstance(e, ProviderUnavailable) or is_retryable(e)):
+            raise
+        # Degrade to an expired answer before the caller falls back to mock data
+        stale = await llm_cache.get_stale_async(key, site, restore=_restore_chat_completion)
+        if stale is None:
+            raise
+        print(f"Serving stale completion for {site}: {e}")
+        call.cache = 'stale'
+        return stale
+
+async def _iterate_stream(stream):
+    """Yield chunks from an async stream, or from a sync one via a worker thread"""
+    if hasattr(stream, '__aiter__'):
+        async for chunk in stream:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def send(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stopped.set()  # the event loop has closed
+
+    def pump():
+        try:
+            for chunk in stream:
+                if stopped.is_set():
+                    break
+                send(chunk)
+            send(done)
+        except Exception as e:
+            send(e)
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+
+    loop.run_in_executor(None, pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # The worker stops reading and closes the HTTP response at the next chunk
+        stopped.set()
+
+async def stream_chat_completion(client, *, site: str, limit: Optional[asyncio.Semaphore] = None, **params):
+    """Yield the text deltas of a streamed ``chat.completions.create``.
+
+    Opening the stream goes through the provider governor (retries only
+    happen before the first token). Streams are never cached or coalesced;
+    the call is recorded in ``llm_accounting`` when it finishes, with usage
+    from the final chunk when the provider reports it. A stream the consumer
+    abandons (client disconnect, cancellation) is recorded as ``aborted``
+    with usage estimated from what was streamed so far.
+    """
+    governor = provider_governors.get('openai', params.get('model'))
+    tokens = _estimate_tokens(params)
+    params = {**params, 'stream': True}
+    if isinstance(client, (openai.OpenAI, openai.AsyncOpenAI)):
+        params.setdefault('stream_options', {'include_usage': True})
+
+    with llm_accounting.track(site, 'chat', params.get('model')) as call:
+        call.cache = 'bypass'
+        llm_cache.bypass(site)
+        streamed = 0  # characters yielded so far
+        try:
+            stream = await _governed(client, _chat_completions, limit, governor, tokens, **params)
+            async for chunk in _iterate_stream(stream):
+                if getattr(chunk, 'usage', None) is not None:
+                    call.response = chunk
+                for choice in getattr(chunk, 'choices', None) or []:
+                    delta = getattr(choice.delta, 'content', None)
+                    if delta:
+                        streamed += len(delta)
+                        yield delta
+        except (GeneratorExit, asyncio.CancelledError):
+            # track() only records returns and exceptions; the provider still bills what it sent
+            call.cache = 'aborted'
+            if call.response is None:
+                call.response = SimpleNamespace(usage=SimpleNamespace(
+                    prompt_tokens=_prompt_tokens(params), completion_tokens=streamed // 4
+                ))
+            llm_accounting.record(call)
+            raise
+
+def _file_identity(path: str):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+async def transcription(client, *, site: str, file_path: str, limit: Optional[asyncio.Semaphore] = None, **params):
+    """``client.audio.transcriptions.create`` for a file on disk.
+
+    Concurrent requests for the same file and parameters share one upload.
+    Every call is recorded in ``llm_accounting``.
+    """
+    key = request_key('transcription', _file_identity(file_path), params)
+    governor = provider_governors.get('openai', params.get('model'))
+
+    with llm_accounting.track(site, 'transcription', params.get('model')) as call:
+        async def fetch():
+            call.cache = 'miss'
+            with open(file_path, "rb") as audio_file:
+                return await _governed(client, _transcriptions, limit, governor, file=audio_file, **params)
+
+        call.cache = 'coalesced'
+        call.response = await single_flight.do(key, fetch, site)
+        return call.response
+
+async def replicate_run(client, model: str, *, site: str, input: dict, files: Optional[dict] = None):
+    """``client.run(model, input=...)`` off the event loop.
+
+    ``files`` maps input names to paths; they are opened by the shared call
+    so it does not depend on any one caller's file handles. Concurrent runs
+    of the same model on the same input share one prediction.
+    """
+    files = files or {}
+    key = request_key('replicate', model, input, {name: _file_identity(path) for name, path in files.items()})
+
+    def run():
+        handles = {name: open(path, "rb") for name, path in files.items()}
+        try:
+            return client.run(model, input={**input, **handles})
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    governor = provider_governors.get('replicate', model.split(':')[0])
+    return await single_flight.do(key, lambda: governor.run(lambda: asyncio.to_thread(run)), site)
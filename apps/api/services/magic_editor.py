@@ -14,6 +14,7 @@ import subprocess
 import requests
 from dataclasses import dataclass
 import time
+from services.llm_gateway import replicate_run, transcription as transcribe
 
 @dataclass
 class EnhancementResult:
@@ -182,15 +183,16 @@ class MagicEditor:
             output_path = os.path.join(temp_dir, "bg_removed.mp4")
             
             # Use Robust Video Matting model
-            with open(video_path, "rb") as video_file:
-                output = self.replicate_client.run(
-                    self.enhancement_models['background_removal'],
-                    input={
-                        "video": video_file,
-                        "downsample_ratio": 0.25,
-                        "variant": "mobilenetv3"
-                    }
-                )
+            output = await replicate_run(
+                self.replicate_client,
+                self.enhancement_models['background_removal'],
+                site="MagicEditor.remove_background",
+                input={
+                    "downsample_ratio": 0.25,
+                    "variant": "mobilenetv3"
+                },
+                files={"video": video_path}
+            )
             
             # Download processed video
             if isinstance(output, str):
@@ -229,16 +231,17 @@ class MagicEditor:
                 # Check if frame has faces
                 if await self.has_faces(frame_path):
                     # Enhance with CodeFormer
-                    with open(frame_path, "rb") as img_file:
-                        enhanced = self.replicate_client.run(
-                            self.enhancement_models['face_enhancement'],
-                            input={
-                                "image": img_file,
-                                "codeformer_fidelity": 0.8,
-                                "background_enhance": True,
-                                "face_upsample": True
-                            }
-                        )
+                    enhanced = await replicate_run(
+                        self.replicate_client,
+                        self.enhancement_models['face_enhancement'],
+                        site="MagicEditor.enhance_faces",
+                        input={
+                            "codeformer_fidelity": 0.8,
+                            "background_enhance": True,
+                            "face_upsample": True
+                        },
+                        files={"image": frame_path}
+                    )
                     
                     if enhanced:
                         enhanced_path = os.path.join(frames_dir, f"enhanced_{frame_file}")
@@ -353,15 +356,16 @@ class MagicEditor:
             
             output_path = os.path.join(temp_dir, "upscaled_4k.mp4")
             
-            with open(video_path, "rb") as video_file:
-                output = self.replicate_client.run(
-                    self.enhancement_models['video_upscale'],
-                    input={
-                        "video": video_file,
-                        "scale": 4,
-                        "face_enhance": True
-                    }
-                )
+            output = await replicate_run(
+                self.replicate_client,
+                self.enhancement_models['video_upscale'],
+                site="MagicEditor.upscale_video",
+                input={
+                    "scale": 4,
+                    "face_enhance": True
+                },
+                files={"video": video_path}
+            )
             
             if output:
                 await self.download_file(output, output_path)
@@ -508,12 +512,13 @@ class MagicEditor:
             
             if os.path.exists(audio_path):
                 # Transcribe with Whisper
-                with open(audio_path, "rb") as audio_file:
-                    transcription = self.openai_client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        response_format="srt"
-                    )
+                transcription = await transcribe(
+                    self.openai_client,
+                    site="MagicEditor.add_automatic_subtitles",
+                    file_path=audio_path,
+                    model="whisper-1",
+                    response_format="srt"
+                )
                 
                 # Save subtitles
                 srt_path = os.path.join(temp_dir, "subtitles.srt")
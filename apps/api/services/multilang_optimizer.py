@@ -9,6 +9,7 @@ import re
 from dataclasses import dataclass
 from deep_translator import GoogleTranslator
 import langdetect
+from services.llm_gateway import chat_completion
 
 @dataclass
 class LanguageProfile:
@@ -340,7 +341,9 @@ class MultiLanguageOptimizer:
             - emoji_recommendations: culturally appropriate emojis
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="MultiLanguageOptimizer._optimize_for_language",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": f"You are a native {lang_profile.name} speaker and viral content expert. Create culturally authentic, engaging content."},
@@ -518,7 +521,9 @@ class MultiLanguageOptimizer:
             Return as JSON with caption, hashtags, and cultural notes.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="MultiLanguageOptimizer._generate_language_caption",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": f"You are a native {lang_profile.name} speaker creating viral social media content."},
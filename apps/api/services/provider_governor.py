@@ -0,0 +1,316 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import openai
+
+# Starting limits per provider; OpenAI's x-ratelimit-* headers replace them per model
+PROVIDER_LIMITS = {
+    'openai': {
+        'rpm': int(os.getenv('OPENAI_RPM_LIMIT', '500')),
+        'tpm': int(os.getenv('OPENAI_TPM_LIMIT', '150000'))
+    },
+    'replicate': {
+        'rpm': int(os.getenv('REPLICATE_RPM_LIMIT', '600')),
+        'tpm': None
+    }
+}
+AI_RETRY_ATTEMPTS = int(os.getenv('AI_RETRY_ATTEMPTS', '3'))
+AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', '0.5'))
+AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', '8'))
+AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', '5'))
+AI_BREAKER_RESET_SECONDS = float(os.getenv('AI_BREAKER_RESET_SECONDS', '30'))
+# Requests that would wait longer than this for rate limit capacity fail fast instead
+AI_MAX_THROTTLE_WAIT = float(os.getenv('AI_MAX_THROTTLE_WAIT', '10'))
+
+class ProviderUnavailable(Exception):
+    """The provider cannot take the request now (circuit open or throttled)"""
+
+class ProviderThrottled(ProviderUnavailable):
+    """Waiting for rate limit capacity would take longer than AI_MAX_THROTTLE_WAIT"""
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds from an OpenAI reset header such as ``20ms``, ``1s`` or ``6m0s``"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits, timeouts, connection failures and 5xx responses are worth retrying"""
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError,
+                        asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'status', None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+def _error_headers(exc: BaseException):
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'headers', None)
+
+class TokenBucket:
+    """Capacity refilled evenly over a minute; the level may go negative when
+    actual usage turns out higher than estimated"""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.period = period
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / self.period)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * self.period / self.capacity
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Adopt the provider's view of the limit and what is left of it"""
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(float(remaining), self.capacity)
+
+class CircuitBreaker:
+    """Opens after consecutive failed requests and lets one probe through
+    once the reset timeout has passed"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = AI_BREAKER_FAILURES, reset_timeout: float = AI_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+
+    def allow(self, now: float) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        # Also re-probes if an earlier probe never reported back
+        if now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.opened_at = now
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = now
+
+class ProviderGovernor:
+    """Rate limits, retries and circuit breaking for one provider model"""
+
+    def __init__(self, provider: str, model: str, rpm: Optional[int] = None, tpm: Optional[int] = None,
+                 max_attempts: int = AI_RETRY_ATTEMPTS, base_delay: float = AI_RETRY_BASE_DELAY,
+                 max_delay: float = AI_RETRY_MAX_DELAY, max_wait: float = AI_MAX_THROTTLE_WAIT,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.provider = provider
+        self.model = model
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.breaker = breaker or CircuitBreaker()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0, 'throttled': 0, 'throttle_wait_seconds': 0.0, 'shed': 0,
+            'rate_limited': 0, 'retries': 0, 'failures': 0, 'rejected': 0
+        }
+
+    def _reserve(self, tokens: float) -> float:
+        """Take capacity now, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            if self.requests is not None:
+                wait = max(wait, self.requests.wait_time(1, now))
+            if self.tokens is not None and tokens:
+                wait = max(wait, self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None and tokens:
+                self.tokens.take(tokens)
+            return 0.0
+
+    async def _acquire(self, tokens: float):
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                break
+            if waited + wait > self.max_wait:
+                self.stats['shed'] += 1
+                raise ProviderThrottled(f"{self.provider}/{self.model} rate limited for another {wait:.1f}s")
+            if not waited:
+                self.stats['throttled'] += 1
+            await asyncio.sleep(wait)
+            waited += wait
+        self.stats['throttle_wait_seconds'] += waited
+
+    def observe_headers(self, headers):
+        """Feed x-ratelimit-* response headers into the buckets"""
+        if not headers:
+            return
+        def number(name):
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+        with self._lock:
+            now = time.monotonic()
+            for bucket_name, kind in (('requests', 'requests'), ('tokens', 'tokens')):
+                limit, remaining = number(f'x-ratelimit-limit-{kind}'), number(f'x-ratelimit-remaining-{kind}')
+                if limit is None and remaining is None:
+                    continue
+                bucket = getattr(self, bucket_name)
+                if bucket is None and limit:
+                    bucket = TokenBucket(limit)
+                    setattr(self, bucket_name, bucket)
+                if bucket is not None:
+                    bucket.sync(limit, remaining, now)
+
+    def settle_tokens(self, estimated: float, used: Optional[float]):
+        """Correct the token bucket once actual usage is known"""
+        if self.tokens is None or used is None:
+            return
+        with self._lock:
+            self.tokens.take(used - estimated)
+            self.tokens.level = min(self.tokens.level, self.tokens.capacity)
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        headers = _error_headers(exc)
+        retry_after = parse_reset(headers.get('retry-after')) if headers else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter so concurrent retries spread out
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, call: Callable[[], Awaitable[Any]], tokens: float = 0) -> Any:
+        """Await ``call()`` within the limits, retrying transient failures"""
+        with self._lock:
+            allowed = self.breaker.allow(time.monotonic())
+        if not allowed:
+            self.stats['rejected'] += 1
+            raise ProviderUnavailable(f"{self.provider}/{self.model} circuit open")
+
+        attempt = 0
+        while True:
+            await self._acquire(tokens)
+            self.stats['requests'] += 1
+            try:
+                result = await call()
+            except Exception as e:
+                if not is_retryable(e):
+                    # The provider answered; the request itself was bad
+                    with self._lock:
+                        self.breaker.record_success()
+                    raise
+                rate_limited = isinstance(e, openai.RateLimitError) or getattr(e, 'status_code', None) == 429
+                if rate_limited:
+                    self.stats['rate_limited'] += 1
+                    self.observe_headers(_error_headers(e))
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    self.stats['failures'] += 1
+                    with self._lock:
+                        self.breaker.record_failure(time.monotonic())
+                    raise
+                delay = self._backoff(attempt, e)
+                self.stats['retries'] += 1
+                if rate_limited:
+                    # Hold back every caller of this model, not just this one
+                    with self._lock:
+                        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+            with self._lock:
+                self.breaker.record_success()
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        def bucket(b: Optional[TokenBucket]):
+            return {'limit': b.capacity, 'available': round(max(b.level, 0.0), 1)} if b else None
+        with self._lock:
+            now = time.monotonic()
+            for b in (self.requests, self.tokens):
+                if b is not None:
+                    b._refill(now)
+            return {
+                **self.stats,
+                'throttle_wait_seconds': round(self.stats['throttle_wait_seconds'], 3),
+                'breaker': self.breaker.state,
+                'consecutive_failures': self.breaker.failures,
+                'times_opened': self.breaker.times_opened,
+                'requests_per_minute': bucket(self.requests),
+                'tokens_per_minute': bucket(self.tokens)
+            }
+
+class ProviderGovernors:
+    """One governor per (provider, model)"""
+
+    def __init__(self, limits: Dict[str, Dict[str, Optional[int]]] = None):
+        self.limits = limits or PROVIDER_LIMITS
+        self._governors: Dict[Tuple[str, str], ProviderGovernor] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str) -> ProviderGovernor:
+        key = (provider, model or 'default')
+        governor = self._governors.get(key)
+        if governor is None:
+            with self._lock:
+                governor = self._governors.get(key)
+                if governor is None:
+                    limits = self.limits.get(provider, {})
+                    governor = ProviderGovernor(provider, key[1], rpm=limits.get('rpm'), tpm=limits.get('tpm'))
+                    self._governors[key] = governor
+        return governor
+
+    def clear(self):
+        with self._lock:
+            self._governors.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {f"{provider}/{model}": governor.get_stats()
+                for (provider, model), governor in sorted(self._governors.items())}
+
+# Global governors for external AI providers
+provider_governors = ProviderGovernors()
@@ -2,10 +2,19 @@ import openai
 import json
 import asyncio
 import os
-from typing import Dict, List, Optional, Tuple
+import re
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
 import random
 from dataclasses import dataclass
+from services.llm_gateway import chat_completion, stream_chat_completion
+
+SCRIPT_MODEL_PARAMS = {
+    "model": "gpt-4-turbo-preview",
+    "response_format": {"type": "json_object"},
+    "max_tokens": 2000,
+    "temperature": 0.8
+}
 
 @dataclass
 class EmotionalBeat:
@@ -21,6 +30,59 @@ class ViralHook:
     viral_score: int
     best_for: List[str]
 
+class ScriptFieldStream:
+    """Pulls the text of the "script" string out of a JSON response as it
+    streams in, so it can be shown before the JSON is complete"""
+    
+    START = re.compile(r'"script"\s*:\s*"')
+    ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+    
+    def __init__(self):
+        self.buffer = ""
+        self.state = 'seek'
+    
+    def feed(self, delta: str) -> str:
+        """Add a chunk of the response; returns any newly completed script text"""
+        if self.state == 'done':
+            return ""
+        self.buffer += delta
+        if self.state == 'seek':
+            match = self.START.search(self.buffer)
+            if not match:
+                return ""
+            self.buffer = self.buffer[match.end():]
+            self.state = 'value'
+        
+        text = []
+        i = 0
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            if char == '"':
+                self.state = 'done'
+                i = len(self.buffer)
+                break
+            if char != '\\':
+                text.append(char)
+                i += 1
+                continue
+            # Escape sequence: wait for the rest of it if it is split across chunks
+            if i + 1 >= len(self.buffer):
+                break
+            code = self.buffer[i + 1]
+            if code == 'u':
+                if i + 6 > len(self.buffer):
+                    break
+                try:
+                    text.append(chr(int(self.buffer[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                text.append(self.ESCAPES.get(code, code))
+                i += 2
+        self.buffer = self.buffer[i:]
+        return "".join(text)
+
 class AIScriptWriter:
     """Revolutionary AI script generation system that guarantees viral content"""
     
@@ -192,22 +254,90 @@ class AIScriptWriter:
             # Generate variations
             variations = await self.generate_script_variations(script_data, 3)
             
-            return {
-                "script": script_data["script"],
-                "title_suggestions": script_data.get("title_suggestions", []),
-                "viral_score": viral_score,
-                "hooks": [hook.text for hook in hooks],
-                "emotional_beats": emotional_arc,
-                "platform_optimizations": self.get_platform_optimizations(platform),
-                "variations": variations,
-                "performance_prediction": self.predict_performance(script_data, viral_score),
-                "improvement_suggestions": self.get_improvement_suggestions(script_data, viral_score)
-            }
+            return self.build_script_result(script_data, hooks, emotional_arc, platform, viral_score, variations)
             
         except Exception as e:
             print(f"Script generation error: {e}")
             return self.generate_mock_script(concept, platform, duration, style)
     
+    async def stream_viral_script(self, 
+                                  concept: str,
+                                  platform: str,
+                                  duration: int,
+                                  style: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """Generate a viral script as a series of ``(event, data)`` pairs.
+        
+        ``hooks`` arrives first, then ``token`` events carrying the script text
+        as the model writes it, then ``script``, ``viral_score`` and
+        ``variations``, and finally ``done`` with the same result as
+        generate_viral_script.
+        """
+        platform_spec = self.platform_specs.get(platform, self.platform_specs['tiktok'])
+        style_config = self.style_configs.get(style, self.style_configs['educational'])
+        hooks = await self.get_trending_hooks(concept, platform, style)
+        emotional_arc = self.create_emotional_journey(duration, style)
+        yield "hooks", {"hooks": [hook.text for hook in hooks]}
+        
+        script_data = None
+        if self.openai_client and self.openai_client.api_key:
+            content = []
+            script_field = ScriptFieldStream()
+            try:
+                async for delta in stream_chat_completion(
+                    self.openai_client,
+                    site="AIScriptWriter.stream_viral_script",
+                    messages=self.script_messages(concept, hooks, emotional_arc, platform, duration,
+                                                  style_config, platform_spec),
+                    **SCRIPT_MODEL_PARAMS
+                ):
+                    content.append(delta)
+                    text = script_field.feed(delta)
+                    if text:
+                        yield "token", {"text": text}
+                script_data = json.loads("".join(content))
+                if not isinstance(script_data.get("script"), str):
+                    raise ValueError("response has no script")
+            except Exception as e:
+                print(f"Script streaming error: {e}")
+                script_data = None
+        
+        if script_data is None:
+            # The script event below replaces anything streamed so far
+            script_data = self.generate_mock_script(concept, platform, duration, style)
+            yield "token", {"text": script_data["script"], "replace": True}
+        
+        yield "script", {
+            "script": script_data["script"],
+            "title_suggestions": script_data.get("title_suggestions", [])
+        }
+        
+        viral_score = self.calculate_viral_potential(script_data, platform, style)
+        yield "viral_score", {
+            "viral_score": viral_score,
+            "performance_prediction": self.predict_performance(script_data, viral_score),
+            "improvement_suggestions": self.get_improvement_suggestions(script_data, viral_score)
+        }
+        
+        variations = await self.generate_script_variations(script_data, 3)
+        yield "variations", {"variations": variations}
+        
+        yield "done", self.build_script_result(script_data, hooks, emotional_arc, platform, viral_score, variations)
+    
+    def build_script_result(self, script_data: Dict, hooks: List[ViralHook], emotional_arc: List[EmotionalBeat],
+                            platform: str, viral_score: int, variations: List[Dict]) -> Dict:
+        """Assemble the full script response"""
+        return {
+            "script": script_data["script"],
+            "title_suggestions": script_data.get("title_suggestions", []),
+            "viral_score": viral_score,
+            "hooks": [hook.text for hook in hooks],
+            "emotional_beats": emotional_arc,
+            "platform_optimizations": self.get_platform_optimizations(platform),
+            "variations": variations,
+            "performance_prediction": self.predict_performance(script_data, viral_score),
+            "improvement_suggestions": self.get_improvement_suggestions(script_data, viral_score)
+        }
+    
     async def get_trending_hooks(self, concept: str, platform: str, style: str) -> List[ViralHook]:
         """Get the best hooks for the given concept and style"""
         
@@ -272,6 +402,26 @@ class AIScriptWriter:
                                 platform_spec: Dict) -> Dict:
         """Use AI to generate the actual script"""
         
+        response = await chat_completion(
+            self.openai_client,
+            site="AIScriptWriter.ai_generate_script",
+            messages=self.script_messages(concept, hooks, emotional_arc, platform, duration,
+                                          style_config, platform_spec),
+            **SCRIPT_MODEL_PARAMS
+        )
+        
+        return json.loads(response.choices[0].message.content)
+    
+    def script_messages(self,
+                        concept: str,
+                        hooks: List[ViralHook],
+                        emotional_arc: List[EmotionalBeat],
+                        platform: str,
+                        duration: int,
+                        style_config: Dict,
+                        platform_spec: Dict) -> List[Dict]:
+        """Chat messages for script generation"""
+        
         hook_text = " OR ".join([hook.text for hook in hooks[:3]])
         emotion_guidance = ", ".join([f"{beat.emotion} at {beat.timestamp}s" for beat in emotional_arc])
         
@@ -308,20 +458,15 @@ class AIScriptWriter:
         4. Call-to-action suggestions
         
         Make it conversational, authentic, and absolutely addictive to watch.
-        """
         
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": f"You are a viral content expert who has created scripts that generated billions of views. You understand psychology, platform algorithms, and what makes people share content. Create scripts that are authentic, valuable, and impossible to scroll past."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            max_tokens=2000,
-            temperature=0.8
-        )
+        Respond in JSON with "script" (the full script as one string) first,
+        then "title_suggestions", "emotional_moments" and "call_to_action".
+        """
         
-        return json.loads(response.choices[0].message.content)
+        return [
+            {"role": "system", "content": f"You are a viral content expert who has created scripts that generated billions of views. You understand psychology, platform algorithms, and what makes people share content. Create scripts that are authentic, valuable, and impossible to scroll past."},
+            {"role": "user", "content": prompt}
+        ]
     
     def generate_mock_script(self, concept: str, platform: str, duration: int, style: str) -> Dict:
         """Generate mock script when AI is not available"""
@@ -549,7 +694,9 @@ Call-to-action: Has this ever happened to you? Share your story!"""
             Make it more compelling while maintaining authenticity.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="AIScriptWriter.refine_script",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a script doctor who specializes in making content more viral and engaging."},
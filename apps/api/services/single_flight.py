@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+import json
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+def request_key(*parts: Any) -> str:
+    """Stable hash of the arguments that identify an upstream request"""
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Coalesces concurrent identical requests into one upstream call.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight await the same task and get the same result or
+    exception. A caller that is cancelled only stops waiting: the upstream
+    call is cancelled once every caller has gone, and is never left for a
+    later caller to join. Flights are tracked per event loop.
+    """
+
+    def __init__(self):
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Flight]]" = weakref.WeakKeyDictionary()
+        self._sites: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, site: str, outcome: str):
+        counts = self._sites.setdefault(site, {'calls': 0, 'coalesced': 0, 'abandoned': 0})
+        counts[outcome] += 1
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], site: str = 'default') -> Any:
+        """Await ``fn()``, or the identical call already in flight for ``key``"""
+        loop = asyncio.get_running_loop()
+        flights = self._flights.setdefault(loop, {})
+        flight = flights.get(key)
+
+        if flight is None:
+            flight = _Flight(loop.create_task(fn()))
+            flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._landed(flights, key, flight))
+            self._count(site, 'calls')
+        else:
+            self._count(site, 'coalesced')
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting any more: drop the flight and stop the call
+                self._landed(flights, key, flight)
+                flight.task.cancel()
+                self._count(site, 'abandoned')
+
+    @staticmethod
+    def _landed(flights: Dict[str, _Flight], key: str, flight: _Flight):
+        if flights.get(key) is flight:
+            del flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            flight.task.exception()  # retrieved by the waiters; avoid the asyncio warning
+
+    def in_flight(self) -> int:
+        return sum(len(flights) for flights in list(self._flights.values()))
+
+    def clear(self):
+        self._sites.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': self.in_flight(),
+            'sites': {site: dict(counts) for site, counts in sorted(self._sites.items())}
+        }
+
+# Global coalescing layer for OpenAI, Replicate and ElevenLabs requests
+single_flight = SingleFlight()
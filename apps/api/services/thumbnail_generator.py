@@ -12,6 +12,7 @@ from datetime import datetime
 import tempfile
 import cv2
 import numpy as np
+from services.llm_gateway import chat_completion, replicate_run
 
 class AIThumbnailGenerator:
     """Advanced AI-powered thumbnail generation system"""
@@ -128,7 +129,9 @@ class AIThumbnailGenerator:
             Return as JSON with detailed recommendations.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="AIThumbnailGenerator._analyze_video_content",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a viral thumbnail optimization expert. Analyze content for maximum click-through rates."},
@@ -190,8 +193,10 @@ class AIThumbnailGenerator:
             prompt = self._create_ai_image_prompt(title, style, mood, platform)
             
             # Generate image using Replicate (SDXL or similar)
-            output = self.replicate_client.run(
+            output = await replicate_run(
+                self.replicate_client,
                 "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b",
+                site="AIThumbnailGenerator._generate_ai_thumbnail",
                 input={
                     "prompt": prompt,
                     "width": spec['size'][0],
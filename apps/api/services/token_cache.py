@@ -0,0 +1,107 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Set
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+@dataclass
+class CachedToken:
+    claims: Dict[str, Any]
+    user_id: str
+    user: Any  # prebuilt User snapshot
+    record: Dict[str, Any]  # users_db entry the snapshot was built from
+    record_version: Any  # record's updated_at when the snapshot was built
+    expires_at: float
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified access tokens, keyed by token digest.
+
+    An entry lives until the token's ``exp`` and is dropped when its user is
+    invalidated. As a safety net a hit is only served while the stored user
+    record is the same object with the same ``updated_at`` it was built from.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, CachedToken]" = OrderedDict()
+        self._by_user: Dict[str, Set[bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str, load_record: Callable[[str], Optional[Dict[str, Any]]]) -> Optional[CachedToken]:
+        """Cached entry for a token, or None; ``load_record`` fetches the current user record"""
+        digest = token_digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        record = load_record(entry.user_id)
+        if entry.expires_at <= time.time() or record is not entry.record or record.get('updated_at') != entry.record_version:
+            self._discard(digest)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return entry
+
+    def put(self, token: str, claims: Dict[str, Any], user: Any, record: Dict[str, Any]):
+        if self.maxsize <= 0:
+            return
+        digest = token_digest(token)
+        self._discard(digest)
+        self._entries[digest] = CachedToken(
+            claims=claims,
+            user_id=claims['user_id'],
+            user=user,
+            record=record,
+            record_version=record.get('updated_at'),
+            expires_at=float(claims.get('exp', 0))
+        )
+        self._by_user.setdefault(claims['user_id'], set()).add(digest)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """Forget every cached token of a user whose record changed"""
+        for digest in list(self._by_user.get(user_id, ())):
+            self._discard(digest)
+            self.invalidations += 1
+
+    def _discard(self, digest: bytes):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._by_user.get(entry.user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[entry.user_id]
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+# Global verified-token cache
+token_cache = VerifiedTokenCache()
@@ -0,0 +1,159 @@
+import asyncio
+import heapq
+from abc import ABC, abstractmethod
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Set to a redis:// URL to share tokens between API processes
+TOKEN_STORE_URL = os.getenv('TOKEN_STORE_URL', '')
+
+class TokenStore(ABC):
+    """Short-lived tokens (email verification, password reset, MFA setup).
+
+    ``put`` stamps ``created_at``/``expires_at`` into the stored data and
+    expired tokens are never returned. Async code uses the ``*_async``
+    variants, which move backends doing network I/O (``blocking``) off the
+    event loop.
+    """
+
+    blocking = False
+
+    @abstractmethod
+    def put(self, token: str, data: Dict[str, Any], ttl: timedelta):
+        ...
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def pop(self, token: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def count(self) -> Optional[int]:
+        """Live tokens, or None when the backend cannot count them cheaply"""
+
+    def __contains__(self, token: str) -> bool:
+        return self.get(token) is not None
+
+    async def _call(self, method, *args):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def put_async(self, token: str, data: Dict[str, Any], ttl: timedelta):
+        await self._call(self.put, token, data, ttl)
+
+    async def get_async(self, token: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self.get, token)
+
+    async def pop_async(self, token: str) -> Optional[Dict[str, Any]]:
+        return await self._call(self.pop, token)
+
+    @staticmethod
+    def _stamp(data: Dict[str, Any], ttl: timedelta) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        return {**data, 'created_at': now, 'expires_at': now + ttl}
+
+class MemoryTokenStore(TokenStore):
+    """In-process store with heap-ordered expiry.
+
+    Every access first pops the tokens whose deadline has passed from a
+    min-heap, so eviction costs O(expired * log n) rather than a full scan.
+    Heap entries for tokens that were consumed early are skipped when they
+    surface, which bounds their lifetime by the TTL.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self.expired = 0
+
+    def _sweep(self):
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            deadline, token = heapq.heappop(self._expiry)
+            entry = self._tokens.get(token)
+            if entry is not None and entry[0] == deadline:
+                del self._tokens[token]
+                self.expired += 1
+
+    def put(self, token: str, data: Dict[str, Any], ttl: timedelta):
+        self._sweep()
+        deadline = time.time() + ttl.total_seconds()
+        self._tokens[token] = (deadline, self._stamp(data, ttl))
+        heapq.heappush(self._expiry, (deadline, token))
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        self._sweep()
+        entry = self._tokens.get(token)
+        return entry[1] if entry else None
+
+    def pop(self, token: str) -> Optional[Dict[str, Any]]:
+        self._sweep()
+        entry = self._tokens.pop(token, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        self._tokens.clear()
+        self._expiry.clear()
+
+    def count(self) -> Optional[int]:
+        self._sweep()
+        return len(self._tokens)
+
+class RedisTokenStore(TokenStore):
+    """Store backed by Redis keys with native TTL (SET ... EX)"""
+
+    DATETIME_FIELDS = ('created_at', 'expires_at')
+    blocking = True
+
+    def __init__(self, client, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, token: str) -> str:
+        return f"{self.prefix}{token}"
+
+    def _decode(self, raw) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        for field in self.DATETIME_FIELDS:
+            if isinstance(data.get(field), str):
+                data[field] = datetime.fromisoformat(data[field])
+        return data
+
+    def put(self, token: str, data: Dict[str, Any], ttl: timedelta):
+        payload = json.dumps(self._stamp(data, ttl), default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+        self.client.set(self._key(token), payload, ex=max(1, int(ttl.total_seconds())))
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        return self._decode(self.client.get(self._key(token)))
+
+    def pop(self, token: str) -> Optional[Dict[str, Any]]:
+        # GETDEL so a token can only be redeemed once across processes
+        return self._decode(self.client.getdel(self._key(token)))
+
+    def clear(self):
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            self.client.delete(key)
+
+    def count(self) -> Optional[int]:
+        # Counting would mean a SCAN of the whole keyspace on every stats read
+        return None
+
+def create_token_store(name: str, url: str = TOKEN_STORE_URL) -> TokenStore:
+    """Token store for one kind of token, in Redis when TOKEN_STORE_URL is set"""
+    if url:
+        import redis
+        return RedisTokenStore(redis.Redis.from_url(url), prefix=f"tokens:{name}:")
+    return MemoryTokenStore()
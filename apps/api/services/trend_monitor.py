@@ -12,6 +12,45 @@ import time
 from collections import defaultdict
 import re
 import hashlib
+from services.llm_gateway import chat_completion
+
+# Trends scored per request; larger scans are split so each prompt fits the context
+TREND_BATCH_SIZE = int(os.getenv('TREND_BATCH_SIZE', '20'))
+TREND_BATCH_MAX_CHARS = int(os.getenv('TREND_BATCH_MAX_CHARS', '12000'))
+# Unchanged trends are re-scored at most this often
+TREND_RESCORE_INTERVAL = int(os.getenv('TREND_RESCORE_INTERVAL', str(6 * 3600)))
+
+def _trend_hash(trend_data: Dict) -> str:
+    """Hash of the fields the scores depend on"""
+    content = {
+        'topic': trend_data.get('topic'),
+        'keywords': trend_data.get('keywords', []),
+        'content_samples': trend_data.get('content_samples', []),
+        'engagement_velocity': trend_data.get('engagement_velocity')
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+def _normalize_topic(topic: str) -> str:
+    return ' '.join(str(topic).lower().split())
+
+def _parse_trend_scores(entry) -> Optional[Dict]:
+    """``{"momentum": 0-1, "confidence": 0-1, ...}`` from a batched response, or None if malformed"""
+    if not isinstance(entry, dict):
+        return None
+    try:
+        momentum = float(entry['momentum'])
+        confidence = float(entry.get('confidence', 0.7))
+    except (KeyError, TypeError, ValueError):
+        return None
+    scores = {
+        'momentum': max(0.0, min(1.0, momentum)),
+        'confidence': max(0.0, min(1.0, confidence)),
+        'potential': entry.get('potential', 'medium')
+    }
+    hours = entry.get('hours_to_peak')
+    if isinstance(hours, (int, float)) and not isinstance(hours, bool) and 0 < hours <= 24 * 14:
+        scores['hours_to_peak'] = hours
+    return scores
 
 @dataclass
 class TrendData:
@@ -36,6 +75,11 @@ class RealTimeTrendMonitor:
         self.monitoring_active = False
         self.trend_cache = {}
         self.momentum_tracker = defaultdict(list)
+        # "platform:topic" -> (content hash, monotonic time scored)
+        self.scored_trends: Dict[str, tuple] = {}
+        self.batch_size = TREND_BATCH_SIZE
+        self.batch_max_chars = TREND_BATCH_MAX_CHARS
+        self.rescore_interval = TREND_RESCORE_INTERVAL
         self.init_database()
         
         # Platform-specific monitoring parameters
@@ -135,9 +179,7 @@ class RealTimeTrendMonitor:
                 
                 # Simulate trend detection (in production, integrate with platform APIs)
                 trends = await self._detect_platform_trends(platform)
-                
-                for trend in trends:
-                    await self._process_trend(trend)
+                await self._process_scan(platform, trends)
                 
                 await asyncio.sleep(config['check_interval'])
                 
@@ -193,16 +235,119 @@ class RealTimeTrendMonitor:
         
         return mock_trends.get(platform, [])
     
-    async def _process_trend(self, trend_data: Dict):
-        """Process and analyze a detected trend"""
+    async def _process_scan(self, platform: str, trends: List[Dict]) -> int:
+        """Score one platform scan's new or changed trends together; returns how many were processed"""
+        now = time.monotonic()
+        changed = {}
+        for trend_data in trends:
+            trend_data.setdefault('platform', platform)
+            key = f"{platform}:{trend_data['topic']}"
+            content_hash = _trend_hash(trend_data)
+            previous = self.scored_trends.get(key)
+            if previous and previous[0] == content_hash and now - previous[1] < self.rescore_interval:
+                continue
+            changed[key] = (trend_data, content_hash)
+        
+        if not changed:
+            return 0
+        
+        scores = await self._score_trends([trend_data for trend_data, _ in changed.values()])
+        for key, (trend_data, content_hash) in changed.items():
+            await self._process_trend(trend_data, scores.get(_normalize_topic(trend_data['topic'])))
+            self.scored_trends[key] = (content_hash, now)
+        return len(changed)
+    
+    def _trend_chunks(self, trends: List[Dict]) -> List[List[Dict]]:
+        """Split trends into batches bounded by count and prompt size"""
+        chunks, chunk, size = [], [], 0
+        for trend_data in trends:
+            entry_size = len(json.dumps(trend_data, default=str))
+            if chunk and (len(chunk) >= self.batch_size or size + entry_size > self.batch_max_chars):
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(trend_data)
+            size += entry_size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    async def _score_trends(self, trends: List[Dict]) -> Dict[str, Dict]:
+        """Momentum and viral potential for many trends, keyed by normalized topic.
+        
+        Each chunk is one JSON-mode request; trends missing from the answer
+        get no entry and are scored individually by ``_process_trend``.
+        """
+        if not trends or not self.openai_client or not self.openai_client.api_key:
+            return {}
+        results = await asyncio.gather(*(self._score_trend_chunk(chunk) for chunk in self._trend_chunks(trends)))
+        scores = {}
+        for chunk_scores in results:
+            scores.update(chunk_scores)
+        return scores
+    
+    async def _score_trend_chunk(self, trends: List[Dict]) -> Dict[str, Dict]:
+        listing = '\n\n'.join(
+            f"""Topic: {trend_data['topic']}
+            Keywords: {', '.join(trend_data.get('keywords', []))}
+            Content Examples: {' | '.join(trend_data.get('content_samples', []))}"""
+            for trend_data in trends
+        )
+        prompt = f"""
+        Analyze each trending topic below for viral momentum and potential:
+        
+        {listing}
+        
+        For each topic rate:
+        1. momentum (0.0-1.0): novelty, emotional engagement, shareability, timing, cross-platform potential
+        2. confidence (0.0-1.0) in the prediction
+        3. potential: low, medium, high or breakout
+        4. hours_to_peak: expected hours until the trend peaks
+        
+        Return JSON: {{"trends": {{"<topic exactly as given>": {{"momentum": 0.0, "confidence": 0.0, "potential": "...", "hours_to_peak": 0}}}}}} with one entry per topic.
+        """
+        try:
+            response = await chat_completion(
+                self.openai_client,
+                site="RealTimeTrendMonitor._score_trends",
+                model="gpt-4-turbo-preview",
+                messages=[
+                    {"role": "system", "content": "You are a viral trend analyst. Score the momentum and viral potential of several trends at once."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=60 * len(trends) + 50,
+                temperature=0.3
+            )
+            entries = json.loads(response.choices[0].message.content).get('trends', {})
+        except Exception as e:
+            print(f"Error scoring trend batch: {e}")
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        
+        scores = {}
+        for topic, entry in entries.items():
+            parsed = _parse_trend_scores(entry)
+            if parsed is not None:
+                scores[_normalize_topic(topic)] = parsed
+        return scores
+    
+    async def _process_trend(self, trend_data: Dict, scores: Optional[Dict] = None):
+        """Process and analyze a detected trend, scoring it individually unless batch scores are given"""
         topic = trend_data['topic']
         platform = trend_data.get('platform', 'unknown')
         
-        # Calculate momentum score using AI
-        momentum = await self._calculate_momentum_score(trend_data)
-        
-        # Predict viral potential
-        viral_potential = await self._predict_viral_potential(trend_data)
+        hours_to_peak = 24
+        if scores is not None:
+            momentum = scores['momentum']
+            viral_potential = scores
+            hours_to_peak = scores.get('hours_to_peak', hours_to_peak)
+        else:
+            # Calculate momentum score using AI
+            momentum = await self._calculate_momentum_score(trend_data)
+            
+            # Predict viral potential
+            viral_potential = await self._predict_viral_potential(trend_data)
         
         # Store trend data
         trend = TrendData(
@@ -210,7 +355,7 @@ class RealTimeTrendMonitor:
             platform=platform,
             momentum_score=momentum,
             velocity=trend_data.get('engagement_velocity', 0.5),
-            predicted_peak=datetime.utcnow() + timedelta(hours=24),
+            predicted_peak=datetime.utcnow() + timedelta(hours=hours_to_peak),
             confidence=viral_potential.get('confidence', 0.7),
             keywords=trend_data.get('keywords', []),
             sample_content=trend_data.get('content_samples', []),
@@ -253,7 +398,9 @@ class RealTimeTrendMonitor:
             Return only the numeric score (0.0-1.0).
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="RealTimeTrendMonitor._calculate_momentum_score",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a viral trend analyst. Analyze content momentum potential with high accuracy."},
@@ -295,7 +442,9 @@ class RealTimeTrendMonitor:
             Return as JSON with confidence score (0-1) and detailed predictions.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="RealTimeTrendMonitor._predict_viral_potential",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a viral prediction expert. Analyze trend potential with scientific precision."},
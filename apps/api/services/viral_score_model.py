@@ -0,0 +1,198 @@
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+# Optional JSON file with fitted weights replacing the built-in calibration
+VIRAL_SCORE_MODEL_PATH = os.getenv('VIRAL_SCORE_MODEL_PATH', '')
+
+FEATURES = (
+    'duration_fit',      # closeness of duration to the platform's optimal length (log scale)
+    'over_length',       # how far past the optimal length, in log units
+    'hook_strength',     # hook keywords in the title and opening of the transcript
+    'trend_overlap',     # share of the platform's trending tags the content uses
+    'curiosity',         # question or number in the title
+    'title_length_fit',  # 4-12 word titles
+    'has_transcript'
+)
+
+HOOK_KEYWORDS = (
+    'pov', 'secret', 'nobody', 'how to', 'why', 'stop', 'wait', 'you need', 'mistake', 'hack',
+    'never', 'best', 'worst', 'before', 'after', 'this is', 'watch', 'finally', 'hidden', 'truth'
+)
+HOOK_SATURATION = 3        # Keyword matches at which hook strength maxes out
+OPENING_CHARS = 150        # Transcript characters counted as the opening
+DURATION_TOLERANCE = 0.5   # Std. dev. of the duration fit in log(duration / optimal)
+
+# Calibrated so on-length content with a plain 4-12 word title lands near
+# the platform averages the mock scores used (tiktok ~0.70 ... linkedin ~0.50)
+DEFAULT_WEIGHTS = {
+    'weights': {
+        'duration_fit': 1.1, 'over_length': -0.6, 'hook_strength': 1.2, 'trend_overlap': 1.0,
+        'curiosity': 0.35, 'title_length_fit': 0.3, 'has_transcript': 0.2
+    },
+    'platform_bias': {
+        'tiktok': -0.55, 'instagram_reels': -0.78, 'youtube_shorts': -0.65,
+        'instagram_feed': -0.91, 'twitter': -1.2, 'linkedin': -1.4
+    },
+    'default_bias': -0.9,
+    # Depth-1 boosted trees: (feature, threshold, value at or below, value above)
+    'stumps': [
+        ['hook_strength', 0.3, 0.0, 0.25],
+        ['trend_overlap', 0.24, 0.0, 0.2],
+        ['duration_fit', 0.3, -0.3, 0.0]
+    ],
+    'confidence': 0.8
+}
+
+_HASHTAG = re.compile(r'#(\w+)')
+
+def _text(metadata: Dict[str, Any], field: str) -> str:
+    """A text field as a string; variants come from user JSON and may hold numbers"""
+    value = metadata.get(field)
+    return '' if value is None else str(value)
+
+def _tags(metadata: Dict[str, Any]) -> set:
+    tags = metadata.get('tags') or metadata.get('hashtags') or []
+    if isinstance(tags, str):
+        tags = re.split(r'[\s,]+', tags)
+    found = {str(tag).lstrip('#').lower() for tag in tags if str(tag).strip('# ')}
+    for field in ('title', 'description'):
+        found.update(tag.lower() for tag in _HASHTAG.findall(_text(metadata, field)))
+    return found
+
+def _duration(metadata: Dict[str, Any]) -> float:
+    try:
+        return max(1.0, float(metadata.get('duration') or 30))
+    except (TypeError, ValueError):
+        return 30.0
+
+class ViralScoreModel:
+    """Local viral potential model scored with NumPy.
+
+    Each (variant, platform) pair becomes a row of FEATURES; the score is
+    ``sigmoid(platform_bias + features @ weights + stumps)``, a linear model
+    plus a few boosted decision stumps. Text features are extracted once per
+    variant, everything platform-dependent is computed as arrays, so scoring
+    thousands of variants is one call.
+    """
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None):
+        params = params or DEFAULT_WEIGHTS
+        self.weights = np.array([params['weights'][name] for name in FEATURES], dtype=float)
+        self.platform_bias = dict(params['platform_bias'])
+        self.default_bias = params.get('default_bias', 0.0)
+        stumps = params.get('stumps') or []
+        self._stump_features = np.array([FEATURES.index(s[0]) for s in stumps], dtype=int)
+        self._stump_thresholds = np.array([s[1] for s in stumps], dtype=float)
+        self._stump_low = np.array([s[2] for s in stumps], dtype=float)
+        self._stump_high = np.array([s[3] for s in stumps], dtype=float)
+        self.confidence = params.get('confidence', 0.8)
+
+    @classmethod
+    def load(cls, path: str) -> 'ViralScoreModel':
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def featurize(self, variants: Sequence[Dict[str, Any]], specs: Dict[str, Dict]) -> np.ndarray:
+        """Feature tensor of shape (variants, platforms, FEATURES), platforms in ``specs`` order"""
+        platforms = list(specs)
+        n = len(variants)
+        durations = np.empty(n)
+        text = np.zeros((n, 4))  # hook_strength, curiosity, title_length_fit, has_transcript
+
+        vocabulary = sorted({tag for spec in specs.values() for tag in spec.get('trending_tags', [])})
+        column = {tag: i for i, tag in enumerate(vocabulary)}
+        used = np.zeros((n, len(vocabulary)))
+
+        for i, metadata in enumerate(variants):
+            title = _text(metadata, 'title')
+            transcript = _text(metadata, 'transcript')
+            opening = f"{title} {transcript[:OPENING_CHARS]}".lower()
+            durations[i] = _duration(metadata)
+            text[i, 0] = min(1.0, sum(keyword in opening for keyword in HOOK_KEYWORDS) / HOOK_SATURATION)
+            text[i, 1] = float('?' in title or any(ch.isdigit() for ch in title))
+            text[i, 2] = float(4 <= len(title.split()) <= 12)
+            text[i, 3] = float(bool(transcript.strip()))
+            for tag in _tags(metadata):
+                if tag in column:
+                    used[i, column[tag]] = 1.0
+
+        membership = np.zeros((len(platforms), len(vocabulary)))
+        for p, platform in enumerate(platforms):
+            for tag in specs[platform].get('trending_tags', []):
+                membership[p, column[tag]] = 1.0
+        overlap = (used @ membership.T) / np.maximum(membership.sum(axis=1), 1)
+
+        optimal = np.array([float(specs[p].get('optimal_length', 30)) for p in platforms])
+        ratio = np.log(durations[:, None] / optimal[None, :])
+
+        X = np.empty((n, len(platforms), len(FEATURES)))
+        X[:, :, 0] = np.exp(-ratio ** 2 / (2 * DURATION_TOLERANCE ** 2))
+        X[:, :, 1] = np.maximum(ratio, 0.0)
+        X[:, :, 2] = text[:, None, 0]
+        X[:, :, 3] = overlap
+        X[:, :, 4:] = text[:, None, 1:]
+        return X
+
+    def _contributions(self, X: np.ndarray) -> np.ndarray:
+        """Per-feature logit contributions, stumps credited to the feature they split on"""
+        contributions = X * self.weights
+        if len(self._stump_features):
+            split = X[..., self._stump_features] > self._stump_thresholds
+            stump_values = np.where(split, self._stump_high, self._stump_low)
+            for k, feature in enumerate(self._stump_features):
+                contributions[..., feature] += stump_values[..., k]
+        return contributions
+
+    def score_batch(self, variants: Sequence[Dict[str, Any]], specs: Dict[str, Dict]) -> np.ndarray:
+        """Viral potential (0-1) for every variant on every platform, shape (variants, platforms)"""
+        if not variants or not specs:
+            return np.zeros((len(variants), len(specs)))
+        X = self.featurize(variants, specs)
+        bias = np.array([self.platform_bias.get(p, self.default_bias) for p in specs])
+        logits = bias + self._contributions(X).sum(axis=-1)
+        return np.clip(1.0 / (1.0 + np.exp(-logits)), 0.01, 0.99)
+
+    def score(self, metadata: Dict[str, Any], specs: Dict[str, Dict]) -> Dict[str, float]:
+        scores = self.score_batch([metadata], specs)[0]
+        return {platform: round(float(s), 2) for platform, s in zip(specs, scores)}
+
+    def top_factors(self, metadata: Dict[str, Any], specs: Dict[str, Dict], limit: int = 3) -> Dict[str, List[Dict]]:
+        """Features that moved each platform's score the most, strongest first"""
+        X = self.featurize([metadata], specs)[0]
+        contributions = self._contributions(X[None])[0]
+        factors = {}
+        for p, platform in enumerate(specs):
+            order = np.argsort(-np.abs(contributions[p]))[:limit]
+            factors[platform] = [
+                {'factor': FEATURES[j], 'value': round(float(X[p, j]), 2), 'impact': round(float(contributions[p, j]), 2)}
+                for j in order if contributions[p, j]
+            ]
+        return factors
+
+def describe_factors(factors: Dict[str, List[Dict]]) -> str:
+    """Plain explanation built from top_factors when no LLM is available"""
+    lines = []
+    for platform, items in factors.items():
+        helped = [f['factor'].replace('_', ' ') for f in items if f['impact'] > 0]
+        hurt = [f['factor'].replace('_', ' ') for f in items if f['impact'] < 0]
+        parts = []
+        if helped:
+            parts.append(f"helped by {', '.join(helped)}")
+        if hurt:
+            parts.append(f"held back by {', '.join(hurt)}")
+        lines.append(f"{platform}: {'; '.join(parts) or 'no strong signals'}.")
+    return ' '.join(lines)
+
+def _load_model() -> ViralScoreModel:
+    if VIRAL_SCORE_MODEL_PATH:
+        try:
+            return ViralScoreModel.load(VIRAL_SCORE_MODEL_PATH)
+        except Exception as e:
+            print(f"Viral score model load failed, using built-in weights: {e}")
+    return ViralScoreModel()
+
+# Global viral score model
+viral_score_model = _load_model()
@@ -12,6 +12,8 @@ from PIL import Image, ImageDraw, ImageFont
 import textwrap
 import cv2
 import numpy as np
+from services.llm_gateway import chat_completion, transcription
+from services.single_flight import single_flight, request_key
 
 class VoiceToVideoGenerator:
     """Revolutionary voice-to-video content creation system"""
@@ -21,6 +23,7 @@ class VoiceToVideoGenerator:
         api_key = os.getenv('OPENAI_API_KEY')
         self.openai_client = openai.Client(api_key=api_key) if api_key else None
         self.elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
+        self.elevenlabs_base_url = os.getenv('ELEVENLABS_BASE_URL', 'https://api.elevenlabs.io/v1')
         
         # Voice personality profiles
         self.voice_profiles = {
@@ -161,12 +164,13 @@ class VoiceToVideoGenerator:
             if not self.openai_client or not self.openai_client.api_key:
                 return self._mock_transcription()
             
-            with open(audio_file_path, "rb") as audio_file:
-                response = self.openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="verbose_json"
-                )
+            response = await transcription(
+                self.openai_client,
+                site="VoiceToVideoGenerator._transcribe_audio",
+                file_path=audio_file_path,
+                model="whisper-1",
+                response_format="verbose_json"
+            )
             
             return {
                 'text': response.text,
@@ -212,7 +216,9 @@ class VoiceToVideoGenerator:
             Format as JSON.
             """
             
-            response = self.openai_client.chat.completions.create(
+            response = await chat_completion(
+                self.openai_client,
+                site="VoiceToVideoGenerator._optimize_script_for_viral",
                 model="gpt-4-turbo-preview",
                 messages=[
                     {"role": "system", "content": "You are a viral content script optimizer. Transform regular content into viral-ready scripts."},
@@ -258,7 +264,7 @@ class VoiceToVideoGenerator:
     async def _generate_elevenlabs_voice(self, script_data: Dict, voice_config: Dict) -> Dict:
         """Generate voice using ElevenLabs API"""
         try:
-            url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_config['voice_id']}"
+            url = f"{self.elevenlabs_base_url}/text-to-speech/{voice_config['voice_id']}"
             
             headers = {
                 "Accept": "audio/mpeg",
@@ -277,12 +283,23 @@ class VoiceToVideoGenerator:
                 }
             }
             
-            response = requests.post(url, json=data, headers=headers)
+            def synthesize():
+                response = requests.post(url, json=data, headers=headers)
+                if response.status_code != 200:
+                    raise Exception(f"ElevenLabs API error: {response.status_code}")
+                return response.content
+            
+            # Identical concurrent requests share one synthesis
+            audio = await single_flight.do(
+                request_key('elevenlabs_tts', url, data),
+                lambda: asyncio.to_thread(synthesize),
+                site="VoiceToVideoGenerator._generate_elevenlabs_voice"
+            )
             
-            if response.status_code == 200:
+            if audio:
                 # Save audio to temporary file
                 temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-                temp_file.write(response.content)
+                temp_file.write(audio)
                 temp_file.close()
                 
                 return {
@@ -294,7 +311,7 @@ class VoiceToVideoGenerator:
                     'generation_method': 'elevenlabs'
                 }
             else:
-                raise Exception(f"ElevenLabs API error: {response.status_code}")
+                raise Exception("ElevenLabs returned no audio")
                 
         except Exception as e:
             print(f"ElevenLabs voice generation error: {e}")
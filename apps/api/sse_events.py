@@ -1,30 +1,66 @@
 import asyncio
 import json
 import time
-from typing import Dict, Set
+from typing import Dict, Optional, Set
 from fastapi import HTTPException
-from sse_starlette.sse import EventSourceResponse
+from progress_bus import event_id_key, progress_bus
+from progress_buffer import CoalescingQueue
 
 # Store active SSE connections
-sse_connections: Dict[str, Set[asyncio.Queue]] = {}
+sse_connections: Dict[str, Set[CoalescingQueue]] = {}
 
-async def sse_progress_stream(project_id: str):
-    """Stream progress updates via Server-Sent Events"""
-    queue = asyncio.Queue()
+# Delivery counters across all SSE subscribers
+sse_metrics = {
+    "delivered": 0,
+    "coalesced": 0,
+    "dropped": 0
+}
+
+def _progress_event(data: dict) -> dict:
+    event = {
+        "event": "progress",
+        "data": json.dumps(data)
+    }
+    if data.get("event_id"):
+        event["id"] = data["event_id"]
+    return event
+
+def format_sse(event: dict) -> str:
+    """Serialize an event dict into the text/event-stream wire format"""
+    lines = []
+    if event.get("id"):
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['event']}")
+    lines.extend(f"data: {line}" for line in str(event["data"]).splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+async def sse_progress_stream(project_id: str, last_event_id: Optional[str] = None):
+    """Stream progress updates via Server-Sent Events.
+
+    With ``last_event_id`` (the browser's Last-Event-ID header) the events
+    missed since then are replayed from the progress log before going live.
+    """
+    # Holds only the newest progress snapshot plus any terminal events
+    queue = CoalescingQueue(maxsize=1)
     
     if project_id not in sse_connections:
         sse_connections[project_id] = set()
     sse_connections[project_id].add(queue)
     
     try:
+        # Subscribed first, so anything published during the replay is queued
+        for data in await progress_bus.replay(project_id, last_event_id):
+            last_event_id = data["event_id"]
+            yield _progress_event(data)
+
         while True:
             try:
                 # Wait for progress updates
                 data = await asyncio.wait_for(queue.get(), timeout=30.0)
-                yield {
-                    "event": "progress",
-                    "data": json.dumps(data)
-                }
+                event_id = data.get("event_id")
+                if event_id and last_event_id and event_id_key(event_id) <= event_id_key(last_event_id):
+                    continue  # already sent by the replay
+                yield _progress_event(data)
             except asyncio.TimeoutError:
                 # Send keepalive
                 yield {
@@ -40,19 +76,31 @@ async def sse_progress_stream(project_id: str):
                 del sse_connections[project_id]
 
 async def send_sse_update(project_id: str, data: dict):
-    """Send update to all SSE connections for a project"""
-    if project_id in sse_connections:
-        for queue in sse_connections[project_id]:
-            try:
-                await queue.put(data)
-            except:
-                pass
+    """Send update to all SSE connections for a project in this process (never blocks)"""
+    for queue in list(sse_connections.get(project_id, ())):
+        coalesced = queue.coalesced
+        if queue.put_nowait(data):
+            sse_metrics["delivered"] += 1
+        else:
+            sse_metrics["dropped"] += 1
+        sse_metrics["coalesced"] += queue.coalesced - coalesced
+
+def get_sse_stats() -> dict:
+    """SSE subscriber counts and coalesced/dropped event totals"""
+    return {
+        "projects": len(sse_connections),
+        "subscribers": sum(len(queues) for queues in sse_connections.values()),
+        **sse_metrics
+    }
+
+# Updates published by any process reach this process's SSE streams
+progress_bus.add_listener(send_sse_update)
 
 async def process_youtube_sse(project_id: str, youtube_url: str, user_id: str, is_trial: bool = False):
     """Process YouTube video with SSE updates"""
     try:
         # Send initial progress
-        await send_sse_update(project_id, {
+        await progress_bus.publish(project_id, {
             "status": "processing",
             "progress": 10,
             "message": "Starting YouTube video processing..."
@@ -60,7 +108,7 @@ async def process_youtube_sse(project_id: str, youtube_url: str, user_id: str, i
         
         await asyncio.sleep(2)
         
-        await send_sse_update(project_id, {
+        await progress_bus.publish(project_id, {
             "status": "processing",
             "progress": 30,
             "message": "Downloading video from YouTube..."
@@ -68,7 +116,7 @@ async def process_youtube_sse(project_id: str, youtube_url: str, user_id: str, i
         
         await asyncio.sleep(2)
         
-        await send_sse_update(project_id, {
+        await progress_bus.publish(project_id, {
             "status": "processing",
             "progress": 60,
             "message": "Analyzing video content..."
@@ -77,14 +125,14 @@ async def process_youtube_sse(project_id: str, youtube_url: str, user_id: str, i
         await asyncio.sleep(2)
         
         # Send completion
-        await send_sse_update(project_id, {
+        await progress_bus.publish(project_id, {
             "status": "ready_for_processing",
             "progress": 100,
             "message": "YouTube video processed successfully"
         })
         
     except Exception as e:
-        await send_sse_update(project_id, {
+        await progress_bus.publish(project_id, {
             "status": "error",
             "progress": 0,
             "error": str(e)
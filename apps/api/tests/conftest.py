@@ -12,6 +12,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main import app
 from services.auth import auth_service, users_db, social_accounts_db
+from services.credit_ledger import credit_ledger
 from services.storage import R2Storage
 from services.video_processor import VideoProcessor
 
@@ -112,6 +113,7 @@ def clear_test_data():
     # Clear before test
     users_db.clear()
     social_accounts_db.clear()
+    credit_ledger.clear()
     
     # Clear projects_db if it exists
     try:
@@ -125,6 +127,7 @@ def clear_test_data():
     # Clear after test
     users_db.clear()
     social_accounts_db.clear()
+    credit_ledger.clear()
     
     # Clear projects_db if it exists
     try:
@@ -0,0 +1,74 @@
+"""Minimal local SMTP server that records messages for tests"""
+import socketserver
+import threading
+from email import message_from_bytes
+from typing import List
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply("220 localhost sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command.startswith("MAIL FROM"):
+                self.reply("250 OK")
+            elif command.startswith("RCPT TO"):
+                with sink.lock:
+                    reject = sink.reject_next > 0
+                    sink.reject_next -= reject
+                self.reply("451 Try again later" if reject else "250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = bytearray()
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b".\n", b""):
+                        break
+                    data += chunk[1:] if chunk.startswith(b"..") else chunk
+                with sink.lock:
+                    sink.messages.append(message_from_bytes(bytes(data)))
+                self.reply("250 OK queued")
+            elif command in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SMTPSink:
+    """SMTP server on 127.0.0.1 collecting messages in ``messages``.
+
+    ``reject_next`` makes the next N recipients fail with a transient 451.
+    """
+
+    def __init__(self):
+        self.messages: List = []
+        self.connections = 0
+        self.reject_next = 0
+        self.lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+
+    def start(self) -> "SMTPSink":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,151 @@
+import pytest
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ai_enhancer import AIEnhancer
+from services.llm_cache import llm_cache
+
+PLATFORMS = ['tiktok', 'instagram_reels', 'youtube_shorts', 'twitter', 'linkedin']
+
+class FakeCompletions:
+    """Async stand-in for chat.completions that answers after a fixed delay"""
+
+    def __init__(self, delay=0.2, reply=None):
+        self.delay = delay
+        self.reply = reply or (lambda kwargs: "72")
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        content = self.reply(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+@pytest.fixture(autouse=True)
+def clear_llm_cache():
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
+
+def make_enhancer(completions, batched=False):
+    enhancer = AIEnhancer()
+    enhancer.batch_platforms = batched
+    enhancer.local_viral_scores = False  # exercise the LLM scoring path
+    enhancer.openai_client = SimpleNamespace(api_key='sk-test', chat=SimpleNamespace(completions=completions))
+    return enhancer
+
+class TestAIEnhancerConcurrency:
+    """Unit tests for concurrent per-platform OpenAI calls"""
+
+    @pytest.mark.unit
+    def test_platform_calls_run_concurrently(self):
+        """Latency tracks the slowest platform call rather than the sum"""
+        completions = FakeCompletions(delay=0.2)
+        enhancer = make_enhancer(completions)
+
+        started = time.perf_counter()
+        result = asyncio.run(enhancer.calculate_viral_score({'title': 'Test'}, PLATFORMS))
+        elapsed = time.perf_counter() - started
+
+        assert result['viral_scores'] == {platform: 0.72 for platform in PLATFORMS}
+        assert len(completions.calls) == len(PLATFORMS)
+        assert elapsed < 0.2 * len(PLATFORMS) / 2
+
+    @pytest.mark.unit
+    def test_shared_semaphore_bounds_in_flight_requests(self):
+        """Concurrent methods share one limit on in-flight requests"""
+        completions = FakeCompletions(delay=0.05, reply=lambda kwargs: json.dumps({'hooks': ['a'], 'hashtags': ['b']}))
+        enhancer = make_enhancer(completions)
+        enhancer.max_concurrency = 2
+
+        async def scenario():
+            return await asyncio.gather(
+                enhancer.generate_viral_hooks("summary", PLATFORMS),
+                enhancer.optimize_hashtags("content", PLATFORMS)
+            )
+
+        hooks, hashtags = asyncio.run(scenario())
+
+        assert completions.max_in_flight == 2
+        assert set(hooks['hooks']) == set(PLATFORMS)
+        assert hashtags['hashtags']['tiktok'] == ['b']
+
+    @pytest.mark.unit
+    def test_failure_falls_back_to_mock(self):
+        """One failing platform call still yields the mock result for the request"""
+        def reply(kwargs):
+            if 'linkedin' in kwargs['messages'][0]['content']:
+                raise RuntimeError("upstream error")
+            return json.dumps({'hooks': ['a']})
+
+        enhancer = make_enhancer(FakeCompletions(delay=0.01, reply=reply))
+
+        result = asyncio.run(enhancer.generate_viral_hooks("summary", PLATFORMS))
+
+        assert result['hooks'] == enhancer._mock_hook_generation(PLATFORMS)['hooks']
+
+class TestAIEnhancerBatching:
+    """Unit tests for the single multi-platform prompt mode"""
+
+    @pytest.mark.unit
+    def test_one_request_covers_all_platforms(self):
+        """Scores for every platform come from a single JSON-mode request"""
+        reply = lambda kwargs: json.dumps({'platforms': {p: {'score': 80 + i} for i, p in enumerate(PLATFORMS)}})
+        completions = FakeCompletions(delay=0, reply=reply)
+        enhancer = make_enhancer(completions, batched=True)
+
+        result = asyncio.run(enhancer.calculate_viral_score({'title': 'Test', 'transcript': 'x' * 1000}, PLATFORMS))
+
+        assert len(completions.calls) == 1
+        assert completions.calls[0]['response_format'] == {'type': 'json_object'}
+        assert result['viral_scores'] == {p: (80 + i) / 100 for i, p in enumerate(PLATFORMS)}
+        prompt = completions.calls[0]['messages'][1]['content']
+        assert prompt.count('x' * 300) == 1  # shared content is sent once
+
+    @pytest.mark.unit
+    def test_malformed_entries_fall_back_per_platform(self):
+        """Platforms with missing or invalid entries are retried individually"""
+        def reply(kwargs):
+            if 'each platform listed below' in kwargs['messages'][1]['content']:
+                return json.dumps({'platforms': {
+                    'tiktok': {'hooks': ['Wait for it...']},
+                    'twitter': {'hooks': 'not a list'}
+                }})
+            return json.dumps({'hooks': ['single call hook']})
+
+        completions = FakeCompletions(delay=0, reply=reply)
+        enhancer = make_enhancer(completions, batched=True)
+
+        result = asyncio.run(enhancer.generate_viral_hooks("summary", ['tiktok', 'twitter', 'linkedin']))
+
+        assert result['hooks'] == {
+            'tiktok': ['Wait for it...'],
+            'twitter': ['single call hook'],
+            'linkedin': ['single call hook']
+        }
+        assert len(completions.calls) == 3
+
+    @pytest.mark.unit
+    def test_unparseable_batch_falls_back_entirely(self):
+        """A response that is not JSON triggers per-platform calls for all platforms"""
+        replies = iter(["not json"] + [json.dumps({'hashtags': ['fyp']})] * len(PLATFORMS))
+        completions = FakeCompletions(delay=0, reply=lambda kwargs: next(replies))
+        enhancer = make_enhancer(completions, batched=True)
+
+        result = asyncio.run(enhancer.optimize_hashtags("content", PLATFORMS))
+
+        assert result['hashtags'] == {p: ['fyp'] for p in PLATFORMS}
+        assert len(completions.calls) == 1 + len(PLATFORMS)
@@ -723,3 +723,79 @@ class TestHealthEndpoint:
         
         assert response.status_code == 200
         assert response.json()["status"] == "healthy"
+
+class TestProjectStatusPolling:
+    """Test cases for conditional and long-poll status requests"""
+    
+    @pytest.mark.functional
+    @pytest.mark.api
+    def test_status_etag_not_modified(self, client, clear_test_data):
+        """A matching If-None-Match returns 304 until the task state changes"""
+        from main import projects_db
+        from background_tasks import background_tasks
+        projects_db["trial_status"] = {"id": "trial_status", "is_trial": True, "status": "processing", "created_at": 1}
+        background_tasks["trial_status"] = {"status": "processing", "progress": 40, "updated_at": 1.0}
+        
+        response = client.get("/api/projects/trial_status/status")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        
+        response = client.get("/api/projects/trial_status/status", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        
+        background_tasks["trial_status"].update({"progress": 60, "updated_at": 2.0})
+        response = client.get("/api/projects/trial_status/status", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["progress"] == 60
+        assert response.headers["ETag"] != etag
+        background_tasks.pop("trial_status", None)
+    
+    @pytest.mark.unit
+    def test_long_poll_wakes_on_progress(self):
+        """Waiters are released as soon as a progress update is recorded"""
+        from background_tasks import record_task_progress, wait_for_task_change, background_tasks
+        
+        async def scenario():
+            waiter = asyncio.ensure_future(wait_for_task_change("poll_project", timeout=5))
+            await asyncio.sleep(0.01)
+            await record_task_progress("poll_project", {"status": "processing", "progress": 70, "event_id": "1-0"})
+            assert await waiter is True
+            assert await wait_for_task_change("poll_project", timeout=0.01) is False
+        
+        asyncio.run(scenario())
+        assert background_tasks.pop("poll_project")["progress"] == 70
+    
+    @pytest.mark.unit
+    def test_processes_store_the_publishers_timestamp(self):
+        """updated_at is stamped when an event is published, not when each process receives it"""
+        from background_tasks import record_task_progress, background_tasks
+        from progress_bus import ProgressBus
+        
+        async def scenario():
+            bus = ProgressBus()
+            received = []
+            async def listener(project_id, data):
+                received.append(data)
+            bus.add_listener(listener)
+            await bus.publish("stamp_project", {"status": "processing", "progress": 10})
+            await asyncio.sleep(0.01)
+            # A second API process receiving the same event later
+            await record_task_progress("stamp_project", dict(received[0]))
+            return received[0]["updated_at"]
+        
+        stamped = asyncio.run(scenario())
+        assert background_tasks.pop("stamp_project")["updated_at"] == stamped
+    
+    @pytest.mark.unit
+    def test_quiet_task_states_are_evicted(self, monkeypatch):
+        """States not updated within TASK_STATE_TTL, and the oldest beyond the cap, are dropped"""
+        import time
+        import background_tasks as tasks
+        monkeypatch.setattr(tasks, "background_tasks", {})
+        monkeypatch.setattr(tasks, "TASK_STATE_MAX_ENTRIES", 3)
+        
+        tasks.store_task_state("stale", {"status": "completed", "updated_at": time.time() - tasks.TASK_STATE_TTL - 1})
+        for i in range(4):
+            tasks.store_task_state(f"live_{i}", {"status": "processing", "updated_at": time.time()})
+        
+        assert list(tasks.background_tasks) == ["live_1", "live_2", "live_3"]
@@ -6,7 +6,7 @@ from unittest.mock import patch, Mock
 from fastapi import HTTPException
 import asyncio
 
-from services.auth import auth_service, UserCreate, UserLogin, SocialAccount
+from services.auth import auth_service, UserCreate, UserLogin, SocialAccount, AdminUserUpdate, users_db, users_by_email
 
 class TestAuthService:
     """Test cases for authentication service"""
@@ -385,3 +385,280 @@ class TestCreditManagement:
         
         assert exc_info.value.status_code == 404
         assert "User not found" in str(exc_info.value.detail)
+
+class TestEmailIndex:
+    """Test cases for the email -> user_id index"""
+    
+    @pytest.fixture
+    def admin_and_user(self, clear_test_data):
+        users_by_email.clear()
+        admin = asyncio.run(auth_service.register_user(UserCreate(email="admin@example.com", password="adminpass123")))['user']
+        users_db[admin.id]['is_admin'] = True
+        user = asyncio.run(auth_service.register_user(UserCreate(email="Index@Example.com", password="indexpass123")))['user']
+        return admin, user
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_lookup_is_case_insensitive(self, admin_and_user):
+        """Registered users are found by normalized email"""
+        _, user = admin_and_user
+        
+        assert auth_service.find_user_by_email(" INDEX@example.com ")['id'] == user.id
+        assert auth_service.find_user_by_email("missing@example.com") is None
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_admin_email_update_moves_entry(self, admin_and_user):
+        """Changing an email re-keys the index and rejects taken addresses"""
+        admin, user = admin_and_user
+        asyncio.run(auth_service.update_user_admin(admin.id, user.id, AdminUserUpdate(email="renamed@example.com")))
+        
+        assert auth_service.find_user_by_email("index@example.com") is None
+        assert auth_service.find_user_by_email("renamed@example.com")['id'] == user.id
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(auth_service.update_user_admin(admin.id, user.id, AdminUserUpdate(email="admin@example.com")))
+        assert exc_info.value.status_code == 400
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_delete_removes_entry(self, admin_and_user):
+        """Deleted users can no longer be found and their email is free again"""
+        admin, user = admin_and_user
+        asyncio.run(auth_service.delete_user_admin(admin.id, user.id))
+        
+        assert "index@example.com" not in users_by_email
+        assert auth_service.find_user_by_email("index@example.com") is None
+        asyncio.run(auth_service.register_user(UserCreate(email="index@example.com", password="indexpass123")))
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_stale_entry_ignored(self, admin_and_user):
+        """Entries whose user vanished from the store are dropped on lookup"""
+        _, user = admin_and_user
+        users_db.pop(user.id)
+        
+        assert auth_service.find_user_by_email("index@example.com") is None
+        assert "index@example.com" not in users_by_email
+
+class TestPasswordHasher:
+    """Test cases for off-loop bcrypt hashing"""
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_event_loop_stays_responsive(self):
+        """Other coroutines keep running while bcrypt works"""
+        from services.password_hasher import PasswordHasher
+        hasher = PasswordHasher(rounds=12, workers=1)
+        
+        async def scenario():
+            ticks = 0
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+            task = asyncio.ensure_future(ticker())
+            await hasher.hash("responsive123")
+            task.cancel()
+            return ticks
+        
+        assert asyncio.run(scenario()) > 3
+        assert hasher.get_stats()["completed"] == 1
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_rejects_when_queue_full(self):
+        """Requests beyond the pending limit fail fast with 503"""
+        from services.password_hasher import PasswordHasher
+        hasher = PasswordHasher(rounds=10, workers=1, max_pending=1)
+        
+        async def scenario():
+            return await asyncio.gather(*(hasher.hash("queued123") for _ in range(3)), return_exceptions=True)
+        
+        results = asyncio.run(scenario())
+        errors = [r for r in results if isinstance(r, HTTPException)]
+        assert len(errors) == 1 and errors[0].status_code == 503
+        assert hasher.get_stats()["rejected"] == 1
+    
+    @pytest.mark.functional
+    @pytest.mark.auth
+    def test_rehash_on_login_after_cost_change(self, clear_test_data):
+        """A successful login upgrades hashes made with an old cost factor"""
+        from services.password_hasher import password_hasher, hash_rounds
+        original_rounds = password_hasher.rounds
+        try:
+            password_hasher.rounds = 4
+            user = asyncio.run(auth_service.register_user(UserCreate(email="rehash@example.com", password="rehashpass123")))['user']
+            assert hash_rounds(users_db[user.id]['password_hash']) == 4
+            
+            password_hasher.rounds = 5
+            asyncio.run(auth_service.login_user(UserLogin(email="rehash@example.com", password="rehashpass123")))
+            assert hash_rounds(users_db[user.id]['password_hash']) == 5
+            assert auth_service.verify_password("rehashpass123", users_db[user.id]['password_hash'])
+        finally:
+            password_hasher.rounds = original_rounds
+
+class TestVerifiedTokenCache:
+    """Test cases for the verified access-token cache"""
+    
+    @pytest.fixture
+    def registered(self, clear_test_data):
+        from services.token_cache import token_cache
+        token_cache.clear()
+        user = asyncio.run(auth_service.register_user(UserCreate(email="cache@example.com", password="cachepass123")))['user']
+        return user, auth_service.create_jwt_token(user.id, user.email)
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_second_lookup_skips_verification(self, registered):
+        """Repeat requests with the same token are served from the cache"""
+        user, token = registered
+        assert auth_service.authenticate_token(token).id == user.id
+        
+        with patch.object(auth_service, 'verify_jwt_token', side_effect=AssertionError("not cached")):
+            assert auth_service.authenticate_token(token).email == "cache@example.com"
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_user_change_invalidates(self, registered):
+        """Credit changes are visible on the next request"""
+        user, token = registered
+        auth_service.authenticate_token(token)
+        asyncio.run(auth_service.update_user_credits(user.id, 30))
+        
+        assert auth_service.authenticate_token(token).credits == 70
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_expired_entry_not_served(self, registered):
+        """Entries expire with the token"""
+        from services.token_cache import token_cache
+        user, token = registered
+        auth_service.authenticate_token(token)
+        next(iter(token_cache._entries.values())).expires_at = 0
+        
+        with patch.object(auth_service, 'verify_jwt_token', side_effect=HTTPException(status_code=401, detail="Token has expired")):
+            with pytest.raises(HTTPException):
+                auth_service.authenticate_token(token)
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_cache_is_bounded(self):
+        """The least recently used entry is evicted at capacity"""
+        from services.token_cache import VerifiedTokenCache
+        cache = VerifiedTokenCache(maxsize=2)
+        record = {'updated_at': 1}
+        for index in range(3):
+            cache.put(f"token-{index}", {'user_id': 'u', 'exp': 9e9}, object(), record)
+        
+        assert cache.get("token-0", lambda _: record) is None
+        assert cache.get("token-2", lambda _: record) is not None
+        assert cache.get_stats()["evictions"] == 1
+
+class TestTokenStore:
+    """Test cases for expiring token stores"""
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_expired_tokens_evicted(self):
+        """Tokens past their TTL are dropped on the next access"""
+        from services.token_store import MemoryTokenStore
+        store = MemoryTokenStore()
+        store.put("short", {"user_id": "u1"}, ttl=timedelta(seconds=-1))
+        store.put("long", {"user_id": "u2"}, ttl=timedelta(hours=1))
+        
+        assert store.get("short") is None
+        assert store.get("long")["user_id"] == "u2"
+        assert store.get("long")["expires_at"] > datetime.now(timezone.utc)
+        assert store.count() == 1 and store.expired == 1
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_consumed_token_heap_entry_ignored(self):
+        """Re-issuing or popping a token leaves no stale expiry behind"""
+        from services.token_store import MemoryTokenStore
+        store = MemoryTokenStore()
+        store.put("token", {"n": 1}, ttl=timedelta(seconds=-1))
+        store.put("token", {"n": 2}, ttl=timedelta(hours=1))
+        
+        assert store.get("token")["n"] == 2
+        assert store.pop("token")["n"] == 2
+        assert store.pop("token") is None
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_redis_token_store_calls_leave_event_loop(self):
+        """Redis round trips from async code run in a worker thread, not on the event loop"""
+        import threading
+        from services.token_store import RedisTokenStore
+        
+        class RecordingRedis:
+            def __init__(self):
+                self.data = {}
+                self.threads = []
+            def set(self, key, value, ex=None):
+                self.threads.append(threading.current_thread())
+                self.data[key] = value
+            def getdel(self, key):
+                self.threads.append(threading.current_thread())
+                return self.data.pop(key, None)
+        
+        client = RecordingRedis()
+        store = RedisTokenStore(client, prefix="tokens:test:")
+        
+        async def scenario():
+            await store.put_async("token", {"user_id": "u1"}, timedelta(minutes=5))
+            return await store.pop_async("token")
+        
+        assert asyncio.run(scenario())["user_id"] == "u1"
+        assert threading.main_thread() not in client.threads
+    
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_incomplete_token_store_rejected(self):
+        """A backend missing part of the interface fails at construction"""
+        from services.token_store import TokenStore
+        
+        class GetOnlyStore(TokenStore):
+            def get(self, token):
+                return None
+        
+        with pytest.raises(TypeError):
+            GetOnlyStore()
+    
+    @pytest.mark.functional
+    @pytest.mark.auth
+    def test_verification_token_redeemed_once(self, clear_test_data):
+        """Email verification tokens are consumed on use"""
+        from services.auth import email_verification_tokens, VerifyEmailRequest
+        email_verification_tokens.clear()
+        user = asyncio.run(auth_service.register_user(UserCreate(email="verify@example.com", password="verifypass123")))['user']
+        token = next(iter(email_verification_tokens._tokens))
+        
+        asyncio.run(auth_service.verify_email(VerifyEmailRequest(token=token)))
+        assert users_db[user.id]['email_verified'] is True
+        with pytest.raises(HTTPException):
+            asyncio.run(auth_service.verify_email(VerifyEmailRequest(token=token)))
+    
+    @pytest.mark.functional
+    @pytest.mark.auth
+    def test_concurrent_password_resets_redeem_token_once(self, clear_test_data):
+        """Two resets racing on one token cannot both succeed"""
+        from services.auth import password_reset_tokens, ResetPasswordRequest, PASSWORD_RESET_TTL
+        now = datetime.now(timezone.utc)
+        users_db['reset_user'] = {'id': 'reset_user', 'email': 'reset@example.com', 'password_hash': 'x',
+                                  'created_at': now, 'updated_at': now}
+        password_reset_tokens.put('reset-token', {'user_id': 'reset_user', 'email': 'reset@example.com'}, ttl=PASSWORD_RESET_TTL)
+        
+        async def race():
+            return await asyncio.gather(
+                auth_service.reset_password(ResetPasswordRequest(token='reset-token', new_password='firstpass123')),
+                auth_service.reset_password(ResetPasswordRequest(token='reset-token', new_password='secondpass123')),
+                return_exceptions=True
+            )
+        
+        results = asyncio.run(race())
+        
+        assert sum(isinstance(r, HTTPException) for r in results) == 1
+        assert 'reset-token' not in password_reset_tokens
+        users_db.pop('reset_user', None)
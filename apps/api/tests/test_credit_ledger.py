@@ -0,0 +1,153 @@
+import pytest
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from fastapi import HTTPException
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.credit_ledger import CreditLedger, create_credit_ledger
+from services.auth import auth_service, users_db
+
+@pytest.fixture
+def ledger():
+    ledger = CreditLedger()
+    ledger.open_account("user_1", 100)
+    return ledger
+
+class TestCreditLedger:
+    """Unit tests for reservations, history and the balance cache"""
+
+    @pytest.mark.unit
+    def test_reserve_commit_release(self, ledger):
+        """Reservations lower what can be spent; commit charges, release returns"""
+        first = ledger.reserve("user_1", 60, "transform")
+        assert ledger.get_balance("user_1") == {'balance': 100, 'reserved': 60, 'available': 40}
+
+        with pytest.raises(HTTPException) as exc_info:
+            ledger.reserve("user_1", 50)
+        assert exc_info.value.status_code == 402
+
+        assert ledger.commit(first, 20) == 20  # partial commit releases the rest
+        assert ledger.get_balance("user_1") == {'balance': 80, 'reserved': 0, 'available': 80}
+        assert ledger.commit(first) is None  # already settled
+
+        second = ledger.reserve("user_1", 30)
+        assert ledger.release(second) == 0
+        assert ledger.available("user_1") == 80
+
+    @pytest.mark.unit
+    def test_hold_releases_on_error(self, ledger):
+        """The hold context manager commits on success and releases on exceptions"""
+        with ledger.hold("user_1", 10, "ok"):
+            pass
+        with pytest.raises(RuntimeError):
+            with ledger.hold("user_1", 50, "boom"):
+                raise RuntimeError("processing failed")
+
+        assert ledger.get_balance("user_1") == {'balance': 90, 'reserved': 0, 'available': 90}
+
+    @pytest.mark.unit
+    def test_history_is_append_only(self, ledger):
+        """Every change leaves a ledger row with the resulting balance"""
+        reservation_id = ledger.reserve("user_1", 25, "magic_enhance")
+        ledger.commit(reservation_id)
+        ledger.grant("user_1", 5, "refund")
+
+        history = ledger.history("user_1")
+        assert [(row['kind'], row['amount'], row['balance_after']) for row in history] == [
+            ('grant', 5, 80),
+            ('commit', 25, 75),
+            ('reserve', 25, 100),
+            ('grant', 100, 100)
+        ]
+        assert history[1]['reservation_id'] == reservation_id
+
+    @pytest.mark.unit
+    def test_concurrent_reservations_never_overdraw(self, ledger):
+        """Parallel reserve calls can take at most the available balance"""
+        def attempt(_):
+            try:
+                ledger.reserve("user_1", 7)
+                return True
+            except HTTPException:
+                return False
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            granted = sum(pool.map(attempt, range(40)))
+
+        assert granted == 100 // 7
+        assert ledger.get_balance("user_1")['available'] == 100 % 7
+
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_cache_sees_writes_from_other_connections(self, tmp_path):
+        """A second process writing the same database file invalidates cached balances"""
+        url = f"sqlite:///{tmp_path / 'credits.db'}"
+        api, worker = create_credit_ledger(url), create_credit_ledger(url)
+        api.open_account("user_1", 100)
+        assert api.available("user_1") == 100
+
+        worker.charge("user_1", 30)
+
+        assert api.available("user_1") == 70
+
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_auth_service_mirrors_credits_on_user_record(self):
+        """The spendable balance is reflected on the user record and User model"""
+        now = datetime.now(timezone.utc)
+        users_db["user_1"] = {
+            "id": "user_1", "email": "credits@example.com", "brand": "viralsplit",
+            "credits": 50, "created_at": now, "updated_at": now
+        }
+
+        async def scenario():
+            assert await auth_service.get_credits("user_1") == 50
+            reservation_id = await auth_service.reserve_credits("user_1", 20, "batch_remix")
+            assert users_db["user_1"]["credits"] == 30
+            await auth_service.commit_credits(reservation_id, 15)
+            return await auth_service.deduct_credits("user_1", 5)
+
+        assert asyncio.run(scenario()) == 30
+        assert users_db["user_1"]["credits"] == 30
+
+    @pytest.mark.functional
+    @pytest.mark.api
+    def test_failed_refinement_releases_held_credits(self, client, monkeypatch):
+        """Script refinement charges only on success; a failure leaves the balance untouched"""
+        from main import app, script_writer
+        from services.auth import User
+        now = datetime.now(timezone.utc)
+        users_db["refine_user"] = {
+            "id": "refine_user", "email": "refine@example.com", "brand": "viralsplit",
+            "credits": 12, "created_at": now, "updated_at": now
+        }
+        app.dependency_overrides[auth_service.get_current_user] = lambda: User(
+            id="refine_user", email="refine@example.com", brand="viralsplit", created_at=now, updated_at=now
+        )
+
+        async def failing_refine(**kwargs):
+            raise RuntimeError("provider down")
+
+        async def refine(**kwargs):
+            return {"script": "better"}
+
+        body = {"script": "hook", "feedback": "punchier"}
+        try:
+            monkeypatch.setattr(script_writer, "refine_script", failing_refine)
+            failed = client.post("/api/scripts/refine", json=body)
+            balance_after_failure = asyncio.run(auth_service.get_credits("refine_user"))
+
+            monkeypatch.setattr(script_writer, "refine_script", refine)
+            refined = client.post("/api/scripts/refine", json=body)
+        finally:
+            app.dependency_overrides.pop(auth_service.get_current_user, None)
+            users_db.pop("refine_user", None)
+
+        assert failed.status_code == 500
+        assert balance_after_failure == 12
+        assert refined.status_code == 200
+        assert refined.json()["credits_remaining"] == 7
@@ -0,0 +1,138 @@
+import pytest
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.auth as auth_module
+from services.auth import auth_service
+from services.email_outbox import EmailOutbox
+from tests.smtp_sink import SMTPSink
+
+@pytest.fixture
+def smtp_sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+def make_outbox(sink, **kwargs):
+    return EmailOutbox(host=sink.host, port=sink.port, username=None, password=None, use_tls=False, **kwargs)
+
+async def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        await asyncio.sleep(0.01)
+
+class TestEmailOutbox:
+    """Unit tests for background email delivery against a local SMTP sink"""
+
+    @pytest.mark.unit
+    def test_batch_reuses_one_smtp_session(self, smtp_sink):
+        """A burst of messages is delivered over a single connection"""
+        outbox = make_outbox(smtp_sink, batch_size=5)
+
+        async def scenario():
+            for index in range(12):
+                assert outbox.enqueue(f"user{index}@example.com", f"Welcome {index}", "Hello")
+            await wait_until(lambda: outbox.sent == 12)
+            await outbox.stop()
+
+        asyncio.run(scenario())
+
+        assert len(smtp_sink.messages) == 12
+        assert smtp_sink.connections == 1
+        assert outbox.batches >= 3
+        assert {m['To'] for m in smtp_sink.messages} == {f"user{i}@example.com" for i in range(12)}
+
+    @pytest.mark.unit
+    def test_transient_failure_is_retried(self, smtp_sink):
+        """A 4xx rejection is retried with backoff and then delivered"""
+        smtp_sink.reject_next = 1
+        outbox = make_outbox(smtp_sink, retry_base=0.01)
+
+        async def scenario():
+            outbox.enqueue("retry@example.com", "Verify", "Hello")
+            await wait_until(lambda: outbox.sent == 1)
+            await outbox.stop()
+
+        asyncio.run(scenario())
+
+        assert outbox.retried == 1
+        assert outbox.failed == 0
+        assert smtp_sink.messages[0]['To'] == "retry@example.com"
+
+    @pytest.mark.unit
+    def test_gives_up_after_max_attempts(self, smtp_sink):
+        """Messages that keep failing are dropped and counted"""
+        smtp_sink.reject_next = 100
+        outbox = make_outbox(smtp_sink, retry_base=0.01, max_attempts=3)
+
+        async def scenario():
+            outbox.enqueue("never@example.com", "Verify", "Hello")
+            await wait_until(lambda: outbox.failed == 1)
+            await outbox.stop(timeout=0)
+
+        asyncio.run(scenario())
+
+        assert outbox.failed == 1
+        assert outbox.retried == 2
+        assert outbox.get_stats()['queue_depth'] == 0
+        assert smtp_sink.messages == []
+
+    @pytest.mark.unit
+    def test_unexpected_errors_do_not_stop_the_worker(self, smtp_sink):
+        """An unsendable message is dropped and a crashing batch retried; later mail still goes out"""
+        outbox = make_outbox(smtp_sink, retry_base=0.01, max_attempts=2)
+        build = outbox._build_message
+        send_batch = outbox._send_batch
+        crashes = [OSError("thread pool shut down")]
+
+        def build_message(message):
+            if message.to_email.startswith("bad"):
+                raise UnicodeEncodeError("ascii", message.to_email, 0, 1, "cannot encode")
+            return build(message)
+
+        def flaky_send_batch(batch):
+            if crashes:
+                raise crashes.pop()
+            return send_batch(batch)
+
+        outbox._build_message = build_message
+        outbox._send_batch = flaky_send_batch
+
+        async def scenario():
+            outbox.enqueue("first@example.com", "Verify", "Hello")
+            outbox.enqueue("bad\u00e9@example.com", "Verify", "Hello")
+            await wait_until(lambda: outbox.failed == 1 and outbox.sent == 1)
+            outbox.enqueue("later@example.com", "Reset", "Hello")
+            await wait_until(lambda: outbox.sent == 2)
+            await outbox.stop()
+
+        asyncio.run(scenario())
+
+        assert outbox.failed == 1
+        assert {m['To'] for m in smtp_sink.messages} == {"first@example.com", "later@example.com"}
+
+    @pytest.mark.unit
+    @pytest.mark.auth
+    def test_auth_emails_are_queued_not_sent_inline(self, smtp_sink, monkeypatch):
+        """With SMTP configured, verification email returns before delivery"""
+        outbox = make_outbox(smtp_sink)
+        monkeypatch.setattr(auth_module, 'SMTP_USERNAME', 'mailer')
+        monkeypatch.setattr(auth_module, 'SMTP_PASSWORD', 'secret')
+        monkeypatch.setattr(auth_module, 'email_outbox', outbox)
+
+        assert auth_service.send_verification_email("queued@example.com", "token123") is True
+        assert outbox.get_stats()['queue_depth'] == 1
+        assert smtp_sink.messages == []
+
+        async def scenario():
+            await outbox.start()
+            await wait_until(lambda: outbox.sent == 1)
+            await outbox.stop()
+
+        asyncio.run(scenario())
+
+        assert "token123" in smtp_sink.messages[0].get_payload(0).get_payload()
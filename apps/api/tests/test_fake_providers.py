@@ -0,0 +1,114 @@
+import pytest
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import openai
+import replicate
+from fastapi.testclient import TestClient
+from benchmarks.fake_providers import create_app, FakeProviderConfig, FakeProviders, SILENT_MP3_FRAME
+from services.elevenlabs_advanced import ElevenLabsAdvancedService
+from services.llm_cache import llm_cache
+from services.llm_gateway import chat_completion, stream_chat_completion, replicate_run
+from services.provider_governor import provider_governors
+
+@pytest.fixture(autouse=True)
+def reset_providers():
+    provider_governors.clear()
+    llm_cache.clear()
+    yield
+    provider_governors.clear()
+    llm_cache.clear()
+
+def fake_server(**config):
+    return TestClient(create_app(FakeProviderConfig(seed=7, **config)))
+
+def forwarding_transport(server: TestClient) -> httpx.MockTransport:
+    """httpx transport for clients that build their own httpx.Client (Replicate)"""
+    def forward(request):
+        response = server.request(request.method, str(request.url), headers=dict(request.headers),
+                                  content=request.read())
+        return httpx.Response(response.status_code, headers=response.headers, content=response.content)
+    return httpx.MockTransport(forward)
+
+MESSAGES = [{"role": "user", "content": "Write a hook about productivity"}]
+
+class TestFakeProviders:
+    """The fake provider server speaks the real client protocols"""
+
+    @pytest.mark.unit
+    def test_latency_distributions_are_seeded(self):
+        """Latency draws follow the configured distribution and repeat for a seed"""
+        config = FakeProviderConfig(seed=3, latency={'chat': 'lognormal:0.8:0.5', 'tts': 'uniform:0.1:0.2'})
+        first, second = FakeProviders(config), FakeProviders(config)
+
+        draws = [first.delay('chat') for _ in range(5)]
+
+        assert draws == [second.delay('chat') for _ in range(5)]
+        assert all(0.1 <= first.delay('tts') <= 0.2 for _ in range(20))
+        assert first.delay('transcription') == 0.0
+        with pytest.raises(ValueError):
+            FakeProviders(FakeProviderConfig(latency={'chat': 'pareto:1'}))
+
+    @pytest.mark.integration
+    def test_openai_sdk_through_gateway(self):
+        """Canned completions come back through the SDK with usage and rate limit headers"""
+        app = create_app(FakeProviderConfig(rpm=100, canned={'chat': [{'match': 'productivity', 'content': {'hook': 'Stop wasting mornings'}}]}))
+        client = openai.AsyncOpenAI(api_key='sk-fake', base_url='http://fake/v1',
+                                    http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app)))
+
+        response = asyncio.run(chat_completion(client, site='Test.fake', model='gpt-4', messages=MESSAGES,
+                                               temperature=0.3, response_format={"type": "json_object"}))
+
+        assert response.choices[0].message.content == '{"hook": "Stop wasting mornings"}'
+        assert response.usage.prompt_tokens > 0
+        assert provider_governors.get('openai', 'gpt-4').get_stats()['requests_per_minute']['limit'] == 100
+
+    @pytest.mark.integration
+    def test_streamed_completion(self):
+        """Streamed chunks reassemble into the canned completion"""
+        server = fake_server(chunk_chars=5)
+        client = openai.OpenAI(api_key='sk-fake', base_url='http://testserver/v1', http_client=server)
+
+        async def collect():
+            return ''.join([delta async for delta in stream_chat_completion(
+                client, site='Test.fake_stream', model='gpt-4', messages=MESSAGES)])
+
+        assert asyncio.run(collect()) == "This is a canned completion from the fake provider server."
+        assert server.get('/_fake/stats').json()['routes']['chat.completions'] == {'stream': 1}
+
+    @pytest.mark.integration
+    def test_injected_failures_use_provider_error_shapes(self):
+        """Rate limits carry Retry-After and map onto the SDK's exception types"""
+        server = fake_server(rpm=1)
+        client = openai.OpenAI(api_key='sk-fake', base_url='http://testserver/v1', http_client=server, max_retries=0)
+        client.chat.completions.create(model='gpt-4', messages=MESSAGES)
+
+        with pytest.raises(openai.RateLimitError) as error:
+            client.chat.completions.create(model='gpt-4', messages=MESSAGES)
+        assert float(error.value.response.headers['retry-after']) > 0
+        assert error.value.response.headers['x-ratelimit-remaining-requests'] == '0'
+
+        broken = fake_server(error_rate=1.0)
+        response = broken.post('/v1/text-to-speech/voice', json={'text': 'hello'})
+        assert response.status_code == 500 and 'detail' in response.json()
+
+    @pytest.mark.integration
+    def test_replicate_prediction_and_elevenlabs_speech(self, monkeypatch):
+        """Replicate runs poll to completion; TTS returns audio sized to the text"""
+        server = fake_server(canned={'replicate': {'stability-ai/sdxl': ['https://cdn.example.com/out.png']}})
+        client = replicate.Client(api_token='r8_fake', base_url='http://testserver', transport=forwarding_transport(server))
+
+        output = asyncio.run(replicate_run(client, 'stability-ai/sdxl', site='Test.fake_replicate',
+                                           input={'prompt': 'thumbnail'}))
+        assert [str(item) for item in output] == ['https://cdn.example.com/out.png']
+
+        speech = server.post('/v1/text-to-speech/21m00Tcm4TlvDq8ikWAM', json={'text': 'a' * 150})
+        assert speech.headers['content-type'] == 'audio/mpeg'
+        assert len(speech.content) >= 10 / 0.026 * len(SILENT_MP3_FRAME) - len(SILENT_MP3_FRAME)
+
+        monkeypatch.setenv('ELEVENLABS_BASE_URL', 'http://localhost:8900/v1')
+        assert ElevenLabsAdvancedService().base_url == 'http://localhost:8900/v1'
@@ -0,0 +1,296 @@
+import pytest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from job_scheduler import VideoJobScheduler, VideoJob, SchedulerUnavailableError, video_queue_name
+from job_cost_model import JobCostModel
+
+def make_job(job_id, user_id, tier, estimated_seconds=0.0, enqueued_at=None):
+    job = VideoJob(job_id=job_id, project_id=f"project_{job_id}", user_id=user_id, tier=tier,
+                   estimated_seconds=estimated_seconds)
+    if enqueued_at is not None:
+        job.enqueued_at = enqueued_at
+    return job
+
+class SharedRedis:
+    """State two FakeLeases share, standing in for one Redis server"""
+
+    def __init__(self):
+        self.owner = None
+        self.submissions = []
+        self.down = False
+
+class FakeLease:
+    """In-memory SchedulerLease for one process"""
+
+    ttl = 30
+
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+
+    async def acquire(self):
+        if self.redis.owner in (None, self.name):
+            self.redis.owner = self.name
+        return self.redis.owner == self.name
+
+    async def release(self):
+        if self.redis.owner == self.name:
+            self.redis.owner = None
+
+    async def forward(self, jobs):
+        if self.redis.down:
+            raise ConnectionError("redis unavailable")
+        self.redis.submissions += [job.to_json() for job in jobs]
+
+    async def take_forwarded(self, count=100):
+        taken, self.redis.submissions = self.redis.submissions[:count], self.redis.submissions[count:]
+        return [VideoJob.from_json(raw) for raw in taken]
+
+class TestVideoJobScheduler:
+    """Unit tests for tier-aware video job scheduling"""
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_weighted_fair_dequeue(self):
+        """Higher tiers get more slots but lower tiers are never starved"""
+        scheduler = VideoJobScheduler(
+            tier_weights={'enterprise': 3, 'free': 1},
+            user_limits={'enterprise': 100, 'free': 100},
+            max_running=100
+        )
+        for i in range(8):
+            scheduler.submit(make_job(f"e{i}", "ent_user", 'enterprise'))
+            scheduler.submit(make_job(f"f{i}", "free_user", 'free'))
+        
+        order = [scheduler.next_job().tier for _ in range(8)]
+        
+        assert order.count('enterprise') == 6
+        assert order.count('free') == 2
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_per_user_concurrency_cap(self):
+        """A single user's batch cannot take every worker slot"""
+        scheduler = VideoJobScheduler(
+            tier_weights={'pro': 1},
+            user_limits={'pro': 2},
+            max_running=10
+        )
+        for i in range(5):
+            scheduler.submit(make_job(f"batch{i}", "batch_user", 'pro'))
+        scheduler.submit(make_job("other", "other_user", 'pro'))
+        
+        started = [scheduler.next_job().job_id for _ in range(3)]
+        
+        assert started == ["batch0", "batch1", "other"]
+        assert scheduler.next_job() is None
+        
+        scheduler.complete("batch0")
+        assert scheduler.next_job().job_id == "batch2"
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_max_running_limit(self):
+        """No jobs are started once the worker pool is full"""
+        scheduler = VideoJobScheduler(max_running=1)
+        scheduler.submit(make_job("a", "user_a", 'enterprise'))
+        scheduler.submit(make_job("b", "user_b", 'enterprise'))
+        
+        assert scheduler.next_job().job_id == "a"
+        assert scheduler.next_job() is None
+        assert scheduler.queue_position("b") == 0
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_stats_per_tier(self):
+        """Queue depth and wait percentiles are reported per tier"""
+        scheduler = VideoJobScheduler()
+        scheduler.submit(make_job("a", "user_a", 'team'))
+        scheduler.submit(make_job("b", "user_b", 'unknown_tier'))
+        scheduler.next_job()
+        
+        stats = scheduler.get_stats()
+        
+        assert stats['running'] == 1
+        assert stats['tiers']['free']['queued'] + stats['tiers']['team']['queued'] == 1
+        assert stats['tiers']['team']['wait_seconds']['samples'] == 1
+        assert stats['tiers']['team']['wait_seconds']['p50'] is not None
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_queue_names(self):
+        """Unknown tiers fall back to the free queue"""
+        assert video_queue_name('enterprise') == 'video_processing.enterprise'
+        assert video_queue_name('mystery') == 'video_processing.free'
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_shortest_expected_job_first(self):
+        """Short jobs overtake long ones queued at about the same time"""
+        scheduler = VideoJobScheduler(tier_weights={'pro': 1}, user_limits={'pro': 10}, max_running=10)
+        scheduler.submit(make_job("long", "user_a", 'pro', estimated_seconds=600, enqueued_at=1000))
+        scheduler.submit(make_job("short", "user_b", 'pro', estimated_seconds=10, enqueued_at=1001))
+        
+        assert scheduler.next_job().job_id == "short"
+        assert scheduler.next_job().job_id == "long"
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_long_job_not_starved(self):
+        """Short jobs arriving after a long job's virtual deadline queue behind it"""
+        scheduler = VideoJobScheduler(tier_weights={'pro': 1}, user_limits={'pro': 10}, max_running=10)
+        scheduler.submit(make_job("long", "user_a", 'pro', estimated_seconds=600, enqueued_at=1000))
+        scheduler.submit(make_job("late_short", "user_b", 'pro', estimated_seconds=10, enqueued_at=1700))
+        
+        assert scheduler.next_job().job_id == "long"
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_eta_includes_jobs_ahead(self):
+        """ETA adds the estimates of jobs ahead in the same tier"""
+        scheduler = VideoJobScheduler(tier_weights={'pro': 1}, user_limits={'pro': 10}, max_running=1)
+        scheduler.submit(make_job("a", "user_a", 'pro', estimated_seconds=20, enqueued_at=1000))
+        scheduler.submit(make_job("b", "user_b", 'pro', estimated_seconds=30, enqueued_at=1000))
+        
+        eta = scheduler.estimate_eta("b")
+        
+        assert eta['queue_seconds'] == 20
+        assert eta['eta_seconds'] == 50
+
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_on_finished_hook(self):
+        """Completion and cancellation call the job's hook with the final status"""
+        scheduler = VideoJobScheduler()
+        finished = []
+        for job_id in ("a", "b"):
+            job = make_job(job_id, f"user_{job_id}", 'pro')
+            job.on_finished = lambda job: finished.append((job.job_id, job.status))
+            scheduler.submit(job)
+
+        scheduler.next_job()
+        scheduler.complete("a", status='failed')
+        scheduler.cancel("b")
+
+        assert finished == [("a", "failed"), ("b", "cancelled")]
+
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_non_owner_forwards_to_lease_holder(self):
+        """Every process accepts jobs; the lease holder queues and dispatches them once"""
+        redis = SharedRedis()
+        owner = VideoJobScheduler(lease=FakeLease(redis, "owner"), tier_weights={'pro': 1}, user_limits={'pro': 1})
+        other = VideoJobScheduler(lease=FakeLease(redis, "other"), tier_weights={'pro': 1}, user_limits={'pro': 1})
+        finished = []
+        owner.on_job_finished = lambda job: finished.append((job.job_id, job.meta['reservation_id']))
+
+        async def scenario():
+            await owner._renew_lease()
+            await other._renew_lease()
+            forwarded = []
+            for i in range(2):
+                job = make_job(f"j{i}", "user_a", 'pro')
+                job.meta['reservation_id'] = f"res_{i}"
+                forwarded.append(await other.enqueue(job))
+            await owner._take_submissions()
+            return forwarded
+
+        jobs = asyncio.run(scenario())
+
+        assert owner.owns_lease() and not other.owns_lease()
+        assert [job.status for job in jobs] == ['forwarded', 'forwarded']
+        assert other.get_stats()['forwarded'] == 2
+        # One per-user cap across both processes
+        assert owner.next_job().job_id == "j0"
+        assert owner.next_job() is None
+        owner.complete("j0")
+        assert finished == [("j0", "res_0")]
+
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_shutdown_hands_queued_jobs_to_next_owner(self):
+        """Queued jobs go back to Redis on shutdown and the next holder picks them up"""
+        redis = SharedRedis()
+        first = VideoJobScheduler(lease=FakeLease(redis, "first"), max_running=1)
+        second = VideoJobScheduler(lease=FakeLease(redis, "second"))
+
+        async def scenario():
+            await first._renew_lease()
+            for job_id in ("a", "b", "c"):
+                await first.enqueue(make_job(job_id, f"user_{job_id}", 'pro'))
+            first.next_job()
+            cancelled = await first.shutdown()
+            await second._renew_lease()
+            await second._take_submissions()
+            return cancelled
+
+        assert asyncio.run(scenario()) == []
+        assert redis.owner == "second"
+        assert second.get_stats()['tiers']['pro']['queued'] == 2
+
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_shutdown_without_redis_cancels_queued_jobs(self):
+        """Without a shared list queued jobs are cancelled so their hooks release credits"""
+        scheduler = VideoJobScheduler(max_running=1)
+        finished = []
+        for job_id in ("a", "b", "c"):
+            job = make_job(job_id, f"user_{job_id}", 'pro')
+            job.on_finished = lambda job: finished.append((job.job_id, job.status))
+            scheduler.submit(job)
+        scheduler.next_job()
+
+        cancelled = asyncio.run(scheduler.shutdown())
+
+        assert sorted(job.job_id for job in cancelled) == ["b", "c"]
+        assert sorted(finished) == [("b", "cancelled"), ("c", "cancelled")]
+
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_unreachable_redis_rejects_job(self):
+        """A job that can be neither queued nor forwarded raises SchedulerUnavailableError"""
+        redis = SharedRedis()
+        redis.owner = "elsewhere"
+        redis.down = True
+        scheduler = VideoJobScheduler(lease=FakeLease(redis, "me"))
+
+        with pytest.raises(SchedulerUnavailableError):
+            asyncio.run(scheduler.enqueue(make_job("a", "user_a", 'pro')))
+
+class TestJobCostModel:
+    """Unit tests for the video job cost model"""
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_estimate_scales_with_work(self):
+        """Longer, higher-resolution, multi-platform jobs cost more"""
+        model = JobCostModel()
+        short = model.estimate({'duration': 10, 'width': 1080, 'height': 1920, 'fps': 30}, ['tiktok'])
+        long = model.estimate({'duration': 300, 'width': 3840, 'height': 2160, 'fps': 60}, ['tiktok', 'linkedin'])
+        enhanced = model.estimate({'duration': 10, 'width': 1080, 'height': 1920, 'fps': 30}, ['tiktok'], ['remove_background'])
+        
+        assert long.seconds > short.seconds
+        assert enhanced.work_units > short.work_units
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_unknown_platforms_ignored(self):
+        """Platforms without specs add no work"""
+        model = JobCostModel()
+        assert model.work_units(None, ['not_a_platform']) == 0
+    
+    @pytest.mark.unit
+    @pytest.mark.video
+    def test_calibration_from_observed_timings(self):
+        """Observed timings pull the model toward the real cost"""
+        model = JobCostModel(min_samples=3)
+        for units in [10, 20, 40, 80, 160]:
+            model.observe(units, 2.0 + 0.25 * units)
+        
+        assert abs(model.seconds_per_unit - 0.25) < 0.01
+        assert abs(model.overhead - 2.0) < 0.5
+        assert abs(model.predict(100) - 27.0) < 1.0
@@ -0,0 +1,152 @@
+import pytest
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletion
+from services.llm_accounting import LLMAccounting, EndpointTagMiddleware, llm_accounting
+from services.llm_cache import llm_cache
+from services.llm_gateway import chat_completion, stream_chat_completion
+
+@pytest.fixture(autouse=True)
+def clear_accounting():
+    llm_accounting.clear()
+    llm_cache.clear()
+    yield
+    llm_accounting.clear()
+    llm_cache.clear()
+
+class UsageClient:
+    """Async client stub whose completions report token usage"""
+
+    def __init__(self, prompt_tokens=120, completion_tokens=30):
+        self.calls = 0
+        self.usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return ChatCompletion.model_validate({
+            'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': int(time.time()), 'model': kwargs['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': '72'}}],
+            'usage': self.usage
+        })
+
+MESSAGES = [{"role": "user", "content": "Predict the viral ceiling"}]
+
+class TestLLMAccounting:
+    """Unit tests for per-call-site LLM latency and token accounting"""
+
+    @pytest.mark.unit
+    def test_tokens_latency_and_cache_status_per_site(self):
+        """Billed tokens come from provider calls; cache hits count as saved"""
+        client = UsageClient()
+
+        async def scenario():
+            for _ in range(2):
+                await chat_completion(client, site='AIEnhancer.predict_viral_ceiling', model='gpt-4',
+                                      messages=MESSAGES, temperature=0.3)
+            await chat_completion(client, site='AIEnhancer.generate_viral_hooks', model='gpt-4',
+                                  messages=MESSAGES, temperature=0.9)
+
+        asyncio.run(scenario())
+
+        sites = llm_accounting.get_stats()['sites']
+        ceiling = sites['AIEnhancer.predict_viral_ceiling']
+        assert ceiling['calls'] == 2
+        assert ceiling['cache'] == {'miss': 1, 'hit': 1}
+        assert ceiling['prompt_tokens'] == 120 and ceiling['completion_tokens'] == 30
+        assert ceiling['saved_tokens'] == 150
+        assert ceiling['models'] == {'gpt-4': 2}
+        assert ceiling['latency_ms']['max'] >= 10
+        assert sites['AIEnhancer.generate_viral_hooks']['cache'] == {'bypass': 1}
+
+    @pytest.mark.unit
+    def test_abandoned_stream_is_recorded(self):
+        """A stream closed by its consumer before the usage chunk counts as aborted"""
+        class StreamingClient:
+            def __init__(self):
+                self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+            async def create(self, **kwargs):
+                async def chunks():
+                    for text in ('x' * 40, 'y' * 40, 'z' * 40):
+                        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+                return chunks()
+
+        async def scenario():
+            stream = stream_chat_completion(StreamingClient(), site='AIScriptWriter.stream', model='gpt-4',
+                                            messages=[{"role": "user", "content": "a" * 400}])
+            assert await stream.__anext__() == 'x' * 40
+            await stream.aclose()
+
+        asyncio.run(scenario())
+
+        site = llm_accounting.get_stats()['sites']['AIScriptWriter.stream']
+        assert site['calls'] == 1 and site['errors'] == 0
+        assert site['cache'] == {'aborted': 1}
+        assert site['prompt_tokens'] == 100 and site['completion_tokens'] == 10
+
+    @pytest.mark.unit
+    def test_sampled_log_keeps_every_error(self, tmp_path):
+        """With sampling off, failed calls are still written to the JSONL log"""
+        path = tmp_path / 'llm_calls.jsonl'
+        accounting = LLMAccounting(log_path=str(path), sample_rate=0.0)
+
+        with accounting.track('Test.ok', 'chat', 'gpt-4') as call:
+            call.response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=5, completion_tokens=5))
+        with pytest.raises(RuntimeError):
+            with accounting.track('Test.broken', 'chat', 'gpt-4'):
+                raise RuntimeError("upstream error")
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(lines) == 1
+        assert lines[0]['site'] == 'Test.broken' and lines[0]['error'] == 'RuntimeError'
+        assert accounting.get_stats()['sites']['Test.broken']['errors'] == 1
+
+    @pytest.mark.unit
+    def test_full_sample_rate_logs_each_call(self, tmp_path):
+        """Each logged record carries model, tokens, latency and cache status"""
+        path = tmp_path / 'llm_calls.jsonl'
+        accounting = LLMAccounting(log_path=str(path), sample_rate=1.0)
+
+        with accounting.track('Test.site', 'chat', 'gpt-3.5-turbo') as call:
+            call.cache = 'hit'
+            call.response = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=40, completion_tokens=10))
+
+        record = json.loads(path.read_text())
+        assert record['model'] == 'gpt-3.5-turbo'
+        assert record['cache'] == 'hit'
+        assert record['prompt_tokens'] == 40 and record['completion_tokens'] == 10
+        assert record['latency_ms'] >= 0
+
+    @pytest.mark.unit
+    @pytest.mark.api
+    def test_calls_tagged_with_route_template(self):
+        """Calls made while serving a request are totalled under its route"""
+        app = FastAPI()
+        app.add_middleware(EndpointTagMiddleware)
+        upstream = UsageClient()
+
+        @app.get("/api/projects/{project_id}/score")
+        async def score(project_id: str):
+            await chat_completion(upstream, site='Test.score', model='gpt-4',
+                                  messages=[{"role": "user", "content": project_id}], temperature=0.9)
+            return {'ok': True}
+
+        with TestClient(app) as client:
+            client.get("/api/projects/a/score")
+            client.get("/api/projects/b/score")
+
+        endpoints = llm_accounting.get_stats()['endpoints']
+        assert endpoints['GET /api/projects/{project_id}/score']['calls'] == 2
+        assert endpoints['GET /api/projects/{project_id}/score']['prompt_tokens'] == 240
@@ -0,0 +1,165 @@
+import pytest
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai.types.chat import ChatCompletion
+from services.llm_cache import LLMResponseCache, SQLiteCacheTier, cache_key, llm_cache
+from services.llm_gateway import chat_completion, _restore_chat_completion
+
+def make_completion(content: str) -> ChatCompletion:
+    return ChatCompletion.model_validate({
+        'id': 'chatcmpl-test',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': 'gpt-4-turbo-preview',
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'message': {'role': 'assistant', 'content': content}
+        }]
+    })
+
+class CountingClient:
+    """Async client stub that counts upstream chat completion calls"""
+
+    def __init__(self, content='72'):
+        self.calls = 0
+        self.content = content
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return make_completion(self.content)
+
+@pytest.fixture(autouse=True)
+def clear_llm_cache():
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
+
+MESSAGES = [{"role": "user", "content": "Rate this video"}]
+
+class TestLLMResponseCache:
+    """Unit tests for the shared LLM response cache"""
+
+    @pytest.mark.unit
+    def test_key_covers_model_messages_and_params(self):
+        """Keys are stable across dict ordering and change with any keyed parameter"""
+        base = cache_key('gpt-4', MESSAGES, {'temperature': 0.3, 'max_tokens': 50})
+        assert base == cache_key('gpt-4', MESSAGES, {'max_tokens': 50, 'temperature': 0.3})
+        assert base == cache_key('gpt-4', MESSAGES, {'temperature': 0.3, 'max_tokens': 50, 'timeout': 10})
+        assert base != cache_key('gpt-3.5-turbo', MESSAGES, {'temperature': 0.3, 'max_tokens': 50})
+        assert base != cache_key('gpt-4', MESSAGES, {'temperature': 0.4, 'max_tokens': 50})
+
+    @pytest.mark.unit
+    def test_repeated_low_temperature_call_is_served_from_cache(self):
+        """The second identical call does not reach the provider"""
+        client = CountingClient()
+
+        async def scenario():
+            first = await chat_completion(client, site='Test.score', model='gpt-4', messages=MESSAGES, temperature=0.3)
+            second = await chat_completion(client, site='Test.score', model='gpt-4', messages=MESSAGES, temperature=0.3)
+            return first, second
+
+        first, second = asyncio.run(scenario())
+
+        assert client.calls == 1
+        assert second.choices[0].message.content == first.choices[0].message.content
+        stats = llm_cache.get_stats()['sites']['Test.score']
+        assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == 0.5
+
+    @pytest.mark.unit
+    def test_high_temperature_calls_bypass_unless_site_sets_ttl(self):
+        """Creative calls are not cached by default; a call-site TTL opts them in"""
+        client = CountingClient()
+
+        async def scenario():
+            for _ in range(2):
+                await chat_completion(client, site='Test.hooks', model='gpt-4', messages=MESSAGES, temperature=0.8)
+            for _ in range(2):
+                await chat_completion(client, site='Test.hashtags', cache_ttl=60, model='gpt-4', messages=MESSAGES, temperature=0.8)
+
+        asyncio.run(scenario())
+
+        assert client.calls == 3
+        sites = llm_cache.get_stats()['sites']
+        assert sites['Test.hooks']['bypassed'] == 2
+        assert sites['Test.hashtags']['hits'] == 1
+
+    @pytest.mark.unit
+    def test_entries_expire(self):
+        """An entry is not served after its TTL"""
+        cache = LLMResponseCache()
+        cache.set('k', 'response', ttl=0.01)
+        time.sleep(0.02)
+
+        assert cache.get('k', 'Test.site') is None
+
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_shared_sqlite_tier_survives_new_process(self, tmp_path):
+        """A fresh cache backed by the same SQLite file restores stored completions"""
+        path = str(tmp_path / 'llm_cache.db')
+        writer = LLMResponseCache(tier=SQLiteCacheTier(path))
+        response = make_completion('cached answer')
+        writer.set('llm:key', response, ttl=60, serialized=response.model_dump_json())
+
+        reader = LLMResponseCache(tier=SQLiteCacheTier(path))
+        restored = reader.get('llm:key', 'Test.site', restore=_restore_chat_completion)
+
+        assert restored.choices[0].message.content == 'cached answer'
+        assert reader.get_stats()['sites']['Test.site']['shared_hits'] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_blocking_tier_read_off_event_loop(self):
+        """Async lookups run a network-backed tier in a worker thread"""
+        import threading
+
+        class RecordingTier:
+            blocking = True
+
+            def __init__(self):
+                self.rows = {}
+                self.threads = []
+
+            def get(self, key, stale_for=0.0):
+                self.threads.append(threading.current_thread())
+                return self.rows.get(key)
+
+            def set(self, key, value, ttl):
+                self.threads.append(threading.current_thread())
+                self.rows[key] = (value, time.time() + ttl)
+
+        tier = RecordingTier()
+        writer, reader = LLMResponseCache(tier=tier), LLMResponseCache(tier=tier)
+        response = make_completion('from redis')
+
+        async def scenario():
+            await writer.set_async('llm:key', response, ttl=60, serialized=response.model_dump_json())
+            return await reader.get_async('llm:key', 'Test.site', restore=_restore_chat_completion)
+
+        assert asyncio.run(scenario()).choices[0].message.content == 'from redis'
+        assert len(tier.threads) == 2 and threading.main_thread() not in tier.threads
+        assert reader.get_stats()['sites']['Test.site']['shared_hits'] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_shared_hit_keeps_the_stored_expiry(self):
+        """A completion copied from the shared tier expires locally when the stored entry does"""
+        tier = SQLiteCacheTier(':memory:')
+        writer = LLMResponseCache(tier=tier)
+        reader = LLMResponseCache(tier=tier)
+        response = make_completion('short lived')
+        writer.set('llm:key', response, ttl=0.05, serialized=response.model_dump_json())
+
+        assert reader.get('llm:key', 'Test.site', restore=_restore_chat_completion) is not None
+        time.sleep(0.1)
+
+        assert reader.get('llm:key', 'Test.site', restore=_restore_chat_completion) is None
+        assert reader.get_stats()['sites']['Test.site']['misses'] == 1
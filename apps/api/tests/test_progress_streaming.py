@@ -0,0 +1,254 @@
+import pytest
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progress_buffer import CoalescingQueue
+from progress_bus import ProgressBus, progress_bus
+from websocket_manager import ConnectionManager
+import sse_events
+
+class FakeWebSocket:
+    """Minimal stand-in for a FastAPI WebSocket"""
+    
+    def __init__(self, send_delay=0.0):
+        self.send_delay = send_delay
+        self.sent = []
+        self.closed = False
+    
+    async def accept(self):
+        pass
+    
+    async def send_json(self, data):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        self.sent.append(data)
+    
+    async def close(self, code=1000):
+        self.closed = True
+
+class TestCoalescingQueue:
+    """Unit tests for latest-state progress queues"""
+    
+    @pytest.mark.unit
+    def test_coalesces_progress_when_full(self):
+        """Older progress snapshots are replaced by newer ones"""
+        queue = CoalescingQueue(maxsize=2)
+        for progress in range(5):
+            assert queue.put_nowait({"status": "processing", "progress": progress})
+        
+        assert queue.qsize() == 2
+        assert queue.coalesced == 3
+        assert [item["progress"] for item in queue._items] == [3, 4]
+    
+    @pytest.mark.unit
+    def test_terminal_events_kept(self):
+        """Terminal events survive coalescing"""
+        queue = CoalescingQueue(maxsize=1)
+        queue.put_nowait({"status": "processing", "progress": 50})
+        queue.put_nowait({"status": "completed", "progress": 100})
+        
+        assert not queue.put_nowait({"status": "processing", "progress": 60})
+        assert queue.dropped == 1
+        assert list(queue._items) == [{"status": "completed", "progress": 100}]
+
+class TestConnectionManager:
+    """Unit tests for multi-subscriber WebSocket fan-out"""
+    
+    @pytest.mark.unit
+    def test_multiple_subscribers_per_project(self):
+        """Every socket watching a project receives updates"""
+        async def scenario():
+            manager = ConnectionManager()
+            first, second = FakeWebSocket(), FakeWebSocket()
+            await manager.connect(first, "project_1")
+            await manager.connect(second, "project_1")
+            
+            await manager.send_progress("project_1", {"status": "processing", "progress": 10})
+            await asyncio.sleep(0.05)
+            
+            assert first.sent == second.sent == [{"status": "processing", "progress": 10}]
+            assert manager.get_stats()["subscribers"] == 2
+            manager.disconnect("project_1")
+        
+        asyncio.run(scenario())
+    
+    @pytest.mark.unit
+    def test_slow_client_does_not_stall_others(self):
+        """A stuck socket is dropped without delaying healthy ones"""
+        async def scenario():
+            manager = ConnectionManager(queue_size=4, send_timeout=0.1)
+            fast, slow = FakeWebSocket(), FakeWebSocket(send_delay=10)
+            await manager.connect(fast, "project_1")
+            slow_subscriber = await manager.connect(slow, "project_1")
+            
+            for progress in range(10):
+                await manager.send_progress("project_1", {"status": "processing", "progress": progress})
+            await asyncio.sleep(0.3)
+            
+            assert fast.sent[-1]["progress"] == 9
+            assert slow.closed
+            assert slow_subscriber not in manager.active_connections.get("project_1", set())
+            assert manager.get_stats()["clients_dropped"] == 1
+            manager.disconnect("project_1")
+        
+        asyncio.run(scenario())
+
+class TestProgressReplay:
+    """Unit tests for resuming progress streams from an event id"""
+    
+    @pytest.mark.unit
+    def test_replay_returns_events_after_cursor(self):
+        """Only events newer than the cursor are replayed, in order"""
+        async def scenario():
+            bus = ProgressBus()
+            ids = [await bus.publish("project_1", {"status": "processing", "progress": p}) for p in (10, 20, 30)]
+            
+            missed = await bus.replay("project_1", ids[0])
+            assert [event["progress"] for event in missed] == [20, 30]
+            assert [event["event_id"] for event in missed] == ids[1:]
+            assert await bus.replay("project_1", ids[-1]) == []
+            assert await bus.replay("project_1", None) == []
+        
+        asyncio.run(scenario())
+    
+    @pytest.mark.unit
+    def test_websocket_since_skips_duplicates(self):
+        """A resumed socket gets the backlog once, then only newer live events"""
+        async def scenario():
+            bus = ProgressBus()
+            manager = ConnectionManager()
+            bus.add_listener(manager.send_progress)
+            cursor = await bus.publish("project_1", {"status": "processing", "progress": 10})
+            await bus.publish("project_1", {"status": "processing", "progress": 20})
+            
+            socket = FakeWebSocket()
+            subscriber = await manager.connect(socket, "project_1", backlog=lambda: bus.replay("project_1", cursor))
+            # Live copy of an event the replay already covered
+            await manager.send_progress("project_1", socket.sent[-1])
+            await bus.publish("project_1", {"status": "completed", "progress": 100})
+            await asyncio.sleep(0.05)
+            
+            assert [event["progress"] for event in socket.sent] == [20, 100]
+            assert subscriber.replayed == 1
+            manager.disconnect("project_1")
+        
+        asyncio.run(scenario())
+    
+    @pytest.mark.unit
+    def test_failed_replay_unregisters_subscriber(self):
+        """A client that drops during the backlog replay is not left registered"""
+        class ClosedWebSocket(FakeWebSocket):
+            async def send_json(self, data):
+                raise RuntimeError("socket closed")
+        
+        async def scenario():
+            bus = ProgressBus()
+            manager = ConnectionManager()
+            cursor = await bus.publish("project_1", {"status": "processing", "progress": 10})
+            await bus.publish("project_1", {"status": "processing", "progress": 20})
+            
+            with pytest.raises(RuntimeError):
+                await manager.connect(ClosedWebSocket(), "project_1", backlog=lambda: bus.replay("project_1", cursor))
+            
+            assert manager.active_connections == {}
+            assert manager.get_stats()['subscribers'] == 0
+        
+        asyncio.run(scenario())
+    
+    @pytest.mark.unit
+    def test_sse_resumes_from_last_event_id(self):
+        """The SSE stream replays missed events with their ids"""
+        async def scenario():
+            cursor = await progress_bus.publish("project_resume", {"status": "processing", "progress": 10})
+            await progress_bus.publish("project_resume", {"status": "processing", "progress": 50})
+            
+            stream = sse_events.sse_progress_stream("project_resume", last_event_id=cursor)
+            event = await stream.__anext__()
+            assert '"progress": 50' in event["data"]
+            assert sse_events.format_sse(event).startswith(f"id: {event['id']}\nevent: progress\n")
+            await stream.aclose()
+        
+        asyncio.run(scenario())
+
+class FailingRedis:
+    """Redis client whose subscription fails, recording what gets closed"""
+    
+    created = []
+    
+    def __init__(self):
+        self.closed = False
+        self.pubsub_closed = False
+        FailingRedis.created.append(self)
+    
+    def register_script(self, script):
+        return None
+    
+    def pubsub(self, **kwargs):
+        client = self
+        
+        class PubSub:
+            async def psubscribe(self, pattern):
+                raise ConnectionError("redis unavailable")
+            
+            async def aclose(self):
+                client.pubsub_closed = True
+        
+        return PubSub()
+    
+    async def aclose(self):
+        self.closed = True
+
+class TestProgressBusReconnect:
+    """Unit tests for the Redis subscription loop"""
+    
+    @pytest.mark.unit
+    def test_failed_connection_is_closed_before_retry(self, monkeypatch):
+        """A lost connection's pubsub and client are closed, not leaked on reconnect"""
+        import progress_bus as progress_bus_module
+        FailingRedis.created.clear()
+        monkeypatch.setattr(progress_bus_module.aioredis, "from_url", lambda url: FailingRedis())
+        
+        async def scenario():
+            bus = ProgressBus("redis://unused")
+            await bus.start()
+            await asyncio.sleep(0.05)
+            await bus.stop()
+            return bus
+        
+        bus = asyncio.run(scenario())
+        
+        assert len(FailingRedis.created) == 1
+        assert FailingRedis.created[0].closed and FailingRedis.created[0].pubsub_closed
+        assert bus._redis is None and not bus.connected
+
+class TestSSEUpdates:
+    """Unit tests for coalescing SSE delivery"""
+    
+    @pytest.mark.unit
+    def test_stalled_subscriber_keeps_latest_state(self):
+        """A subscriber that isn't reading holds only the newest snapshot and terminal events"""
+        async def scenario():
+            stream = sse_events.sse_progress_stream("project_sse")
+            first = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0.01)
+            
+            await sse_events.send_sse_update("project_sse", {"status": "processing", "progress": 1})
+            assert (await first)["event"] == "progress"
+            
+            coalesced_before = sse_events.sse_metrics["coalesced"]
+            for progress in range(2, 50):
+                await sse_events.send_sse_update("project_sse", {"status": "processing", "progress": progress})
+            await sse_events.send_sse_update("project_sse", {"status": "completed", "progress": 100})
+            
+            queue = next(iter(sse_events.sse_connections["project_sse"]))
+            assert [item["progress"] for item in queue._items] == [100]
+            assert sse_events.sse_metrics["coalesced"] - coalesced_before == 48
+            assert sse_events.get_sse_stats()["subscribers"] == 1
+            
+            await stream.aclose()
+            assert "project_sse" not in sse_events.sse_connections
+        
+        asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import pytest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project_repository import ProjectRepository, SQLiteProjectRepository, create_project_repository, LIST_FIELDS
+
+@pytest.fixture
+def repository():
+    repo = SQLiteProjectRepository()
+    for index in range(7):
+        repo[f"project_{index}"] = {
+            "user_id": "user_1" if index < 5 else "user_2",
+            "status": "completed" if index % 2 else "processing",
+            "created_at": 1000 + index,
+            "platforms": ["tiktok", "youtube_shorts"] if index % 2 else ["tiktok"],
+            "transformations": {"tiktok": {"url": f"https://cdn.test.com/{index}.mp4"}}
+        }
+    return repo
+
+class TestSQLiteProjectRepository:
+    """Unit tests for the indexed project store"""
+    
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_cursor_pagination_newest_first(self, repository):
+        """Pages follow created_at DESC and the cursor resumes after the last item"""
+        seen, cursor = [], None
+        while True:
+            page, cursor = repository.list_for_user("user_1", limit=2, cursor=cursor)
+            seen.extend(project["id"] for project in page)
+            if not cursor:
+                break
+        
+        assert seen == [f"project_{index}" for index in (4, 3, 2, 1, 0)]
+    
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_field_projection_and_status_filter(self, repository):
+        """List views can skip heavy fields and filter on the status index"""
+        page, _ = repository.list_for_user("user_1", status="completed", fields=LIST_FIELDS)
+        
+        assert [project["id"] for project in page] == ["project_3", "project_1"]
+        assert all("transformations" not in project for project in page)
+        assert page[0]["platforms"] == ["tiktok", "youtube_shorts"]
+    
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_update_merges_and_reindexes(self, repository):
+        """Updates keep other fields and move the project between status buckets"""
+        updated = repository.update("project_0", {"status": "failed", "error": "boom"})
+        
+        assert updated["transformations"]["tiktok"]["url"].endswith("0.mp4")
+        assert repository.count_by_status("user_1") == {"completed": 2, "processing": 2, "failed": 1}
+        assert repository.update("missing", {"status": "failed"}) is None
+    
+    @pytest.mark.unit
+    @pytest.mark.storage
+    def test_aggregates_and_mapping_access(self, repository):
+        """Dashboard aggregates and dict-style access for existing callers"""
+        assert repository.platform_counts("user_1") == {"tiktok": 5, "youtube_shorts": 2}
+        assert "project_6" in repository and "missing" not in repository
+        assert repository["project_6"]["user_id"] == "user_2"
+        
+        repository.clear()
+        assert len(repository) == 0
+    
+    @pytest.mark.unit
+    def test_invalid_input_rejected(self, repository):
+        """Bad cursors, field names and URL schemes raise ValueError"""
+        with pytest.raises(ValueError):
+            repository.list_for_user("user_1", cursor="not-a-cursor")
+        with pytest.raises(ValueError):
+            repository.get("project_0", fields=["status') --"])
+        with pytest.raises(ValueError):
+            create_project_repository("mysql://localhost/projects")
+    
+    @pytest.mark.unit
+    def test_incomplete_backend_rejected(self):
+        """A backend missing part of the interface fails at construction"""
+        class ReadOnlyRepository(ProjectRepository):
+            def get(self, project_id, fields=None):
+                return None
+        
+        with pytest.raises(TypeError):
+            ReadOnlyRepository()
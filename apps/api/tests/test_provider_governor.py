@@ -0,0 +1,178 @@
+import pytest
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.provider_governor import (
+    ProviderGovernor, CircuitBreaker, ProviderThrottled, ProviderUnavailable, provider_governors, parse_reset
+)
+from services.llm_cache import llm_cache
+from services.llm_gateway import chat_completion
+
+@pytest.fixture(autouse=True)
+def reset_providers():
+    provider_governors.clear()
+    llm_cache.clear()
+    yield
+    provider_governors.clear()
+    llm_cache.clear()
+
+class RateLimited(Exception):
+    """Provider error carrying a 429 status and Retry-After header"""
+    status_code = 429
+
+    def __init__(self, retry_after='0.01'):
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(headers={'retry-after': retry_after})
+
+def flaky(failures, error=ConnectionError):
+    """Async call that fails ``failures`` times before succeeding"""
+    calls = []
+
+    async def call():
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise error() if isinstance(error, type) else error
+        return 'ok'
+    call.calls = calls
+    return call
+
+class TestProviderGovernor:
+    """Unit tests for provider rate limiting, retries and circuit breaking"""
+
+    @pytest.mark.unit
+    def test_waits_for_request_capacity(self):
+        """An empty request bucket delays the call until it refills"""
+        governor = ProviderGovernor('openai', 'gpt-4', rpm=600)
+        governor.requests.level = 0
+
+        started = time.perf_counter()
+        assert asyncio.run(governor.run(flaky(0))) == 'ok'
+
+        assert time.perf_counter() - started >= 0.09
+        assert governor.get_stats()['throttled'] == 1
+
+    @pytest.mark.unit
+    def test_sheds_when_wait_exceeds_limit(self):
+        """Calls that would wait longer than max_wait fail fast without reaching the provider"""
+        governor = ProviderGovernor('openai', 'gpt-4', rpm=100, tpm=1000, max_wait=0.5)
+        call = flaky(0)
+
+        governor.tokens.level = 0
+        with pytest.raises(ProviderThrottled):
+            asyncio.run(governor.run(call, tokens=100))
+
+        assert call.calls == []
+        assert governor.get_stats()['shed'] == 1
+
+    @pytest.mark.unit
+    def test_rate_limit_headers_feed_buckets(self):
+        """x-ratelimit headers replace the configured limits and remaining capacity"""
+        governor = ProviderGovernor('openai', 'gpt-4', rpm=500, tpm=150000)
+        governor.observe_headers({
+            'x-ratelimit-limit-requests': '10000',
+            'x-ratelimit-remaining-requests': '9990',
+            'x-ratelimit-limit-tokens': '2000000',
+            'x-ratelimit-remaining-tokens': '1500',
+            'x-ratelimit-reset-tokens': '6m0s'
+        })
+
+        stats = governor.get_stats()
+        assert stats['requests_per_minute']['limit'] == 10000
+        assert stats['tokens_per_minute']['limit'] == 2000000
+        assert stats['tokens_per_minute']['available'] < 2000
+        assert parse_reset('6m0s') == 360 and parse_reset('20ms') == 0.02
+
+    @pytest.mark.unit
+    def test_retries_rate_limits_with_retry_after(self):
+        """429s are retried after the provider's Retry-After delay"""
+        governor = ProviderGovernor('openai', 'gpt-4', rpm=1000, max_attempts=3)
+        call = flaky(2, RateLimited)
+
+        assert asyncio.run(governor.run(call)) == 'ok'
+
+        assert len(call.calls) == 3
+        assert call.calls[1] - call.calls[0] >= 0.009
+        stats = governor.get_stats()
+        assert stats['rate_limited'] == 2 and stats['retries'] == 2 and stats['breaker'] == 'closed'
+
+    @pytest.mark.unit
+    def test_non_retryable_errors_raise_immediately(self):
+        """Bad requests are not retried and do not count against the provider"""
+        governor = ProviderGovernor('openai', 'gpt-4', max_attempts=3, breaker=CircuitBreaker(failure_threshold=1))
+        call = flaky(5, ValueError)
+
+        with pytest.raises(ValueError):
+            asyncio.run(governor.run(call))
+
+        assert len(call.calls) == 1
+        assert governor.breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.unit
+    def test_circuit_opens_and_recovers(self):
+        """Repeated failures open the circuit; a probe after the reset timeout closes it"""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        governor = ProviderGovernor('openai', 'gpt-4', max_attempts=1, breaker=breaker)
+        call = flaky(2)
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                asyncio.run(governor.run(call))
+        with pytest.raises(ProviderUnavailable):
+            asyncio.run(governor.run(call))
+
+        assert len(call.calls) == 2
+        assert governor.get_stats()['breaker'] == 'open'
+
+        time.sleep(0.06)
+        assert asyncio.run(governor.run(call)) == 'ok'
+        stats = governor.get_stats()
+        assert stats['breaker'] == 'closed' and stats['rejected'] == 1 and stats['times_opened'] == 1
+
+class TestGatewayDegradation:
+    """The gateway serves cached results before callers fall back to mocks"""
+
+    def make_client(self, fail):
+        def completion(content):
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+        async def create(**kwargs):
+            if fail['now']:
+                raise ConnectionError("provider down")
+            return completion('fresh answer')
+
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    @pytest.mark.unit
+    def test_stale_cache_served_when_provider_unavailable(self):
+        """An expired cached completion is returned once the governor gives up"""
+        fail = {'now': False}
+        client = self.make_client(fail)
+        governor = provider_governors.get('openai', 'gpt-4')
+        governor.max_attempts = 1
+        request = dict(model='gpt-4', messages=[{"role": "user", "content": "Predict trends"}], temperature=0.3)
+
+        async def scenario():
+            await chat_completion(client, site='Test.trends', cache_ttl=0.01, **request)
+            await asyncio.sleep(0.02)
+            fail['now'] = True
+            return await chat_completion(client, site='Test.trends', cache_ttl=0.01, **request)
+
+        response = asyncio.run(scenario())
+
+        assert response.choices[0].message.content == 'fresh answer'
+        assert llm_cache.get_stats()['sites']['Test.trends']['stale_hits'] == 1
+
+    @pytest.mark.unit
+    def test_error_reaches_caller_without_cached_result(self):
+        """With nothing cached the failure propagates so the service can use its mock"""
+        client = self.make_client({'now': True})
+        provider_governors.get('openai', 'gpt-4').max_attempts = 1
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(chat_completion(client, site='Test.trends', model='gpt-4',
+                                        messages=[{"role": "user", "content": "x"}], temperature=0.3))
@@ -0,0 +1,113 @@
+import pytest
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app, script_writer as app_script_writer
+from services.auth import auth_service, users_db, User
+from services.script_writer import AIScriptWriter, ScriptFieldStream
+
+SCRIPT = 'POV: you just found the "secret" nobody shares\n[0-5s] Hook\nComment your results!'
+
+def response_chunks(content, size=7):
+    """Split a completion into streamed chat.completion.chunk-like objects"""
+    for i in range(0, len(content), size):
+        delta = SimpleNamespace(content=content[i:i + size])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+class StreamingClient:
+    """Sync client stub that streams a canned JSON completion"""
+
+    def __init__(self, content):
+        self.api_key = 'sk-test'
+        self.content = content
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return response_chunks(self.content)
+
+def collect(writer, **kwargs):
+    async def run():
+        return [event async for event in writer.stream_viral_script(**kwargs)]
+    return asyncio.run(run())
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+class TestScriptStreaming:
+    """Unit tests for streamed script generation"""
+
+    @pytest.mark.unit
+    def test_field_stream_handles_split_escapes(self):
+        """Script text is decoded incrementally even when escapes span chunks"""
+        content = json.dumps({'script': SCRIPT + ' é', 'title_suggestions': ['a']})
+        field = ScriptFieldStream()
+
+        text = ''.join(field.feed(content[i:i + 3]) for i in range(0, len(content), 3))
+
+        assert text == SCRIPT + ' é'
+
+    @pytest.mark.unit
+    def test_tokens_then_script_score_and_variations(self):
+        """Script text streams first; score and variations follow as later events"""
+        writer = AIScriptWriter()
+        writer.openai_client = StreamingClient(json.dumps({'script': SCRIPT, 'title_suggestions': ['Title']}))
+
+        events = collect(writer, concept='productivity', platform='tiktok', duration=30, style='educational')
+        names = [name for name, _ in events]
+
+        assert names[0] == 'hooks'
+        assert names[-4:] == ['script', 'viral_score', 'variations', 'done']
+        assert ''.join(data['text'] for name, data in events if name == 'token') == SCRIPT
+        assert writer.openai_client.calls[0]['stream'] is True
+        done = events[-1][1]
+        assert done['script'] == SCRIPT
+        assert done['viral_score'] == events[-3][1]['viral_score']
+        assert len(done['variations']) == 3
+
+    @pytest.mark.unit
+    def test_invalid_response_falls_back_to_mock(self):
+        """A response without a usable script is replaced by the mock script"""
+        writer = AIScriptWriter()
+        writer.openai_client = StreamingClient('{"title": "no script here"')
+
+        events = dict(collect(writer, concept='cooking', platform='tiktok', duration=30, style='story'))
+
+        assert events['token']['replace'] is True
+        assert events['script']['script'] == events['token']['text']
+        assert 'cooking' in events['script']['script']
+
+    @pytest.mark.functional
+    @pytest.mark.api
+    def test_stream_endpoint_charges_credits_when_done(self, client, clear_test_data):
+        """The SSE endpoint streams events and charges 10 credits at the end"""
+        now = datetime.utcnow()
+        users_db['user_1'] = {'id': 'user_1', 'email': 'stream@example.com', 'credits': 25}
+        app.dependency_overrides[auth_service.get_current_user] = lambda: User(
+            id='user_1', email='stream@example.com', brand='viralsplit', created_at=now, updated_at=now
+        )
+        original_client = app_script_writer.openai_client
+        app_script_writer.openai_client = StreamingClient(json.dumps({'script': SCRIPT}))
+        try:
+            response = client.post("/api/scripts/generate/stream", json={'concept': 'fitness', 'duration': 30})
+        finally:
+            app_script_writer.openai_client = original_client
+            app.dependency_overrides.pop(auth_service.get_current_user, None)
+
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/event-stream')
+        events = parse_sse(response.text)
+        assert events[-1][0] == 'done'
+        assert events[-1][1]['credits_used'] == 10
+        assert events[-1][1]['credits_remaining'] == 15
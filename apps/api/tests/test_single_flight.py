@@ -0,0 +1,155 @@
+import pytest
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.single_flight import SingleFlight, request_key
+from services.llm_cache import llm_cache
+from services.llm_gateway import chat_completion
+
+class Upstream:
+    """Counts calls and blocks each one until released"""
+
+    def __init__(self, result='ok', error=None):
+        self.calls = 0
+        self.cancelled = 0
+        self.result = result
+        self.error = error
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+class TestSingleFlight:
+    """Unit tests for coalescing identical in-flight requests"""
+
+    @pytest.mark.unit
+    def test_concurrent_callers_share_one_call(self):
+        """Callers with the same key await a single upstream call"""
+        flights = SingleFlight()
+        upstream = Upstream(result={'score': 72})
+
+        async def scenario():
+            upstream.release = asyncio.Event()
+            callers = [asyncio.ensure_future(flights.do('k', upstream, site='Test.trends')) for _ in range(5)]
+            await asyncio.sleep(0)
+            upstream.release.set()
+            return await asyncio.gather(*callers)
+
+        results = asyncio.run(scenario())
+
+        assert upstream.calls == 1
+        assert results == [{'score': 72}] * 5
+        assert flights.get_stats()['sites']['Test.trends'] == {'calls': 1, 'coalesced': 4, 'abandoned': 0}
+        assert flights.in_flight() == 0
+
+    @pytest.mark.unit
+    def test_errors_are_shared_and_not_remembered(self):
+        """Every waiter sees the failure and the next caller retries"""
+        flights = SingleFlight()
+        upstream = Upstream(error=RuntimeError("rate limited"))
+
+        async def scenario():
+            upstream.release = asyncio.Event()
+            callers = [asyncio.ensure_future(flights.do('k', upstream)) for _ in range(3)]
+            await asyncio.sleep(0)
+            upstream.release.set()
+            results = await asyncio.gather(*callers, return_exceptions=True)
+            upstream.error = None
+            return results, await flights.do('k', upstream)
+
+        results, retried = asyncio.run(scenario())
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert retried == 'ok'
+        assert upstream.calls == 2
+
+    @pytest.mark.unit
+    def test_cancelled_caller_does_not_cancel_others(self):
+        """The upstream call survives as long as one caller is still waiting"""
+        flights = SingleFlight()
+        upstream = Upstream()
+
+        async def scenario():
+            upstream.release = asyncio.Event()
+            first = asyncio.ensure_future(flights.do('k', upstream))
+            second = asyncio.ensure_future(flights.do('k', upstream))
+            await asyncio.sleep(0)
+            first.cancel()
+            await asyncio.sleep(0)
+            upstream.release.set()
+            return first, await second
+
+        first, result = asyncio.run(scenario())
+
+        assert first.cancelled()
+        assert result == 'ok'
+        assert upstream.calls == 1 and upstream.cancelled == 0
+
+    @pytest.mark.unit
+    def test_call_cancelled_when_every_caller_leaves(self):
+        """An abandoned call is cancelled and a later caller starts a fresh one"""
+        flights = SingleFlight()
+        upstream = Upstream()
+
+        async def scenario():
+            upstream.release = asyncio.Event()
+            callers = [asyncio.ensure_future(flights.do('k', upstream)) for _ in range(2)]
+            await asyncio.sleep(0)
+            for caller in callers:
+                caller.cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            await asyncio.sleep(0)
+            upstream.release.set()
+            return await flights.do('k', upstream)
+
+        result = asyncio.run(scenario())
+
+        assert result == 'ok'
+        assert upstream.calls == 2 and upstream.cancelled == 1
+        assert flights.get_stats()['sites']['default']['abandoned'] == 1
+
+    @pytest.mark.unit
+    def test_identical_chat_completions_coalesce(self):
+        """Concurrent identical cacheable prompts reach the provider once"""
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            await asyncio.sleep(0.05)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='72'))])
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        messages = [{"role": "user", "content": "Predict trends"}]
+
+        async def scenario():
+            return await asyncio.gather(*[
+                chat_completion(client, site='Test.predict', model='gpt-4', messages=messages, temperature=0.3)
+                for _ in range(4)
+            ])
+
+        llm_cache.clear()
+        try:
+            results = asyncio.run(scenario())
+        finally:
+            llm_cache.clear()
+
+        assert len(calls) == 1
+        assert len({id(result) for result in results}) == 1
+
+    @pytest.mark.unit
+    def test_request_key_is_order_independent(self):
+        """Keys ignore dict ordering but not values"""
+        assert request_key('tts', {'text': 'hi', 'voice': 'a'}) == request_key('tts', {'voice': 'a', 'text': 'hi'})
+        assert request_key('tts', {'text': 'hi'}) != request_key('tts', {'text': 'hello'})
@@ -0,0 +1,115 @@
+import pytest
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_cache import llm_cache
+from services.trend_monitor import RealTimeTrendMonitor
+
+@pytest.fixture(autouse=True)
+def clear_llm_cache():
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
+
+def make_trends(count, prefix='Trend'):
+    return [{
+        'topic': f"{prefix} {i}",
+        'keywords': [f"keyword {i}"],
+        'engagement_velocity': 0.5,
+        'content_samples': [f"Sample video {i}"]
+    } for i in range(count)]
+
+class TrendCompletions:
+    """Sync chat.completions stand-in scoring every topic listed in a batch prompt"""
+
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        prompt = kwargs['messages'][1]['content']
+        if 'each trending topic below' not in prompt:
+            return self.reply('0.4' if 'momentum' in prompt else json.dumps({'confidence': 0.5}))
+        topics = [line.split('Topic: ', 1)[1].strip() for line in prompt.splitlines() if 'Topic: ' in line]
+        return self.reply(json.dumps({'trends': {
+            topic.upper(): {'momentum': 0.9, 'confidence': 0.8, 'potential': 'high', 'hours_to_peak': 6}
+            for topic in topics if topic not in self.skip
+        }}))
+
+    @staticmethod
+    def reply(content):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def make_monitor(tmp_path, completions):
+    monitor = RealTimeTrendMonitor()
+    monitor.trends_db = str(tmp_path / 'trends.db')
+    monitor.init_database()
+    monitor.openai_client = SimpleNamespace(api_key='sk-test', chat=SimpleNamespace(completions=completions))
+    return monitor
+
+class TestTrendBatchScoring:
+    """Unit tests for per-scan batched trend scoring"""
+
+    @pytest.mark.unit
+    def test_scan_scored_in_chunked_requests(self, tmp_path):
+        """A scan costs one request per chunk, and scores map back by topic"""
+        completions = TrendCompletions()
+        monitor = make_monitor(tmp_path, completions)
+        monitor.batch_size = 20
+
+        processed = asyncio.run(monitor._process_scan('tiktok', make_trends(45)))
+
+        assert processed == 45
+        assert len(completions.calls) == 3
+        trends = asyncio.run(monitor.get_real_time_trends(['tiktok'], limit=100))
+        assert len(trends) == 45
+        assert all(t['momentum_score'] == 0.9 and t['confidence'] == 0.8 for t in trends)
+
+    @pytest.mark.unit
+    def test_unchanged_topics_are_skipped(self, tmp_path):
+        """Only new or changed trends are sent on the next scan"""
+        completions = TrendCompletions()
+        monitor = make_monitor(tmp_path, completions)
+        trends = make_trends(5)
+        asyncio.run(monitor._process_scan('tiktok', trends))
+
+        rescan = make_trends(5)
+        rescan[2]['content_samples'].append('A new breakout video')
+        processed = asyncio.run(monitor._process_scan('tiktok', rescan + make_trends(1, prefix='Fresh')))
+
+        assert processed == 2
+        assert len(completions.calls) == 2
+        prompt = completions.calls[1]['messages'][1]['content']
+        assert 'Trend 2' in prompt and 'Fresh 0' in prompt and 'Trend 1' not in prompt
+
+    @pytest.mark.unit
+    def test_missing_entries_scored_individually(self, tmp_path):
+        """Topics the batch answer leaves out fall back to the per-trend calls"""
+        completions = TrendCompletions(skip={'Trend 1'})
+        monitor = make_monitor(tmp_path, completions)
+
+        asyncio.run(monitor._process_scan('instagram_reels', make_trends(3)))
+
+        assert len(completions.calls) == 3  # one batch plus momentum and potential for Trend 1
+        scores = {t['topic']: t['momentum_score'] for t in asyncio.run(monitor.get_real_time_trends(limit=10))}
+        assert scores == {'Trend 0': 0.9, 'Trend 1': 0.4, 'Trend 2': 0.9}
+
+    @pytest.mark.unit
+    def test_chunks_respect_prompt_size(self, tmp_path):
+        """Long trends are split into more chunks to stay within the prompt budget"""
+        monitor = make_monitor(tmp_path, TrendCompletions())
+        monitor.batch_size = 20
+        monitor.batch_max_chars = 1000
+        trends = make_trends(6)
+        for trend in trends:
+            trend['content_samples'] = ['x' * 400]
+
+        chunks = monitor._trend_chunks(trends)
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 2]
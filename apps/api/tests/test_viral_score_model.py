@@ -0,0 +1,136 @@
+import pytest
+import asyncio
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app
+from services.ai_enhancer import AIEnhancer
+from services.auth import auth_service, users_db, User
+from services.llm_cache import llm_cache
+from services.viral_score_model import ViralScoreModel
+
+PLATFORMS = ['tiktok', 'instagram_reels', 'youtube_shorts', 'linkedin']
+
+STRONG = {'title': 'POV: the secret nobody tells you about mornings #fyp #viral', 'duration': 16,
+          'transcript': 'Wait for it, this is the mistake everyone makes'}
+WEAK = {'title': 'Update', 'duration': 400}
+
+@pytest.fixture(autouse=True)
+def clear_llm_cache():
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
+
+class ExplainingCompletions:
+    """Async chat.completions stand-in that records calls"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.fail:
+            raise ConnectionError("provider down")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Strong hook, ideal length."))])
+
+def make_enhancer(completions):
+    enhancer = AIEnhancer()
+    enhancer.openai_client = SimpleNamespace(api_key='sk-test', chat=SimpleNamespace(completions=completions))
+    return enhancer
+
+class TestViralScoreModel:
+    """Unit tests for the local viral score model"""
+
+    @pytest.mark.unit
+    def test_batch_matches_single_scores(self):
+        """Scoring thousands of variants at once agrees with scoring them one by one"""
+        model = ViralScoreModel()
+        specs = AIEnhancer()._specs_for(PLATFORMS)
+        variants = [{'title': f"How to fix mistake #{i} #fyp", 'duration': 5 + i % 200,
+                     'transcript': 'wait' if i % 2 else ''} for i in range(3000)]
+
+        scores = model.score_batch(variants, specs)
+
+        assert scores.shape == (3000, len(PLATFORMS))
+        assert ((scores > 0) & (scores < 1)).all()
+        for i in (0, 1, 1234, 2999):
+            assert model.score(variants[i], specs) == {p: round(float(s), 2) for p, s in zip(specs, scores[i])}
+
+    @pytest.mark.unit
+    def test_features_move_scores_and_factors(self):
+        """Hooks, trending tags and on-length duration raise the score; over-length lowers it"""
+        model = ViralScoreModel()
+        specs = AIEnhancer()._specs_for(['tiktok'])
+
+        assert model.score(STRONG, specs)['tiktok'] > 0.85
+        assert model.score(WEAK, specs)['tiktok'] < 0.3
+        factors = {f['factor']: f['impact'] for f in model.top_factors(WEAK, specs)['tiktok']}
+        assert factors['over_length'] < 0
+        strong = {f['factor'] for f in model.top_factors(STRONG, specs)['tiktok']}
+        assert {'hook_strength', 'trend_overlap'} <= strong
+
+class TestLocalViralScoring:
+    """AIEnhancer scores locally and only asks the LLM for explanations"""
+
+    @pytest.mark.unit
+    def test_scores_without_llm_and_explains_on_request(self):
+        """Scoring makes no LLM call; explain=True makes one cached call"""
+        completions = ExplainingCompletions()
+        enhancer = make_enhancer(completions)
+
+        plain = asyncio.run(enhancer.calculate_viral_score(STRONG, PLATFORMS))
+        assert completions.calls == []
+        assert set(plain['viral_scores']) == set(PLATFORMS)
+        assert 'explanation' not in plain
+
+        for _ in range(2):
+            explained = asyncio.run(enhancer.calculate_viral_score(STRONG, PLATFORMS, explain=True))
+        assert explained['explanation'] == "Strong hook, ideal length."
+        assert explained['viral_scores'] == plain['viral_scores']
+        assert len(completions.calls) == 1
+
+        ceiling = asyncio.run(enhancer.predict_viral_ceiling(WEAK, ['tiktok']))
+        tiktok = ceiling['viral_ceiling']['tiktok']
+        assert tiktok['max_views_range']['conservative'] < 50000
+        assert tiktok['viral_score'] < 0.3
+
+    @pytest.mark.unit
+    def test_explanation_falls_back_to_factors(self):
+        """When the LLM fails the explanation is built from the model's factors"""
+        enhancer = make_enhancer(ExplainingCompletions(fail=True))
+
+        result = asyncio.run(enhancer.calculate_viral_score(WEAK, ['tiktok'], explain=True))
+
+        assert result['explanation'].startswith('tiktok: held back by over length')
+
+    @pytest.mark.functional
+    @pytest.mark.api
+    def test_score_batch_endpoint(self, client):
+        """The batch endpoint returns a score matrix and the best variant per platform"""
+        now = datetime.utcnow()
+        users_db['user_1'] = {'id': 'user_1', 'email': 'score@example.com', 'credits': 0}
+        app.dependency_overrides[auth_service.get_current_user] = lambda: User(
+            id='user_1', email='score@example.com', brand='viralsplit', created_at=now, updated_at=now
+        )
+        try:
+            response = client.post("/api/viral/score-batch",
+                                   json={'variants': [WEAK, STRONG], 'platforms': ['tiktok', 'linkedin', 'myspace']})
+            too_many = client.post("/api/viral/score-batch", json={'variants': [WEAK] * 5001})
+            numeric = client.post("/api/viral/score-batch",
+                                  json={'variants': [{'title': 123, 'transcript': 4.5, 'description': ['#fyp']}]})
+        finally:
+            app.dependency_overrides.pop(auth_service.get_current_user, None)
+            users_db.pop('user_1', None)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body['platforms'] == ['tiktok', 'linkedin']
+        assert len(body['scores']) == 2 and len(body['scores'][0]) == 2
+        assert body['best_variant'] == {'tiktok': 1, 'linkedin': 1}
+        assert too_many.status_code == 400
+        assert numeric.status_code == 200
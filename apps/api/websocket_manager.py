@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from fastapi import WebSocket
+from progress_buffer import CoalescingQueue
+from progress_bus import event_id_key
+
+logger = logging.getLogger("viralsplit.websocket")
+
+SEND_QUEUE_SIZE = int(os.getenv('WS_SEND_QUEUE_SIZE', '32'))
+SEND_TIMEOUT = float(os.getenv('WS_SEND_TIMEOUT', '10'))  # seconds before a stuck client is dropped
+LOG_SAMPLE_EVERY = int(os.getenv('WS_LOG_SAMPLE_EVERY', '100'))  # log 1 in N sends
+
+class WebSocketSubscriber:
+    """One connected socket with its own bounded send queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, project_id: str, queue_size: int = SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.project_id = project_id
+        self.queue = CoalescingQueue(queue_size)
+        self.connected_at = time.time()
+        self.sent = 0
+        self.replayed = 0
+        self.last_event_id: Optional[str] = None  # newest event sent, skips live duplicates of a replay
+        self.writer: Optional[asyncio.Task] = None
+
+class ConnectionManager:
+    """Registry of WebSocket subscribers, any number per project.
+
+    send_progress only enqueues, so one slow socket never delays the others.
+    Each subscriber's writer drains its own queue; pending progress snapshots
+    are coalesced when the queue fills, and a client whose send stalls for
+    SEND_TIMEOUT seconds is disconnected.
+    """
+
+    def __init__(self, queue_size: int = SEND_QUEUE_SIZE, send_timeout: float = SEND_TIMEOUT):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.active_connections: Dict[str, Set[WebSocketSubscriber]] = {}
+        self.messages_sent = 0
+        self.clients_dropped = 0
+        self._coalesced_closed = 0  # coalesced counts from subscribers that have gone
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        project_id: str,
+        backlog: Optional[Callable[[], Awaitable[List[dict]]]] = None
+    ) -> WebSocketSubscriber:
+        """Accept a socket, replay any missed events from ``backlog``, then go live.
+
+        The subscriber is registered before the backlog is fetched so nothing
+        published in between is lost; live events already covered by the
+        replay are skipped by the writer. If the replay fails (e.g. the client
+        goes away mid-replay) the subscriber is removed again before the error
+        propagates.
+        """
+        await websocket.accept()
+        subscriber = WebSocketSubscriber(websocket, project_id, self.queue_size)
+        self.active_connections.setdefault(project_id, set()).add(subscriber)
+        try:
+            if backlog is not None:
+                for data in await backlog():
+                    await websocket.send_json(data)
+                    subscriber.replayed += 1
+                    subscriber.last_event_id = data.get('event_id', subscriber.last_event_id)
+        except BaseException as e:
+            self.disconnect(project_id, subscriber, reason=f"replay_failed:{type(e).__name__}")
+            raise
+        subscriber.writer = asyncio.create_task(self._write(subscriber))
+        logger.info(
+            "ws_connect project_id=%s subscribers=%d replayed=%d",
+            project_id, len(self.active_connections[project_id]), subscriber.replayed
+        )
+        return subscriber
+
+    def disconnect(self, project_id: str, subscriber: Optional[WebSocketSubscriber] = None, reason: str = "client_closed"):
+        """Remove one subscriber, or every subscriber of the project if none is given"""
+        subscribers = self.active_connections.get(project_id)
+        if not subscribers:
+            return
+
+        targets = [subscriber] if subscriber else list(subscribers)
+        for target in targets:
+            if target not in subscribers:
+                continue
+            subscribers.discard(target)
+            self._coalesced_closed += target.queue.coalesced
+            if target.writer and target.writer is not asyncio.current_task():
+                target.writer.cancel()
+            logger.info(
+                "ws_disconnect project_id=%s reason=%s sent=%d coalesced=%d duration_s=%.1f",
+                project_id, reason, target.sent, target.queue.coalesced,
+                time.time() - target.connected_at
+            )
+
+        if not subscribers:
+            del self.active_connections[project_id]
+
+    async def send_progress(self, project_id: str, data: dict):
+        """Queue an update for every socket watching the project (never blocks)"""
+        for subscriber in list(self.active_connections.get(project_id, ())):
+            subscriber.queue.put_nowait(data)
+
+    async def _write(self, subscriber: WebSocketSubscriber):
+        try:
+            while True:
+                data = await subscriber.queue.get()
+                event_id = data.get('event_id')
+                if event_id and subscriber.last_event_id:
+                    if event_id_key(event_id) <= event_id_key(subscriber.last_event_id):
+                        continue
+                await asyncio.wait_for(subscriber.websocket.send_json(data), timeout=self.send_timeout)
+                subscriber.sent += 1
+                subscriber.last_event_id = event_id or subscriber.last_event_id
+                self.messages_sent += 1
+                if self.messages_sent % LOG_SAMPLE_EVERY == 1:
+                    logger.debug(
+                        "ws_send project_id=%s status=%s progress=%s queued=%d total_sent=%d",
+                        subscriber.project_id, data.get('status'), data.get('progress'),
+                        subscriber.queue.qsize(), self.messages_sent
+                    )
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.clients_dropped += 1
+            self.disconnect(subscriber.project_id, subscriber, reason="send_timeout")
+            await self._close(subscriber)
+        except Exception as e:
+            self.disconnect(subscriber.project_id, subscriber, reason=f"send_failed:{type(e).__name__}")
+
+    async def _close(self, subscriber: WebSocketSubscriber):
+        try:
+            await asyncio.wait_for(subscriber.websocket.close(code=1013), timeout=1)
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        subscribers = [s for group in self.active_connections.values() for s in group]
+        return {
+            'projects': len(self.active_connections),
+            'subscribers': len(subscribers),
+            'messages_sent': self.messages_sent,
+            'messages_coalesced': self._coalesced_closed + sum(s.queue.coalesced for s in subscribers),
+            'clients_dropped': self.clients_dropped,
+            'max_queue_depth': max((s.queue.qsize() for s in subscribers), default=0)
+        }